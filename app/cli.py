@@ -0,0 +1,97 @@
+# Bulk loads users and issues straight into the database, without going through the API.
+#
+#   python -m app.cli import-users users.csv
+#   python -m app.cli import-issues issues.ndjson --chunk-size 10000
+#
+# Files are CSV with a header row or NDJSON with one object per line, the format is taken from the
+# extension unless --format is given. Users have email, password and optionally isAdmin columns, a
+# password that is already an argon2 hash is kept as it is. Issues have title, description, type
+# and the owner's email, optionally is_resolved and created_at. Rows that fail validation are
+# reported by line number on stderr and the rest are still imported.
+#
+# Progress is saved to <file>.progress after every chunk, so an interrupted import picks up from its
+# last committed chunk when it is run again. DATABASE_URL selects the database as it does for the app
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import multiprocessing
+import os
+import sys
+from app.config import config
+from app.database import Base, SessionLocal, engine
+from app.migrations import run_migrations
+from app.models import Issuedb, Sessiondb, Userdb  # noqa: F401, registers every table
+from app.services.hashing import _hash
+from app.services.imports import detect_format, import_issues, import_users
+
+
+DESCRIPTIONS = {
+    "import-issues": (
+        "Issues already imported are skipped. An issue is recognised by its line number, title, "
+        "description, email and created_at, so identical rows on the same line of two files "
+        "are imported once."
+    ),
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Help desk bulk import")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("import-users", "import-issues"):
+        subparser = commands.add_parser(command, description=DESCRIPTIONS.get(command))
+        subparser.add_argument("path")
+        subparser.add_argument("--format", choices=["csv", "ndjson"])
+        subparser.add_argument("--chunk-size", type=int, default=config.IMPORT_CHUNK_SIZE)
+        subparser.add_argument("--progress-file")
+    commands.choices["import-users"].add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="processes used to hash passwords"
+    )
+    return parser.parse_args(argv)
+
+
+def report_rejected(number: int, reason: str):
+    print(f"line {number}: {reason}", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        format = args.format or detect_format(args.path)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    progress_path = args.progress_file or f"{args.path}.progress"
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "import-users":
+            # argon2 is deliberately slow, so passwords are hashed across every core. spawn keeps
+            # the workers from inheriting the database connection
+            with ProcessPoolExecutor(
+                max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                report = import_users(
+                    db,
+                    args.path,
+                    format,
+                    args.chunk_size,
+                    progress_path,
+                    lambda passwords: list(pool.map(_hash, passwords, chunksize=16)),
+                    report_rejected,
+                )
+        else:
+            report = import_issues(
+                db, args.path, format, args.chunk_size, progress_path, report_rejected
+            )
+    finally:
+        db.close()
+    print(
+        f"{report['imported']} imported, {report['rejected']} rejected, "
+        f"{report['skipped']} skipped as already imported"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
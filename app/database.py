@@ -1,14 +1,80 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./database.db"
+# The asyncio driver used for each database the app supports
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+# The URL of the same database through its asyncio driver
+def async_url(url: str) -> str:
+    url = make_url(url)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+ASYNC_SQLALCHEMY_DATABASE_URL = config.ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URL)
+
+
+# Runs on every new SQLite connection. In WAL mode readers carry on while a write commits instead
+# of blocking behind it, and synchronous=NORMAL is still safe against corruption under WAL while
+# skipping an fsync on every commit. busy_timeout has a writer wait for the lock rather than fail
+# straight away with "database is locked"
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def create_db_engine(url: str):
+    if not is_sqlite(url):
+        return create_engine(url, **pool_options())
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **pool_options())
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+# aiosqlite would otherwise open a new connection, and run the pragmas again, for every session
+def create_async_db_engine(url: str):
+    engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool, **pool_options())
+    if is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The asyncio engine points at the same database, it is used by the async services
+async_engine = create_async_db_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
 Base = declarative_base()
 
 
@@ -18,4 +84,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close
+        db.close()
+
+
+# The async equivalent of get_db, the session is closed and its connection returned to the pool on exit
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
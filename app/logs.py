@@ -0,0 +1,62 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Optional
+from app.config import config
+
+# Attributes every log record has, anything else was passed through extra and is written as a field
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+# Writes each record as one JSON object per line, with any extra fields alongside the message
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+listener: Optional[logging.handlers.QueueListener] = None
+handler: Optional[logging.Handler] = None
+
+
+# Sets up the "app" logger every module logs through. Records are formatted where they are logged
+# and handed to a queue, a listener thread writes them to stderr so no request waits on the write.
+# LOG_LEVEL=OFF turns the app's logging off altogether
+def configure_logging():
+    global listener, handler
+    logger = logging.getLogger("app")
+    logger.propagate = False
+    # Above every level, so module loggers skip their records before formatting anything
+    if config.LOG_LEVEL.upper() == "OFF":
+        logger.setLevel(logging.CRITICAL + 1)
+        return
+    logger.setLevel(config.LOG_LEVEL.upper())
+    if listener is not None:
+        return
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    listener = logging.handlers.QueueListener(records, logging.StreamHandler(sys.stderr))
+    listener.start()
+
+
+# Writes out anything still queued
+def stop_logging():
+    global listener
+    if listener is not None:
+        listener.stop()
+        logging.getLogger("app").removeHandler(handler)
+        listener = None
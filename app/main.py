@@ -1,22 +1,112 @@
-from fastapi import FastAPI
-from app.database import SessionLocal, engine, Base
+import asyncio
+from anyio import to_thread
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
+from app.config import config
+from app.database import SessionLocal, async_engine, engine, Base
+from app.logs import configure_logging, stop_logging
+from app.middleware.compression import DynamicGZipMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.migrations import run_migrations
 from app.routers.issues import router as issues_router
+from app.routers.asyncIssues import router as async_issues_router
+from app.routers.events import router as events_router
+from app.routers.export import router as export_router
+from app.routers.metrics import router as metrics_router
 from app.routers.users import router as auth_router
 from app.routers.pages import router as pages_router
-from contextlib import asynccontextmanager
+from app.services.cache import listing_cache, session_cache
+from app.services.events import broadcaster
+from app.services.hashing import HashingBusy, hashing_pool
+from app.services.metrics import instrument_engines
+from app.services.sessions import purge_expired_sessions
+from app.templating import AssetFiles, assets, precompile_templates, templates
+from contextlib import asynccontextmanager, suppress
 
 
-# Creates the database tables and fastAPI instance
-Base.metadata.create_all(bind=engine)
+def purge_sessions():
+    db = SessionLocal()
+    try:
+        purge_expired_sessions(db, config.SESSION_PURGE_BATCH)
+    finally:
+        db.close()
+
+
+# Deletes expired sessions every SESSION_PURGE_INTERVAL seconds. The delete blocks so it runs on a
+# worker thread, and a run that finds the database locked is left for the next one to pick up
+async def purge_sessions_periodically():
+    while True:
+        await asyncio.sleep(config.SESSION_PURGE_INTERVAL)
+        with suppress(OperationalError):
+            await to_thread.run_sync(purge_sessions)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    # Creates the database tables and brings an older database up to date
+    if config.MIGRATE_ON_STARTUP:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+    # Sync routes and dependencies run on anyio's worker threads, this bounds how many run at once
+    to_thread.current_default_thread_limiter().total_tokens = config.THREADPOOL_SIZE
+    # The hashing pool is created with the app and its worker processes are stopped with it
+    hashing_pool.start()
+    # Starts listening for other workers' cache invalidations when the caches are shared
+    session_cache.backend.start()
+    listing_cache.backend.start()
+    broadcaster.start()
+    # Compiles every template before the first request rather than during it
+    precompile_templates(templates.env)
+    purge_task = asyncio.create_task(purge_sessions_periodically())
+    yield
+    purge_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await purge_task
+    hashing_pool.shutdown()
+    session_cache.backend.close()
+    listing_cache.backend.close()
+    broadcaster.stop()
+    await async_engine.dispose()
+    stop_logging()
+
+
+# Creates the fastAPI instance
 app = FastAPI(
     title="Help desk API",
     description="Having problems ? try submitting a ticket 😊",
+    lifespan=lifespan,
 )
 
 # Adds the routers to the fastAPI instance
+# With ASYNC_DATABASE set the async issue listings are added first so they take precedence
+if config.ASYNC_DATABASE:
+    app.include_router(async_issues_router, prefix="/api/issues", tags=["issues"])
 app.include_router(issues_router, prefix="/api/issues", tags=["issues"])
+app.include_router(export_router, prefix="/api/export", tags=["export"])
+app.include_router(events_router, prefix="/api/events", tags=["events"])
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
 app.include_router(pages_router, tags=["pages"])
+app.mount("/static", AssetFiles(assets), name="static")
+app.add_middleware(
+    DynamicGZipMiddleware, minimum_size=config.GZIP_MIN_SIZE, compresslevel=config.GZIP_LEVEL
+)
+# Added last so it wraps the others and the timings include compression
+if config.METRICS_ENABLED:
+    instrument_engines()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router, tags=["metrics"])
+
+
+# Raised when every password hashing worker is busy and the queue is full
+@app.exception_handler(HashingBusy)
+def hashing_busy_handler(request: Request, exc: HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please try again shortly"},
+        headers={"Retry-After": str(config.HASH_RETRY_AFTER)},
+    )
 
 
 # health check route
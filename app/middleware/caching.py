@@ -0,0 +1,53 @@
+from typing import Awaitable, Callable, Optional
+from fastapi import Request, Response
+from app.services.cache import listing_cache
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+# Answers a poll from the listing cache. The ETag is worked out from the key and the cache version
+# alone, so a client whose copy is still current gets a 304 without the database being touched
+# or anything serialised, and a miss is rendered once and served from the cache until the next write.
+# no-cache makes browsers check back every time rather than reuse a listing that may be stale
+def lookup(request: Request, key: tuple):
+    version = listing_cache.version
+    etag = listing_cache.etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return version, headers, True, None
+    return version, headers, False, listing_cache.get(key, version)
+
+
+def cached_response(
+    request: Request,
+    key: tuple,
+    render: Callable[[], bytes],
+    media_type: str = "application/json",
+) -> Response:
+    version, headers, not_modified, body = lookup(request, key)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        body = render()
+        listing_cache.set(key, version, body)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+async def cached_response_async(
+    request: Request,
+    key: tuple,
+    render: Callable[[], Awaitable[bytes]],
+    media_type: str = "application/json",
+) -> Response:
+    version, headers, not_modified, body = lookup(request, key)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if body is None:
+        body = await render()
+        listing_cache.set(key, version, body)
+    return Response(body, media_type=media_type, headers=headers)
@@ -0,0 +1,38 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+
+class DynamicGZipResponder(GZipResponder):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # A strong ETag promises the same bytes, the gzipped body is not, so the ETag of a response
+        # compressed here is made weak. The caches compare ETags weakly, a poll still gets its 304
+        async def send_with_weak_etag(message: Message):
+            if message["type"] == "http.response.start" and not self.content_encoding_set:
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if "content-encoding" in headers and etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+
+        await super().__call__(scope, receive, send_with_weak_etag)
+
+    async def send_with_gzip(self, message: Message):
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            # gzip holds data back until it has enough to compress, an event stream must reach the
+            # client as each event is sent, so it goes out as it is like an already encoded response
+            if content_type.startswith("text/event-stream"):
+                self.content_encoding_set = True
+
+
+# Compresses the HTML pages and JSON responses of at least minimum_size bytes for clients that
+# accept gzip. Static assets already carry their Content-Encoding and are passed through untouched
+class DynamicGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = DynamicGZipResponder(self.app, self.minimum_size, self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,82 @@
+import logging
+import time
+from starlette.datastructures import Headers
+from starlette.types import Message, Receive, Scope, Send
+from app.services.metrics import (
+    IN_FLIGHT,
+    REQUEST_DB_TIME,
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    REQUESTS,
+    QueryStats,
+    current_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Requests are labelled with the path of the route that answered them, e.g. /api/issues/{id},
+# so each ID does not become a series of its own. Mounted apps are labelled with their mount path
+def route_label(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope.get("root_path") or "unmatched"
+
+
+# Records the latency, status and SQL statements of every request. An event stream stays open for
+# as long as its client is connected, so it is timed to the response starting rather than to its end
+# and stops counting as in flight from then on, open streams are reported as helpdesk_event_streams
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        stats = QueryStats()
+        token = current_stats.set(stats)
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            IN_FLIGHT.dec()
+            elapsed = time.perf_counter() - started
+            method, route = scope["method"], route_label(scope)
+            REQUEST_DURATION.observe(elapsed, method, route)
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_DB_TIME.observe(stats.seconds, method, route)
+            logger.debug(
+                "request",
+                extra={
+                    "method": method,
+                    "route": route,
+                    "status": status,
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "queries": stats.queries,
+                    "db_ms": round(stats.seconds * 1000, 2),
+                },
+            )
+
+        async def send_with_metrics(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    record()
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            record()
+            current_stats.reset(token)
@@ -1,11 +1,42 @@
-from app.services.users import get_role_by_id
-from app.services.sessions import get_user_by_session
+from typing import Optional
+from fastapi import Cookie, Depends, HTTPException
+from app.database import get_async_db, get_db
+from app.schemas.session import Principal
+from app.services.sessions import get_principal
+from app.services.aio.sessions import get_principal as get_principal_async
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
+# FastAPI caches dependencies for the lifetime of a request,
+# so the sessionID cookie is resolved at most once however many times this is depended on.
+# None is returned when there is no valid session, leaving each route to decide how to respond
+def get_current_user(
+    sessionID: Optional[str] = Cookie(None), db: Session = Depends(get_db)
+) -> Optional[Principal]:
+    return get_principal(db, sessionID)
+
+
+# The same as get_current_user for routes running on the async database layer
+async def get_current_user_async(
+    sessionID: Optional[str] = Cookie(None), db: AsyncSession = Depends(get_async_db)
+) -> Optional[Principal]:
+    return await get_principal_async(db, sessionID)
+
+
+# For routes only admins may use. The check happens while dependencies are resolved,
+# before a route starts a response, which matters for routes that stream their body
+def get_current_admin(user: Optional[Principal] = Depends(get_current_user)) -> Principal:
+    if user is None or not user.is_admin:
+        raise HTTPException(
+            status_code=403, detail="User does not have necessary permission"
+        )
+    return user
+
+
 def role_check(protected: bool, session_id: str, db: Session):
-    userID = get_user_by_session(db, session_id)
-    userRole = get_role_by_id(db, userID)
+    # The role comes from the session cache, so a warm request does not query the users table
+    userRole = get_principal(db, session_id).is_admin
     if userRole == protected:
         return True
     else:
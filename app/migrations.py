@@ -0,0 +1,55 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from app.database import Base
+from app.models.Issuedb import ISSUES_FTS_DDL, ISSUES_SEARCH_INDEX_DDL, Issue as IssueDb
+
+
+# Indexes older versions of the models declared that no query uses
+OBSOLETE_INDEXES = [
+    "ix_issues_title",
+    "ix_issues_description",
+    "ix_issues_type",
+    "ix_sessions_session_id",
+]
+
+
+# create_all only creates tables that are missing, so a database.db made by an older version
+# of the app is brought up to date here. Every step checks first and is safe to run on each start up
+def run_migrations(engine: Engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        if "issues" in inspector.get_table_names():
+            columns = [column["name"] for column in inspector.get_columns("issues")]
+            if "created_at" not in columns:
+                column_type = IssueDb.__table__.c.created_at.type.compile(dialect=engine.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE issues ADD COLUMN created_at {column_type} NOT NULL "
+                        "DEFAULT '1970-01-01 00:00:00'"
+                    )
+                )
+                # Existing issues are spaced a second apart in the order they were inserted,
+                # so they keep the order they were listed in before
+                if engine.dialect.name == "sqlite":
+                    connection.execute(
+                        text(
+                            "UPDATE issues SET created_at = "
+                            "datetime('1970-01-01', '+' || rowid || ' seconds')"
+                        )
+                    )
+
+            # The search index is only created alongside a new issues table, so an existing
+            # one gets it here and is filled from the issues already in it
+            if engine.dialect.name == "sqlite" and "issues_fts" not in inspector.get_table_names():
+                for statement in ISSUES_FTS_DDL:
+                    connection.execute(text(statement))
+                connection.execute(text("INSERT INTO issues_fts(issues_fts) VALUES ('rebuild')"))
+            if engine.dialect.name == "postgresql":
+                connection.execute(text(ISSUES_SEARCH_INDEX_DDL))
+
+        for index in OBSOLETE_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
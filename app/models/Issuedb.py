@@ -1,7 +1,8 @@
-from sqlalchemy import Column, ForeignKey, String, Enum as dbEnum, Boolean
+from sqlalchemy import DDL, Column, DateTime, ForeignKey, Index, String, Enum as dbEnum, Boolean, event
 from sqlalchemy.orm import relationship
 from app.schemas.issue import IssueType
 from app.database import Base
+from datetime import datetime
 import uuid
 
 
@@ -9,10 +10,67 @@ class Issue(Base):
     __tablename__ = "issues"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    title = Column(String, index=True, nullable=False)
-    description = Column(String, index=True, nullable=False)
-    type = Column(dbEnum(IssueType), index=True, nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=False)
+    # Named so PostgreSQL creates it as a native ENUM type called issue_type, SQLite stores a VARCHAR
+    type = Column(dbEnum(IssueType, name="issue_type"), nullable=False)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     is_resolved = Column(Boolean, default=False, nullable=False)
+    # (created_at, id) is the stable ordering listings are paged by, id breaks ties between equal timestamps
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
 
     user = relationship("User", back_populates="issues")
+
+    # The indexes follow the queries in services/issues.py. Each one ends in (created_at, id) so a
+    # page starts straight after the cursor and comes out of the index already in order.
+    # title and description are not indexed, they are only ever searched through issues_fts
+    __table_args__ = (
+        Index("ix_issues_created_at_id", "created_at", "id"),
+        # Listings for one user, and the lookup of a user's issues when they are deleted
+        Index("ix_issues_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Admin triage, e.g. the open issues of one type. Filtering on one of the two alone needs an
+        # index of its own, the composite would leave the matches to be sorted for every page
+        Index("ix_issues_is_resolved_type_created_at_id", "is_resolved", "type", "created_at", "id"),
+        Index("ix_issues_is_resolved_created_at_id", "is_resolved", "created_at", "id"),
+        Index("ix_issues_type_created_at_id", "type", "created_at", "id"),
+    )
+
+
+# Full-text index over title and description used by ?q= searches. It is an external content
+# table, it only holds the index and reads the text back from issues by rowid, and the triggers
+# keep it in step with every insert, update and delete. issues has no INTEGER PRIMARY KEY so a
+# VACUUM may renumber its rowids, run INSERT INTO issues_fts(issues_fts) VALUES('rebuild') after one
+ISSUES_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5("
+    "title, description, content='issues', content_rowid='rowid')",
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_insert AFTER INSERT ON issues BEGIN "
+    "INSERT INTO issues_fts(rowid, title, description) "
+    "VALUES (new.rowid, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_delete AFTER DELETE ON issues BEGIN "
+    "INSERT INTO issues_fts(issues_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS issues_fts_update AFTER UPDATE OF title, description ON issues BEGIN "
+    "INSERT INTO issues_fts(issues_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); "
+    "INSERT INTO issues_fts(rowid, title, description) "
+    "VALUES (new.rowid, new.title, new.description); END",
+]
+
+# PostgreSQL has no issues_fts, searches match this expression instead and it is indexed with GIN
+ISSUES_TSVECTOR = "to_tsvector('simple', title || ' ' || description)"
+ISSUES_SEARCH_INDEX_DDL = (
+    f"CREATE INDEX IF NOT EXISTS ix_issues_search ON issues USING gin ({ISSUES_TSVECTOR})"
+)
+
+for statement in ISSUES_FTS_DDL:
+    event.listen(Issue.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    Issue.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS issues_fts").execute_if(dialect="sqlite"),
+)
+event.listen(
+    Issue.__table__,
+    "after_create",
+    DDL(ISSUES_SEARCH_INDEX_DDL).execute_if(dialect="postgresql"),
+)
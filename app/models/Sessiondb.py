@@ -1,4 +1,5 @@
 from sqlalchemy import Column, String, DateTime
+from app.config import config
 from app.database import Base
 import uuid
 from datetime import datetime, timedelta
@@ -8,14 +9,17 @@ class Session(Base):
     __tablename__ = "sessions"
 
     user_id = Column(String, nullable=False)
+    # The primary key already gives session_id a unique index, so it is not declared again
     session_id = Column(
         String,
-        unique=True,
-        index=True,
         primary_key=True,
         default=lambda: str(uuid.uuid4()),
         nullable=False,
     )
+    # Indexed for the purge of expired sessions
     expire_time = Column(
-        DateTime, nullable=False, default=lambda: datetime.now() + timedelta(minutes=30)
+        DateTime,
+        index=True,
+        nullable=False,
+        default=lambda: datetime.now() + timedelta(minutes=config.SESSION_TTL_MINUTES),
     )
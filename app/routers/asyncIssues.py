@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.middleware.caching import cached_response_async
+from app.middleware.sessionMangement import get_current_user_async
+from app.config import config
+from app.schemas.issue import IssuePage, IssuesByUserPage, IssueType
+from app.schemas.session import Principal
+from app.services.aio.issues import get_issue_rows_page, get_issues_page
+from app.services.aio.users import check_if_user_exists
+from app.database import get_async_db
+from app.services.serialization import encode_issue_page
+
+
+# The issue listings on the async database layer, main.py includes this router ahead of
+# app/routers/issues.py when ASYNC_DATABASE is set so these routes take precedence
+router = APIRouter()
+
+
+async def render_page(
+    model,
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str],
+    user_id: Optional[str] = None,
+    **filters,
+) -> bytes:
+    try:
+        if config.FAST_JSON_LISTINGS:
+            page = await get_issue_rows_page(db, limit, cursor, user_id, **filters)
+            return encode_issue_page(page)
+        page = await get_issues_page(db, limit, cursor, user_id, **filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return model.model_validate(page, from_attributes=True).model_dump_json().encode()
+
+
+@router.get("/{user_id}")
+async def get_by_user_async(
+    user_id: str,
+    limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    type: Optional[IssueType] = None,
+    is_resolved: Optional[bool] = None,
+    q: Optional[str] = Query(None, max_length=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[Principal] = Depends(get_current_user_async),
+) -> IssuesByUserPage:
+    if user is not None and (user.user_id == user_id or user.is_admin):
+        if user.user_id != user_id and not await check_if_user_exists(db, user_id):
+            raise HTTPException(status_code=404, detail="ID of user not found")
+        body = await render_page(
+            IssuesByUserPage,
+            db,
+            limit,
+            cursor,
+            user_id,
+            type=type,
+            is_resolved=is_resolved,
+            search=q,
+        )
+        return Response(body, media_type="application/json")
+    else:
+        raise HTTPException(
+            status_code=403, detail="User does not have necessary permission"
+        )
+
+
+@router.get("/")
+async def get_issues_async(
+    request: Request,
+    limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    type: Optional[IssueType] = None,
+    is_resolved: Optional[bool] = None,
+    q: Optional[str] = Query(None, max_length=200),
+    owner: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[Principal] = Depends(get_current_user_async),
+) -> IssuePage:
+    if user is not None and user.is_admin:
+
+        async def render():
+            return await render_page(
+                IssuePage, db, limit, cursor, owner, type=type, is_resolved=is_resolved, search=q
+            )
+
+        # Shares the listing cache, and its keys, with app/routers/issues.py
+        key = ("issues", limit, cursor, type, is_resolved, q, owner)
+        return await cached_response_async(request, key, render)
+    else:
+        raise HTTPException(
+            status_code=403, detail="User does not have necessary permission"
+        )
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Cookie, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from sqlalchemy.orm import Session
+import asyncio
+from app.config import config
+from app.database import SessionLocal, get_db
+from app.middleware.sessionMangement import get_current_user
+from app.schemas.session import Principal
+from app.services.events import Subscription, broadcaster
+from app.services.sessions import get_principal
+
+
+router = APIRouter()
+
+
+# Looks the session up again without renewing it, holding a stream open is not the user being active.
+# A warm session is answered from the session cache, which logging out and deleting or promoting
+# the user all invalidate
+def resolve_session(session_id: str) -> Optional[Principal]:
+    db = SessionLocal()
+    try:
+        return get_principal(db, session_id, renew=False)
+    finally:
+        db.close()
+
+
+# The stream lasts as long as the session behind it: it ends when the session expires, and on the
+# first keepalive after it is logged out, revoked, its user deleted or their role changed.
+# resolve returns the session's principal, or None once it no longer resolves
+async def event_stream(
+    subscription: Subscription,
+    expiry: datetime,
+    resolve: Callable[[], Awaitable[Optional[Principal]]],
+):
+    try:
+        # Tells the browser how long to wait before reconnecting if the stream drops
+        yield "retry: 5000\n\n"
+        while True:
+            remaining = max((expiry - datetime.now()).total_seconds(), 0)
+            try:
+                message = await asyncio.wait_for(
+                    subscription.queue.get(), min(config.EVENT_KEEPALIVE, remaining)
+                )
+                yield f"event: issues\ndata: {message}\n\n"
+                continue
+            except asyncio.TimeoutError:
+                pass
+            principal = await resolve()
+            if (
+                principal is None
+                or principal.expiry <= datetime.now()
+                or principal.is_admin != subscription.is_admin
+            ):
+                return
+            # A sliding session may have been renewed by the user's other requests
+            expiry = principal.expiry
+            # A comment line keeps proxies from closing a stream that has been quiet a while
+            yield ": keepalive\n\n"
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+# A server-sent event stream of changes to the issues the user can see, all of them for admins.
+# Each message is a JSON array of changes: created, updated and resolved (with the issue as the
+# listings return it), deleted (with its ID), or reload when the client should fetch its listing
+# again. The stream waits on the event loop, so an idle client holds no thread and, as the
+# session is closed before streaming starts, no database connection
+@router.get("/issues")
+async def issue_events(
+    sessionID: Optional[str] = Cookie(None),
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+):
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid session token provided")
+    db.close()
+
+    async def resolve():
+        return await run_in_threadpool(resolve_session, sessionID)
+
+    return StreamingResponse(
+        event_stream(broadcaster.subscribe(user), user.expiry, resolve),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
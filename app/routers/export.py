@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.middleware.sessionMangement import get_current_admin
+from app.schemas.issue import ExportFormat, IssueType
+from app.schemas.session import Principal
+from app.services.export import stream_issues
+from app.database import get_db
+
+
+# Exports for reporting, they live apart from app/routers/issues.py
+# so their paths cannot be taken for a user_id by the listing routes
+router = APIRouter()
+
+MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
+
+
+# Every issue matching the filters as NDJSON (one JSON object per line) or CSV, streamed as it is read
+@router.get("/issues")
+def export_issues(
+    format: ExportFormat = ExportFormat.NDJSON,
+    type: Optional[IssueType] = None,
+    is_resolved: Optional[bool] = None,
+    q: Optional[str] = Query(None, max_length=200),
+    owner: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user: Principal = Depends(get_current_admin),
+):
+    rows = stream_issues(
+        db, format, user_id=owner, type=type, is_resolved=is_resolved, search=q
+    )
+    return StreamingResponse(
+        rows,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="issues.{format.value}"'},
+    )
@@ -1,49 +1,127 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, Form, Cookie
+import logging
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, Form, Query
 from typing import Annotated
 from fastapi.responses import HTMLResponse
-from app.middleware.sessionMangement import role_check
+from app.middleware.caching import cached_response
+from app.middleware.sessionMangement import get_current_user
 from app.schemas.issue import *
+from app.schemas.session import Principal
 from app.services.issues import *
-from app.services.users import check_if_user_exists, get_role_by_id
-from app.services.sessions import check_if_session_exists, get_user_by_session
+from app.services.serialization import encode_issue_page
+from app.services.users import check_if_user_exists
 from app.database import get_db
+from app.config import config
 
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
+# Routes are plain functions rather than async ones because the SQLAlchemy session blocks,
+# FastAPI runs them on its threadpool so a slow query does not stall the event loop.
 # Within the codebase Form() is used extensively,
 # this is because to directly send HTML form data to the server the correct types need to be used
 # Directly sending HTML form data heavily simplifies the code as there is no need for converting the data at any point.
 @router.post("/")
-async def post_issue(
+def post_issue(
     request: Request,
     title: Annotated[str, Form()],
     type: Annotated[IssueType, Form()],
     description: Annotated[str, Form()],
     db: Session = Depends(get_db),
-    sessionID: str = Cookie(None),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
-    try:
-        userId = get_user_by_session(db, sessionID)
-        print(userId)
-        return create_issue(db, title, description, type, userId)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid session token provided")
+    return create_issue(db, title, description, type, user.user_id)
 
-    except:
+
+# The bulk routes authorise once for the whole batch and apply it in a single transaction,
+# the result lists what happened to each item. Any signed in user can create issues in bulk,
+# as with post_issue they are owned by that user
+@router.post("/bulk")
+def post_issues(
+    body: BulkCreateIssues,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+) -> BulkResult:
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid session token provided")
+    return {"results": create_issues(db, body.issues, user.user_id)}
+
+
+# Resolving and deleting in bulk are admin only, like their single issue routes
+@router.patch("/bulk/resolve")
+def resolve_bulk(
+    body: BulkIssueIds,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+) -> BulkResult:
+    if user is not None and user.is_admin:
+        return {"results": resolve_issues(db, body.ids)}
+    else:
+        raise HTTPException(
+            status_code=403, detail="User does not have necessary permission"
+        )
+
+
+@router.post("/bulk/delete")
+def delete_bulk(
+    body: BulkIssueIds,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+) -> BulkResult:
+    if user is not None and user.is_admin:
+        return {"results": delete_issues(db, body.ids)}
+    else:
+        raise HTTPException(
+            status_code=403, detail="User does not have necessary permission"
+        )
+
+
+# Listings are paged, the next_cursor of one page is passed as cursor to get the next.
+# They can be narrowed with ?type=, ?is_resolved= and a free text ?q= over title and description,
+# a cursor is only valid for the filters it was returned with.
+# A page is rendered to JSON here and returned as a Response, which FastAPI sends as it is.
+# The routes still declare their page model, so it is what the OpenAPI schema documents
+def render_page(
+    model, db: Session, limit: int, cursor: Optional[str], user_id: Optional[str] = None, **filters
+) -> bytes:
+    try:
+        if config.FAST_JSON_LISTINGS:
+            return encode_issue_page(get_issue_rows_page(db, limit, cursor, user_id, **filters))
+        page = get_issues_page(db, limit, cursor, user_id, **filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return model.model_validate(page, from_attributes=True).model_dump_json().encode()
 
 
 @router.get("/{user_id}")
-async def get_by_user(
-    user_id: str, db: Session = Depends(get_db), sessionID: str = Cookie(None)
-) -> list[GetIssuesByUserResponse]:
-    if (
-        get_user_by_session(db, sessionID) == user_id
-        or role_check(True, sessionID, db) == True
-    ):
-        if not check_if_user_exists(db, user_id):
+def get_by_user(
+    user_id: str,
+    limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    type: Optional[IssueType] = None,
+    is_resolved: Optional[bool] = None,
+    q: Optional[str] = Query(None, max_length=200),
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+) -> IssuesByUserPage:
+    if user is not None and (user.user_id == user_id or user.is_admin):
+        # A user asking for their own issues is known to exist, so only admins need the lookup
+        if user.user_id != user_id and not check_if_user_exists(db, user_id):
             raise HTTPException(status_code=404, detail="ID of user not found")
-        return get_issues_by_user(db, user_id)
+        body = render_page(
+            IssuesByUserPage,
+            db,
+            limit,
+            cursor,
+            user_id,
+            type=type,
+            is_resolved=is_resolved,
+            search=q,
+        )
+        return Response(body, media_type="application/json")
     else:
         raise HTTPException(
             status_code=403, detail="User does not have necessary permission"
@@ -51,23 +129,28 @@ async def get_by_user(
 
 
 @router.get("/")
-async def get_issues(
-    db: Session = Depends(get_db), sessionID: str = Cookie(None)
-) -> list[GetIssuesResponse]:
-    try:
-        is_admin = role_check(True, sessionID, db)
-        print(is_admin)
-        if is_admin:
-            if not check_if_user_exists(db, get_user_by_session(db, sessionID)):
-                raise HTTPException(status_code=404, detail="ID of user not found")
-            return get_all_issues(db)
-
-        else:
-            raise HTTPException(
-                status_code=403, detail="User does not have necessary permission"
+def get_issues(
+    request: Request,
+    limit: int = Query(config.PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    type: Optional[IssueType] = None,
+    is_resolved: Optional[bool] = None,
+    q: Optional[str] = Query(None, max_length=200),
+    owner: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+) -> IssuePage:
+    if user is not None and user.is_admin:
+
+        def render():
+            return render_page(
+                IssuePage, db, limit, cursor, owner, type=type, is_resolved=is_resolved, search=q
             )
-    except Exception as err:
-        print(err)
+
+        # Every admin sees the same listing, so the cache is keyed by the query alone
+        key = ("issues", limit, cursor, type, is_resolved, q, owner)
+        return cached_response(request, key, render)
+    else:
         raise HTTPException(
             status_code=403, detail="User does not have necessary permission"
         )
@@ -75,34 +158,29 @@ async def get_issues(
 
 @router.patch("/{id}")
 # The "= None" ensures the user can update as many or as little values as they want without errors
-async def patch_issue(
+def patch_issue(
     id: str,
     title: Annotated[Optional[str], Form()] = None,
     type: Annotated[Optional[IssueType], Form()] = None,
     description: Annotated[Optional[str], Form()] = None,
     db: Session = Depends(get_db),
-    sessionID: str = Cookie(None),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
     try:
-        userId = get_user_by_session(db, sessionID)
-        userRole = get_role_by_id(db, userId)
         userIssueId = get_user_by_issue_id(db, id)
-        if not check_if_issue_exists(db, id):
-            raise HTTPException(status_code=404, detail="ID of issue not found")
     except:
         raise HTTPException(
             status_code=403, detail="User does not have necessary permission"
         )
 
     # Checks if the Issue that is being updated is owned by the user that made the request or if the user is an admin, if not raise 403
-    if userIssueId == userId or userRole == True:
+    if user is not None and (userIssueId == user.user_id or user.is_admin):
         issue = {"title": title, "type": type, "description": description}
         # loops through each pair and filters out any pairs where the value is None
         filteredIssue = {
             key: value for key, value in issue.items() if value is not None
         }
-        print(filteredIssue)
-        print(sessionID)
+        logger.debug("updating issue", extra={"issue_id": id, "fields": sorted(filteredIssue)})
         try:
             update_issue(db, id, filteredIssue)
         except:
@@ -115,15 +193,13 @@ async def patch_issue(
 
 
 @router.delete("/{id}")
-async def delete(id: str, db: Session = Depends(get_db), sessionID: str = Cookie(None)):
-    try:
-        is_admin = role_check(True, sessionID, db)
-    except:
-        raise HTTPException(
-            status_code=403, detail="User does not have necessary permission"
-        )
+def delete(
+    id: str,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
+):
     # As only admins can delete, this check ensures the user is an admin
-    if is_admin:
+    if user is not None and user.is_admin:
         if not check_if_issue_exists(db, id):
             raise HTTPException(status_code=404, detail="ID of issue not found")
         delete_issue(db, id)
@@ -135,17 +211,12 @@ async def delete(id: str, db: Session = Depends(get_db), sessionID: str = Cookie
 
 # Used to resolve an issue if a solution is found
 @router.patch("/resolve/{id}")
-async def resolve(
-    id: str, db: Session = Depends(get_db), sessionID: str = Cookie(None)
+def resolve(
+    id: str,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
-    try:
-        is_admin = role_check(True, sessionID, db)
-    except:
-        raise HTTPException(
-            status_code=403, detail="User does not have necessary permission"
-        )
-
-    if is_admin:
+    if user is not None and user.is_admin:
         if not check_if_issue_exists(db, id):
             raise HTTPException(status_code=404, detail="ID of issue not found")
         resolve_issue(db, id)
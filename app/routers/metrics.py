@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.metrics import render
+
+
+# Prometheus metrics for this worker process, each worker is scraped separately. Only included
+# with METRICS_ENABLED, the metrics describe the app's traffic and are not meant for its users
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -1,25 +1,26 @@
+import logging
 from typing import Optional
-from fastapi import APIRouter, Request, Depends, Cookie
+from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from app.services.users import get_role_by_id, get_users, get_role_by_id
+from app.services.users import get_users
 from app.database import get_db
-from app.services.issues import get_all_issues, get_issues_by_user
-from app.services.sessions import check_if_session_exists, get_user_by_session
+from app.config import config
+from app.services.issues import get_issue_cards_page
+from app.schemas.session import Principal
 from sqlalchemy.orm import Session
-from app.middleware.sessionMangement import role_check
+from app.middleware.caching import cached_response
+from app.middleware.sessionMangement import get_current_user
+from app.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+logger = logging.getLogger(__name__)
 
 
 @router.get("/", response_class=HTMLResponse)
-def home_page(
-    req: Request, sessionID: Optional[str] = Cookie(None), db: Session = Depends(get_db)
-):
+def home_page(req: Request, user: Optional[Principal] = Depends(get_current_user)):
     context = {"request": req}
     # This check means a user must be logged in to view this page
-    if check_if_session_exists(db, sessionID):
+    if user is not None:
         return templates.TemplateResponse(name="index.html", request=req)
     else:
         return templates.TemplateResponse("unauthorised.html", context)
@@ -27,23 +28,28 @@ def home_page(
 
 @router.get("/issues", response_class=HTMLResponse)
 def issues_page(
-    req: Request, db: Session = Depends(get_db), sessionID: Optional[str] = Cookie(None)
+    req: Request,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
     context = {"request": req}
     try:
 
-        if check_if_session_exists(db, sessionID):
-            issues = get_issues_by_user(db, get_user_by_session(db, sessionID))
-            user_id = get_user_by_session(db, sessionID)
-            is_admin = role_check(True, sessionID, db)
+        if user is not None:
+            # Only the first page is rendered, the page fetches the rest from the API as it is needed
+            issues = get_issue_cards_page(db, config.PAGE_SIZE, user_id=user.user_id)
             context = {
                 "request": req,
-                "issues": issues,
-                "user_id": user_id,
+                "issues": issues["items"],
+                "next_cursor": issues["next_cursor"],
+                "user_id": user.user_id,
                 "page": "issues",
-                "is_admin": is_admin,
+                "is_admin": user.is_admin,
             }
-            print(context)
+            logger.debug(
+                "rendering issues page",
+                extra={"user_id": user.user_id, "issues": len(issues["items"])},
+            )
             return templates.TemplateResponse("issues.html", context)
         else:
 
@@ -54,22 +60,21 @@ def issues_page(
 
 @router.get("/directory", response_class=HTMLResponse)
 def directory_page(
-    req: Request, db: Session = Depends(get_db), sessionID: Optional[str] = Cookie(None)
+    req: Request,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
     context = {"request": req}
     try:
-        if check_if_session_exists(db, sessionID):
+        if user is not None:
             users = get_users(db)
-            is_admin = role_check(True, sessionID, db)
-            user_id = get_user_by_session(db, sessionID)
-            user_role = get_role_by_id(db, get_user_by_session(db, sessionID))
             context = {
                 "request": req,
                 "users": users,
-                "role": user_role,
-                "is_admin": is_admin,
+                "role": user.is_admin,
+                "is_admin": user.is_admin,
                 "page": "directory",
-                "user_id": user_id,
+                "user_id": user.user_id,
             }
             return templates.TemplateResponse("userDirectory.html", context)
         else:
@@ -85,26 +90,30 @@ def login_page(req: Request):
 
 
 @router.get("/manage", response_class=HTMLResponse)
-async def manage_page(
-    req: Request, db: Session = Depends(get_db), sessionID: Optional[str] = Cookie(None)
+def manage_page(
+    req: Request,
+    db: Session = Depends(get_db),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
     context = {"request": req}
     try:
-        # SessionID is obtained via cookies
-        is_admin = role_check(True, sessionID, db)
         # This check insures only admin users are able to access this site
-        if is_admin:
-            issues = get_all_issues(db)
-            user_id = get_user_by_session(db, sessionID)
-            context = {
-                "request": req,
-                "issues": issues,
-                "is_admin": is_admin,
-                "page": "manage",
-                "user_id": user_id,
-            }
-            # returns the admin page
-            return templates.TemplateResponse("manage.html", context)
+        if user is not None and user.is_admin:
+
+            def render():
+                issues = get_issue_cards_page(db, config.PAGE_SIZE)
+                context = {
+                    "request": req,
+                    "issues": issues["items"],
+                    "next_cursor": issues["next_cursor"],
+                    "is_admin": user.is_admin,
+                    "page": "manage",
+                    "user_id": user.user_id,
+                }
+                return templates.TemplateResponse("manage.html", context).body
+
+            # returns the admin page, rendered again only once an issue has changed
+            return cached_response(req, ("manage", user.user_id), render, "text/html")
         else:
             # If the user is not an admin they will be taken to the unauthorised page
             return templates.TemplateResponse("unauthorised.html", context)
@@ -113,6 +122,6 @@ async def manage_page(
 
 
 @router.get("/register", response_class=HTMLResponse)
-async def register_page(req: Request):
+def register_page(req: Request):
     context = {"request": req}
     return templates.TemplateResponse("register.html", context)
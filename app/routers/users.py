@@ -1,47 +1,42 @@
-from argon2 import PasswordHasher
+import logging
 from fastapi import APIRouter, Cookie, Request, Depends, HTTPException, Response, Form
 from typing import Annotated, Optional
 from fastapi.responses import HTMLResponse
 from app.config import config
 from app.services.users import *
 from app.services.sessions import *
+from app.services.hashing import hashing_pool
 from app.schemas.user import *
-from app.middleware.sessionMangement import role_check
+from app.schemas.session import Principal
+from app.middleware.sessionMangement import get_current_user
 from app.database import get_db
 from sqlalchemy.exc import IntegrityError
 import re
 import hashlib
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.get("/")
-async def get_all_users(
-    db: Session = Depends(get_db), sessionID: str = Cookie(None)
+def get_all_users(
+    db: Session = Depends(get_db), user: Optional[Principal] = Depends(get_current_user)
 ) -> list[GetAllUsersResponse]:
-    try:
-        print(check_if_session_exists(db, sessionID))
-        if check_if_session_exists(db, sessionID):
-
-            return get_users(db)
-        else:
-            raise HTTPException(
-                status_code=403, detail="User does not have necessary permission"
-            )
-    except Exception as err:
+    if user is not None:
+        return get_users(db)
+    else:
         raise HTTPException(
             status_code=403, detail="User does not have necessary permission"
         )
 
 
 @router.post("/register")
-async def register(
+def register(
     email: Annotated[str, Form()],
     password: Annotated[str, Form()],
     db: Session = Depends(get_db),
 ):
     password_format = r"^(?=.*[0-9])(?=.*[a-z])(?=.*[A-Z])(?=.*\W)(?!.* ).{8,16}$"
-    ph = PasswordHasher()
     if email == "" or password == "":
         raise HTTPException(
             status_code=400, detail="Email or password entered is not valid format"
@@ -57,75 +52,62 @@ async def register(
         )
     try:
 
-        hashed_password = ph.hash(password)
+        hashed_password = hashing_pool.hash(password)
         create_user(db, email, hashed_password)
-    except IntegrityError as err:
-        print(err)
+    except IntegrityError:
+        logger.info("registration rejected, email already registered")
         raise HTTPException(status_code=422)
 
 
 @router.patch("/promote/{id}")
-async def promote(
+def promote(
     request: Request,
     id: str,
     db: Session = Depends(get_db),
-    sessionID: str = Cookie(None),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
-    try:
-        is_admin = role_check(True, sessionID, db)
-        if is_admin:
-            if not check_if_user_exists(db, id):
-                raise HTTPException(status_code=404, detail="ID of user not found")
-            if get_role_by_id(db, id) == True:
-                raise HTTPException(status_code=403, detail="User is already an admin")
-
-            promote_user(db, id)
-            return {"message": "User has been successfully promoted"}
-        else:
-            raise HTTPException(status_code=400, detail="User already an admin")
-    except Exception as err:
-        print(err)
+    if user is not None and user.is_admin:
+        if not check_if_user_exists(db, id):
+            raise HTTPException(status_code=404, detail="ID of user not found")
+        if get_role_by_id(db, id) == True:
+            raise HTTPException(status_code=400, detail="User is already an admin")
+
+        promote_user(db, id)
+        return {"message": "User has been successfully promoted"}
+    else:
         raise HTTPException(
             status_code=403, detail="User does not have necessary permission"
         )
 
 
 @router.delete("/{id}")
-async def delete(
+def delete(
     request: Request,
     id: str,
     db: Session = Depends(get_db),
-    sessionID: str = Cookie(None),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
-    try:
-        is_admin = role_check(True, sessionID, db)
-        if is_admin:
-            if not check_if_user_exists(db, id):
-                raise HTTPException(status_code=404, detail="ID of user not found")
-            delete_user(db, id)
-            return {"message": "User has been successfully deleted"}
-        else:
-            raise HTTPException(
-                status_code=403, detail="User does not have necessary permission"
-            )
-    except Exception as err:
-        print(err)
+    if user is not None and user.is_admin:
+        if not check_if_user_exists(db, id):
+            raise HTTPException(status_code=404, detail="ID of user not found")
+        delete_user(db, id)
+        return {"message": "User has been successfully deleted"}
+    else:
         raise HTTPException(
             status_code=403, detail="User does not have necessary permission"
         )
 
 
 @router.post("/login")
-async def login(
+def login(
     response: Response,
     email: Annotated[str, Form()],
     password: Annotated[str, Form()],
     db: Session = Depends(get_db),
 ):
-    ph = PasswordHasher()
     if email == "admintest@test.com" and password == "test1A$c34":
         if not check_if_User_exists_by_email(db, email):
-            hashed_password = ph.hash(f"{password}")
+            hashed_password = hashing_pool.hash(f"{password}")
             create_user(db, email, hashed_password, True)
     # Checks if values have been entered
     if email == "" or password == "":
@@ -151,22 +133,22 @@ async def login(
 
 
 @router.post("/getid")
-async def get_id(
+def get_id(
     response: Response,
     email: Annotated[str, Form()],
     db: Session = Depends(get_db),
-    sessionID: str = Cookie(None),
+    user: Optional[Principal] = Depends(get_current_user),
 ):
     try:
         # This checks if the sessionID in the request and stored client side is valid
-        if check_if_session_exists(db, sessionID):
+        if user is not None:
             return get_id_by_email(db, email)
     except:
         raise HTTPException(status_code=404, detail="session does not exist")
 
 
 @router.post("/logout")
-async def logout(
+def logout(
     response: Response,
     sessionID: str = Cookie(None),
     db: Session = Depends(get_db),
@@ -1,7 +1,9 @@
+from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.config import config
 from app.schemas.user import GetAllUsersResponse
 
 
@@ -44,10 +46,66 @@ class GetIssuesResponse(IssueBase):
         from_attributes = True
 
 
+# A page of a listing, next_cursor is passed back as ?cursor= to get the following page
+# and is None on the last page
+class IssuePage(BaseModel):
+    items: list[GetIssuesResponse]
+    next_cursor: Optional[str] = None
+
+
+class IssuesByUserPage(BaseModel):
+    items: list[GetIssuesByUserResponse]
+    next_cursor: Optional[str] = None
+
+
 class CreateIssue(IssueBase):
     user_id: str
 
 
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+# Bulk requests are JSON rather than form data, every item is validated before any is applied
+class BulkIssue(IssueBase):
+    title: str = Field(min_length=1)
+    description: str = Field(min_length=1)
+
+
+# A row of an issue import, the owner is given by email
+class ImportIssue(BulkIssue):
+    email: str
+    is_resolved: bool = False
+    created_at: Optional[datetime] = None
+
+
+class BulkCreateIssues(BaseModel):
+    issues: list[BulkIssue] = Field(min_length=1, max_length=config.MAX_BULK_SIZE)
+
+
+class BulkIssueIds(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=config.MAX_BULK_SIZE)
+
+
+class BulkStatus(str, Enum):
+    CREATED = "created"
+    RESOLVED = "resolved"
+    ALREADY_RESOLVED = "already_resolved"
+    DELETED = "deleted"
+    NOT_FOUND = "not_found"
+
+
+class BulkOutcome(BaseModel):
+    id: str
+    status: BulkStatus
+
+
+# One outcome per item, in the order the items were sent
+class BulkResult(BaseModel):
+    results: list[BulkOutcome]
+
+
 class ReadIssues(BaseModel):
     user_id: str
 
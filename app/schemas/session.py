@@ -0,0 +1,13 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+# The identity behind a sessionID, resolved once per request and shared by every route
+class Principal(BaseModel):
+    user_id: str
+    email: str
+    is_admin: bool
+    expiry: datetime
+
+    class Config:
+        frozen = True
@@ -19,6 +19,12 @@ class LoginUser(UserBase):
     password: str
 
 
+# A row of a user import, password is either plain text or an existing argon2 hash
+class ImportUser(UserBase):
+    password: str = Field(min_length=1)
+    isAdmin: bool = False
+
+
 class DeleteUser(BaseModel):
     id: str
 
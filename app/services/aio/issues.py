@@ -0,0 +1,108 @@
+import logging
+from typing import List, Optional
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.Issuedb import Issue as IssueDb
+from app.schemas.issue import IssueType
+from app.services.cache import listing_cache
+from app.services.events import broadcaster, deleted_event, issue_event
+from app.services.issues import (
+    IssueCard,
+    issue_rows_page_query,
+    issues_page_query,
+    listing_query,
+    to_cards,
+    to_page,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async versions of app/services/issues.py.
+# Relationships cannot be lazy loaded on an AsyncSession, so queries reading Issue.user load it up front
+
+
+async def get_issues_by_user(db: AsyncSession, id: str) -> List[IssueCard]:
+    return to_cards(await db.execute(listing_query().where(IssueDb.user_id == id)))
+
+
+async def get_issues_page(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **filters,
+) -> dict:
+    dialect = db.get_bind().dialect.name
+    result = await db.scalars(issues_page_query(limit, cursor, user_id, dialect=dialect, **filters))
+    return to_page(result.all(), limit)
+
+
+async def get_issue_rows_page(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **filters,
+) -> dict:
+    dialect = db.get_bind().dialect.name
+    result = await db.execute(
+        issue_rows_page_query(limit, cursor, user_id, dialect=dialect, **filters)
+    )
+    return to_page(result.all(), limit)
+
+
+async def publish_change(db: AsyncSession, op: str, id: str):
+    if not broadcaster.active:
+        return
+    try:
+        row = (await db.execute(listing_query().where(IssueDb.id == id))).first()
+        if row is not None:
+            broadcaster.publish([issue_event(op, row)])
+    except Exception:
+        logger.exception("publishing an issue change failed", extra={"issue_id": id})
+
+
+async def create_issue(
+    db: AsyncSession, title: str, description: str, type: IssueType, user_id: str
+):
+    newIssue = IssueDb(
+        title=title, description=description, type=type.value, user_id=user_id
+    )
+    db.add(newIssue)
+    await db.commit()
+    listing_cache.invalidate()
+    await publish_change(db, "created", newIssue.id)
+    return newIssue.id
+
+
+async def get_Issue_by_id(db: AsyncSession, id: str):
+    return await db.scalar(select(IssueDb).where(IssueDb.id == id))
+
+
+async def update_issue(db: AsyncSession, id: str, toUpdate):
+    await db.execute(update(IssueDb).where(IssueDb.id == id).values(toUpdate))
+    await db.commit()
+    listing_cache.invalidate()
+    await publish_change(db, "updated", id)
+
+
+async def delete_issue(db: AsyncSession, id: str):
+    owner = await db.scalar(delete(IssueDb).where(IssueDb.id == id).returning(IssueDb.user_id))
+    await db.commit()
+    listing_cache.invalidate()
+    broadcaster.publish([deleted_event(id, owner)])
+
+
+async def check_if_issue_exists(db: AsyncSession, id: str):
+    return await db.scalar(select(exists().where(IssueDb.id == id)))
+
+
+async def get_user_by_issue_id(db: AsyncSession, issueId: str):
+    return await db.scalar(select(IssueDb.user_id).where(IssueDb.id == issueId))
+
+
+async def resolve_issue(db: AsyncSession, id: str):
+    await db.execute(update(IssueDb).where(IssueDb.id == id).values(is_resolved=True))
+    await db.commit()
+    listing_cache.invalidate()
+    await publish_change(db, "resolved", id)
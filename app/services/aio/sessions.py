@@ -0,0 +1,77 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.Sessiondb import Session as SessionDb
+from app.models.Userdb import User as UserDb
+from app.schemas.session import Principal
+from app.services.cache import session_cache
+from app.services.aio.users import get_user
+from app.services.sessions import needs_renewal, renewed_expiry
+
+# Async versions of app/services/sessions.py, sharing the same session cache
+
+
+async def create_session(db: AsyncSession, user_id: str):
+    session = SessionDb(user_id=user_id)
+    db.add(session)
+    await db.commit()
+    user = await get_user(db, user_id)
+    session_cache.set(
+        session.session_id,
+        Principal(
+            user_id=user.id,
+            email=user.email,
+            is_admin=user.isAdmin,
+            expiry=session.expire_time,
+        ),
+    )
+    return session.session_id
+
+
+async def renew_session(db: AsyncSession, session_id: str, principal: Principal) -> Principal:
+    expiry = renewed_expiry()
+    await db.execute(
+        update(SessionDb).where(SessionDb.session_id == session_id).values(expire_time=expiry)
+    )
+    await db.commit()
+    principal = principal.model_copy(update={"expiry": expiry})
+    session_cache.set(session_id, principal)
+    return principal
+
+
+async def get_principal(db: AsyncSession, session_id: str) -> Optional[Principal]:
+    if session_id is None:
+        return None
+    principal = session_cache.get(session_id)
+    if principal is None:
+        result = await db.execute(
+            select(SessionDb.user_id, UserDb.email, UserDb.isAdmin, SessionDb.expire_time)
+            .join(UserDb, UserDb.id == SessionDb.user_id)
+            .where(SessionDb.session_id == session_id, SessionDb.expire_time > datetime.now())
+        )
+        row = result.first()
+        if row is None:
+            return None
+        principal = Principal(
+            user_id=row.user_id, email=row.email, is_admin=row.isAdmin, expiry=row.expire_time
+        )
+        session_cache.set(session_id, principal)
+    if needs_renewal(principal):
+        principal = await renew_session(db, session_id, principal)
+    return principal
+
+
+async def get_user_by_session(db: AsyncSession, session_id: str) -> str:
+    session = await get_principal(db, session_id)
+    return session.user_id
+
+
+async def delete_session(db: AsyncSession, session_id: str):
+    await db.execute(delete(SessionDb).where(SessionDb.session_id == session_id))
+    await db.commit()
+    session_cache.invalidate(session_id)
+
+
+async def check_if_session_exists(db: AsyncSession, id: str):
+    return await get_principal(db, id) is not None
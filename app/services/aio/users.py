@@ -0,0 +1,73 @@
+import asyncio
+from typing import List
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.Userdb import User as UserDb
+from app.services.cache import listing_cache, session_cache
+from app.services.events import broadcaster, reload_event
+from app.services.hashing import hashing_pool
+from app.services.users import UserCard
+
+# Async versions of app/services/users.py
+
+
+async def create_user(db: AsyncSession, email: str, password: str, isAdmin: bool = False):
+    user = UserDb(email=email, password=password, isAdmin=isAdmin)
+    db.add(user)
+    await db.commit()
+
+
+async def delete_user(db: AsyncSession, id: str):
+    toDelete = await db.scalar(select(UserDb).where(UserDb.id == id))
+    await db.delete(toDelete)
+    await db.commit()
+    listing_cache.invalidate()
+    session_cache.invalidate_user(id)
+    # Their issues went with them
+    broadcaster.publish([reload_event(id)])
+
+
+async def update_user(db: AsyncSession, id: str, toUpdate):
+    await db.execute(update(UserDb).where(UserDb.id == id).values(toUpdate))
+    await db.commit()
+    listing_cache.invalidate()
+
+
+async def get_users(db: AsyncSession) -> List[UserCard]:
+    rows = await db.execute(select(UserDb.id, UserDb.email, UserDb.isAdmin))
+    return [UserCard(id, email, is_admin) for id, email, is_admin in rows]
+
+
+async def promote_user(db: AsyncSession, id: str):
+    await db.execute(update(UserDb).where(UserDb.id == id).values(isAdmin=True))
+    await db.commit()
+    listing_cache.invalidate()
+    session_cache.invalidate_user(id)
+
+
+async def get_user(db: AsyncSession, id: str):
+    return await db.scalar(select(UserDb).where(UserDb.id == id))
+
+
+async def check_if_user_exists(db: AsyncSession, id: str):
+    return await db.scalar(select(exists().where(UserDb.id == id)))
+
+
+async def check_if_User_exists_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(exists().where(UserDb.email == email)))
+
+
+# The hashing pool blocks until a worker has an answer, so it is waited on from a thread
+async def check_password(db: AsyncSession, password: str, email: str):
+    hashed_password = await db.scalar(select(UserDb.password).where(UserDb.email == email))
+    if hashed_password is None:
+        return False
+    return await asyncio.to_thread(hashing_pool.verify, hashed_password, password)
+
+
+async def get_id_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(UserDb.id).where(UserDb.email == email))
+
+
+async def get_role_by_id(db: AsyncSession, id: str):
+    return await db.scalar(select(UserDb.isAdmin).where(UserDb.id == id))
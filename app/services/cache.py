@@ -0,0 +1,372 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import sha1
+from threading import Lock
+from typing import Optional
+import math
+import time
+import uuid
+
+from app.config import config
+from app.schemas.session import Principal
+
+
+# Where cached values live. Values are bytes so the same caches run unchanged on either backend:
+# MemoryBackend keeps them in this process, RedisBackend keeps them in Redis where every worker
+# shares them. Counters and setdefault values are never evicted, the caches below build their
+# invalidation on them. A counter incremented with a ttl is dropped, and reads as 0 again, once ttl
+# seconds pass without it being incremented
+class CacheBackend(ABC):
+    max_size: int
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        ...
+
+    @abstractmethod
+    def counter(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        ...
+
+    # Stores value unless the key is already set, either way returns what the key holds
+    @abstractmethod
+    def setdefault(self, key: str, value: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    # Called with the app, for backends that hold connections or threads
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# A bounded LRU with a TTL per entry, safe to share between the request threads
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._pinned: dict = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    # Pinned values are (value, expires_at) with None for values that never expire
+    def counter(self, key: str) -> int:
+        with self._lock:
+            value, expires_at = self._pinned.get(key, (0, None))
+            if expires_at is not None and expires_at < time.monotonic():
+                return 0
+            return value
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            now = time.monotonic()
+            # Counters are incremented rarely, so expired ones are swept out here
+            for expired in [
+                pinned
+                for pinned, (_, expires_at) in self._pinned.items()
+                if expires_at is not None and expires_at < now
+            ]:
+                del self._pinned[expired]
+            value = self._pinned.get(key, (0, None))[0] + 1
+            self._pinned[key] = (value, None if ttl is None else now + ttl)
+            return value
+
+    def setdefault(self, key: str, value: bytes) -> bytes:
+        with self._lock:
+            return self._pinned.setdefault(key, (value, None))[0]
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Keeps values in Redis so every worker shares one copy. Reads are served from a small near cache
+# in this process where possible, so a warm session still resolves without a network round trip.
+# Every write is published on an invalidation channel and the other workers drop their near copy
+# of those keys as the message arrives. Should messages be lost, near copies still only live for
+# CACHE_NEAR_TTL seconds
+class RedisBackend(CacheBackend):
+    def __init__(self, client, max_size: int, near_ttl: float, prefix: str = "helpdesk:"):
+        self.client = client
+        self.max_size = max_size
+        self.near_ttl = near_ttl
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+        self._near = MemoryBackend(max_size)
+        self._id = uuid.uuid4().hex
+        self._listener = None
+
+    def start(self):
+        if self._listener is None:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    # A message is the sender's ID followed by the keys it wrote, one per line
+    def _on_message(self, message):
+        sender, *keys = message["data"].decode().split("\n")
+        if sender != self._id:
+            self._near.delete(*keys)
+
+    def _publish(self, *keys: str):
+        self.client.publish(self.channel, "\n".join([self._id, *keys]))
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._near.get(key)
+        if value is None:
+            value = self.client.get(self.prefix + key)
+            if value is not None:
+                self._near.set(key, value, self.near_ttl)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        # Redis expiries are whole positive seconds, a value that would already be stale is dropped
+        if int(ttl) <= 0:
+            self.delete(key)
+            return
+        self.client.set(self.prefix + key, value, ex=int(ttl))
+        self._near.set(key, value, min(ttl, self.near_ttl))
+        self._publish(key)
+
+    def delete(self, *keys: str):
+        self.client.delete(*(self.prefix + key for key in keys))
+        self._near.delete(*keys)
+        self._publish(*keys)
+
+    def counter(self, key: str) -> int:
+        value = self.get(key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        pipeline = self.client.pipeline()
+        pipeline.incr(self.prefix + key)
+        if ttl is not None:
+            # Rounded up, a counter may outlive ttl but must not expire before it
+            pipeline.expire(self.prefix + key, math.ceil(ttl))
+        value = pipeline.execute()[0]
+        self._near.delete(key)
+        self._publish(key)
+        return value
+
+    def setdefault(self, key: str, value: bytes) -> bytes:
+        current = self.get(key)
+        if current is None:
+            self.client.set(self.prefix + key, value, nx=True)
+            current = self.get(key)
+        return current
+
+    def size(self) -> int:
+        return self._near.size()
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+        self._near.clear()
+
+
+# Each cache gets a prefix of its own in Redis, so clearing one leaves the others' keys alone
+def create_backend(max_size: int, prefix: str) -> CacheBackend:
+    if config.CACHE_BACKEND == "redis":
+        # Only needed when Redis is configured
+        import redis
+
+        return RedisBackend(
+            redis.Redis.from_url(config.REDIS_URL), max_size, config.CACHE_NEAR_TTL, prefix
+        )
+    return MemoryBackend(max_size)
+
+
+# Resolves a sessionID without going to the sessions table. Entries are dropped when they are older
+# than the TTL, when the session itself expires, when the backend needs room, or when they were
+# cached before the last invalidate_user for their user. That last check compares against a
+# per-user generation counter, so dropping every session of a user is one write wherever they live.
+# A generation counter expires ttl seconds after it was last incremented: by then every entry cached
+# under an older generation has expired too, and counters are not kept for every user ever seen
+class SessionCache:
+    def __init__(self, max_size: int, ttl: int, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.backend = backend or MemoryBackend(max_size)
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, session_id: str) -> Optional[Principal]:
+        value = self.backend.get(f"session:{session_id}")
+        if value is None:
+            self._count(False)
+            return None
+        generation, data = value.split(b":", 1)
+        session = Principal.model_validate_json(data)
+        if session.expiry < datetime.now() or int(generation) != self.backend.counter(
+            f"user:{session.user_id}"
+        ):
+            self.backend.delete(f"session:{session_id}")
+            self._count(False)
+            return None
+        self._count(True)
+        return session
+
+    def set(self, session_id: str, session: Principal):
+        generation = self.backend.counter(f"user:{session.user_id}")
+        self.backend.set(
+            f"session:{session_id}",
+            f"{generation}:".encode() + session.model_dump_json().encode(),
+            self.ttl,
+        )
+
+    def invalidate(self, session_id: str):
+        self.backend.delete(f"session:{session_id}")
+
+    # Promoting or deleting a user changes every session they hold, so all of them are dropped
+    def invalidate_user(self, user_id: str):
+        self.backend.incr(f"user:{user_id}", self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": self.backend.size(),
+                "max_size": self.backend.max_size,
+            }
+
+
+# Serialised admin listings, keyed by everything that shapes the response (filters, page, user).
+# Entries are stored under the version they were rendered at and the services and the import bump
+# the version after each write to issues, or to the users shown alongside them, so nothing older
+# than the last such write is served and older entries are simply never read again. A write made
+# around them, e.g. SQL run by hand, is not seen until it is followed by one of theirs or ttl
+# seconds have passed: entries expire after ttl and an ETag is only valid for the ttl long window
+# it was handed out in. The version is prefixed with a random epoch kept in the backend, an ETag
+# handed out before the cache was lost can then never match a different listing after it
+class ListingCache:
+    def __init__(self, max_size: int, ttl: int = 600, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.backend = backend or MemoryBackend(max_size)
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    @property
+    def version(self) -> str:
+        epoch = self.backend.setdefault("listing:epoch", uuid.uuid4().hex[:8].encode())
+        return f"{epoch.decode()}.{self.backend.counter('listing:version')}"
+
+    def _digest(self, key: tuple) -> str:
+        return sha1(repr(key).encode()).hexdigest()[:16]
+
+    def etag(self, key: tuple, version: str) -> str:
+        window = int(time.time() // self.ttl)
+        return f'"{version}.{window}-{self._digest(key)}"'
+
+    def get(self, key: tuple, version: str) -> Optional[bytes]:
+        body = self.backend.get(f"listing:{version}:{self._digest(key)}")
+        with self._lock:
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    # A body rendered from a read that started before the last write is dropped, not cached
+    def set(self, key: tuple, version: str, body: bytes):
+        if version == self.version:
+            self.backend.set(f"listing:{version}:{self._digest(key)}", body, self.ttl)
+
+    # Called after a write has committed
+    def invalidate(self):
+        self.backend.incr("listing:version")
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": self.backend.size(),
+                "max_size": self.backend.max_size,
+            }
+
+
+session_cache = SessionCache(
+    config.SESSION_CACHE_SIZE,
+    config.SESSION_CACHE_TTL,
+    create_backend(config.SESSION_CACHE_SIZE, "helpdesk:session:"),
+)
+listing_cache = ListingCache(
+    config.LISTING_CACHE_SIZE,
+    config.LISTING_CACHE_TTL,
+    create_backend(config.LISTING_CACHE_SIZE, "helpdesk:listing:"),
+)
@@ -0,0 +1,148 @@
+from dataclasses import dataclass, field
+from typing import Optional
+import asyncio
+import json
+import logging
+from app.config import config
+from app.schemas.session import Principal
+from app.services.serialization import issue_record
+
+logger = logging.getLogger(__name__)
+
+
+# One open event stream. Messages are JSON arrays of changes, already serialised for this client
+@dataclass(eq=False)
+class Subscription:
+    user_id: str
+    is_admin: bool
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(config.EVENT_QUEUE_SIZE))
+
+
+# Pushes issue changes to the clients that can see them: admins get every change, other users only
+# changes to issues they own. Subscriptions are plain queues on the event loop and are indexed by
+# owner, so thousands of idle streams cost no threads and a change is only copied to the streams it
+# is for. publish is called from the sync services on worker threads as well as from the loop.
+# With the Redis cache backend changes are relayed over Redis pub/sub so streams on every worker
+# see writes made on any of them
+class Broadcaster:
+    def __init__(self):
+        self._admins: set = set()
+        self._owners: dict = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._relay = None
+        self._listener = None
+
+    # Whether a change could reach anyone, services skip building events when it could not
+    @property
+    def active(self) -> bool:
+        return self._relay is not None or bool(self._admins or self._owners)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._admins) + sum(len(owned) for owned in self._owners.values())
+
+    def start(self):
+        if config.CACHE_BACKEND == "redis" and self._relay is None:
+            import redis
+
+            self._relay = redis.Redis.from_url(config.REDIS_URL)
+            pubsub = self._relay.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{config.EVENT_CHANNEL: lambda m: self._dispatch(m["data"].decode())})
+            self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._relay = None
+
+    # Must be called on the event loop
+    def subscribe(self, principal: Principal) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(principal.user_id, principal.is_admin)
+        if subscription.is_admin:
+            self._admins.add(subscription)
+        else:
+            self._owners.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription.is_admin:
+            self._admins.discard(subscription)
+            return
+        owned = self._owners.get(subscription.user_id, set())
+        owned.discard(subscription)
+        if not owned:
+            self._owners.pop(subscription.user_id, None)
+
+    # Called after a write has committed, so a change that cannot be sent is logged rather than
+    # failing the request that made it. Its streams miss the change until they next reload
+    def publish(self, changes: list):
+        if not changes or not self.active:
+            return
+        try:
+            message = json.dumps(changes)
+            if self._relay is not None:
+                self._relay.publish(config.EVENT_CHANNEL, message)
+            else:
+                self._dispatch(message)
+        except Exception:
+            logger.exception("publishing issue changes failed", extra={"changes": len(changes)})
+
+    def _dispatch(self, message: str):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fan_out(message)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _fan_out(self, message: str):
+        for subscription in list(self._admins):
+            self._offer(subscription, message)
+        if not self._owners:
+            return
+        by_owner: dict = {}
+        for change in json.loads(message):
+            if change["owner"] in self._owners:
+                by_owner.setdefault(change["owner"], []).append(change)
+        for owner, owned in by_owner.items():
+            message = json.dumps(owned)
+            for subscription in list(self._owners.get(owner, ())):
+                self._offer(subscription, message)
+
+    # A client that falls too far behind has its backlog replaced by a single reload
+    # rather than holding an ever growing queue of changes in memory
+    def _offer(self, subscription: Subscription, message: str):
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(json.dumps([reload_event(subscription.user_id)]))
+
+
+# created, updated and resolved carry the issue as the listings return it, built from a row of the
+# listing columns, so the client can put it straight into its list. Like the listings the row is
+# not validated again, the schema's checks were made when it was written
+def issue_event(op: str, row) -> dict:
+    issue = issue_record(row)
+    return {"op": op, "owner": issue["user_id"], "issue": issue}
+
+
+def deleted_event(id: str, owner: str) -> dict:
+    return {"op": "deleted", "owner": owner, "id": id}
+
+
+# Tells the client to fetch its listing again, for changes too broad to send one by one such as
+# the bulk operations
+def reload_event(owner: str) -> dict:
+    return {"op": "reload", "owner": owner}
+
+
+broadcaster = Broadcaster()
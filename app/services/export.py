@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from typing import Iterator, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import config
+from app.models.Issuedb import Issue as IssueDb
+from app.models.Userdb import User as UserDb
+from app.schemas.issue import ExportFormat
+from app.services.issues import filter_issues
+
+EXPORT_COLUMNS = [
+    "id",
+    "title",
+    "description",
+    "type",
+    "user_id",
+    "email",
+    "is_resolved",
+    "created_at",
+]
+
+
+# Plain columns rather than Issue objects, so rows are not kept in the session's identity map
+def export_query(user_id: Optional[str] = None, dialect: str = "sqlite", **filters):
+    query = (
+        select(
+            IssueDb.id,
+            IssueDb.title,
+            IssueDb.description,
+            IssueDb.type,
+            IssueDb.user_id,
+            UserDb.email,
+            IssueDb.is_resolved,
+            IssueDb.created_at,
+        )
+        .join(UserDb, UserDb.id == IssueDb.user_id)
+        .order_by(IssueDb.created_at, IssueDb.id)
+    )
+    return filter_issues(query, user_id, dialect=dialect, **filters)
+
+
+def to_record(row) -> dict:
+    record = row._asdict()
+    record["type"] = row.type.value
+    record["created_at"] = row.created_at.isoformat()
+    return record
+
+
+def to_ndjson(rows) -> str:
+    return "".join(json.dumps(to_record(row)) + "\n" for row in rows)
+
+
+def to_csv(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writerows(to_record(row) for row in rows)
+    return buffer.getvalue()
+
+
+# Yields the export EXPORT_CHUNK_SIZE rows at a time. yield_per streams rows from the database
+# (a server side cursor on PostgreSQL) instead of loading the whole result, so memory use depends
+# on the chunk size and not on the number of issues.
+# The session is closed once the export is finished or the client goes away
+def stream_issues(db: Session, format: ExportFormat, **filters) -> Iterator[str]:
+    try:
+        if format == ExportFormat.CSV:
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        serialise = to_csv if format == ExportFormat.CSV else to_ndjson
+        query = export_query(dialect=db.get_bind().dialect.name, **filters)
+        result = db.execute(query.execution_options(yield_per=config.EXPORT_CHUNK_SIZE))
+        for rows in result.partitions():
+            yield serialise(rows)
+    finally:
+        db.close()
@@ -0,0 +1,100 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+import multiprocessing
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from app.config import config
+
+# Each worker process builds its own hasher when it imports this module
+password_hasher = PasswordHasher(
+    time_cost=config.ARGON2_TIME_COST,
+    memory_cost=config.ARGON2_MEMORY_COST,
+    parallelism=config.ARGON2_PARALLELISM,
+)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _hash(password: str) -> str:
+    return password_hasher.hash(password)
+
+
+def _verify(hashed_password: str, password: str) -> bool:
+    try:
+        return password_hasher.verify(hashed_password, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+# Runs argon2 in worker processes so hashing is not serialised on the GIL with the request threads.
+# At most workers + queue_limit jobs are accepted at once, anything past that raises HashingBusy
+# rather than waiting in an unbounded queue
+class HashingPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self._slots = BoundedSemaphore(workers + queue_limit)
+        self._pool = None
+        self._lock = Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                # spawn avoids forking a process that already has request threads running
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    # A worker that dies (killed for memory, crashed) breaks the whole executor and every later
+    # submit fails, so the broken one is dropped and the next start() builds a new one. Only the
+    # thread that still sees it as the current pool replaces it
+    def _replace(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, function, *args):
+        pool = self.start()
+        try:
+            return pool.submit(function, *args).result()
+        except BrokenProcessPool:
+            self._replace(pool)
+            raise
+
+    def _run(self, function, *args):
+        if self.workers == 0:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            try:
+                return self._submit(function, *args)
+            except BrokenProcessPool:
+                pass
+            # Retried once on a new pool, if that breaks too the client gets a 503
+            try:
+                return self._submit(function, *args)
+            except BrokenProcessPool:
+                raise HashingBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify(self, hashed_password: str, password: str) -> bool:
+        return self._run(_verify, hashed_password, password)
+
+
+hashing_pool = HashingPool(config.HASH_WORKERS, config.HASH_QUEUE_LIMIT)
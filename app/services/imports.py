@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
+import csv
+import json
+import os
+import uuid
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.Issuedb import Issue as IssueDb
+from app.models.Userdb import User as UserDb
+from app.schemas.issue import ImportIssue
+from app.schemas.user import ImportUser
+from app.services.cache import listing_cache
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+IMPORT_NAMESPACE = uuid.UUID("8f0d6c1e-3f7b-4a51-9a8e-2b6f4c0d9e17")
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"cannot tell the format of {path}, pass --format")
+    return FORMATS[extension]
+
+
+# Yields (line number, record) for every row of the file, a record that cannot be parsed is None
+def read_rows(path: str, format: str) -> Iterator[tuple]:
+    with open(path, newline="", encoding="utf-8") as source:
+        if format == "csv":
+            reader = csv.DictReader(source)
+            for record in reader:
+                # Empty CSV cells are treated as missing so optional fields take their defaults
+                yield reader.line_num, {k: v for k, v in record.items() if v not in ("", None)}
+            return
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+
+
+def batches(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+# Validates a chunk against the schema, returning the valid rows and the rejected line numbers
+def validate(chunk: list, schema) -> tuple:
+    valid, rejected = [], []
+    for number, record in chunk:
+        if record is None:
+            rejected.append((number, "not a valid row"))
+            continue
+        try:
+            valid.append((number, schema.model_validate(record)))
+        except ValidationError as error:
+            rejected.append((number, describe(error)))
+    return valid, rejected
+
+
+# Inserts the rows whose key is not already taken and returns how many that was, leaving the rest
+# alone is what lets an interrupted import be run again from its last saved chunk. It is built on
+# the table rather than the model so the rows go straight to executemany without the ORM's bulk
+# bookkeeping
+def insert_new(db: Session, table, rows: list) -> int:
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        # psycopg2 reports no row count for executemany, so the keys of the new rows are counted
+        statement = postgresql.insert(table).on_conflict_do_nothing().returning(table.c.id)
+        return len(db.execute(statement, rows).all())
+    if dialect == "sqlite":
+        return db.execute(sqlite.insert(table).on_conflict_do_nothing(), rows).rowcount
+    db.execute(insert(table), rows)
+    return len(rows)
+
+
+def load_progress(path: str) -> int:
+    try:
+        with open(path) as progress:
+            return json.load(progress)["rows"]
+    except FileNotFoundError:
+        return 0
+
+
+# Written to a temporary file first so a crash part way through never leaves a corrupt progress file
+def save_progress(path: str, rows: int):
+    with open(f"{path}.tmp", "w") as progress:
+        json.dump({"rows": rows}, progress)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_hashed(password: str) -> bool:
+    return password.startswith("$argon2")
+
+
+def load_users(db: Session, chunk: list, hash_passwords: Callable) -> tuple:
+    valid, rejected = validate(chunk, ImportUser)
+    plain = [user.password for _, user in valid if not is_hashed(user.password)]
+    hashed = iter(hash_passwords(plain))
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "email": user.email,
+            "password": user.password if is_hashed(user.password) else next(hashed),
+            "isAdmin": user.isAdmin,
+        }
+        for _, user in valid
+    ]
+    imported = insert_new(db, UserDb.__table__, rows) if rows else 0
+    return imported, rejected
+
+
+# Issue IDs are derived from a row's line number and content, so a chunk imported twice is not
+# duplicated, even from a file that was moved or renamed in between. Rows on the same line of two
+# files with the same title, description, owner and created_at are taken to be the same issue
+def import_issue_id(number: int, issue: ImportIssue) -> str:
+    created_at = issue.created_at.isoformat() if issue.created_at else None
+    key = json.dumps([number, issue.title, issue.description, issue.email, created_at])
+    return str(uuid.uuid5(IMPORT_NAMESPACE, key))
+
+
+def load_issues(db: Session, chunk: list, owners: dict) -> tuple:
+    valid, rejected = validate(chunk, ImportIssue)
+    missing = {issue.email for _, issue in valid} - owners.keys()
+    if missing:
+        owners.update(db.execute(select(UserDb.email, UserDb.id).where(UserDb.email.in_(missing))).all())
+    now = datetime.now()
+    rows = []
+    for position, (number, issue) in enumerate(valid):
+        if issue.email not in owners:
+            rejected.append((number, f"email: no user with the email {issue.email}"))
+            continue
+        rows.append(
+            {
+                "id": import_issue_id(number, issue),
+                "title": issue.title,
+                "description": issue.description,
+                "type": issue.type,
+                "user_id": owners[issue.email],
+                "is_resolved": issue.is_resolved,
+                "created_at": issue.created_at or now + timedelta(microseconds=position),
+            }
+        )
+    imported = insert_new(db, IssueDb.__table__, rows) if rows else 0
+    return imported, sorted(rejected)
+
+
+# Feeds the file through load_chunk a chunk at a time. Each chunk is committed on its own and the
+# number of rows done is saved after it, so a rerun skips straight past what is already in
+def run_import(
+    db: Session,
+    path: str,
+    format: str,
+    load_chunk: Callable,
+    chunk_size: int,
+    progress_path: str,
+    on_reject: Optional[Callable] = None,
+) -> dict:
+    done = load_progress(progress_path)
+    report = {"imported": 0, "rejected": 0, "skipped": done}
+    for chunk in batches(islice(read_rows(path, format), done, None), chunk_size):
+        imported, rejected = load_chunk(db, chunk)
+        db.commit()
+        # With the Redis backend this reaches the running app, which then stops serving listings
+        # from before the chunk. The in-process cache is only refreshed after LISTING_CACHE_TTL
+        listing_cache.invalidate()
+        done += len(chunk)
+        save_progress(progress_path, done)
+        report["imported"] += imported
+        report["rejected"] += len(rejected)
+        # Valid rows the insert left alone were already in, e.g. from an earlier run
+        report["skipped"] += len(chunk) - imported - len(rejected)
+        if on_reject is not None:
+            for number, reason in rejected:
+                on_reject(number, reason)
+    # A finished import leaves nothing to resume, running it again only skips rows already present
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return report
+
+
+def import_users(
+    db: Session,
+    path: str,
+    format: str,
+    chunk_size: int,
+    progress_path: str,
+    hash_passwords: Callable,
+    on_reject: Optional[Callable] = None,
+) -> dict:
+    return run_import(
+        db,
+        path,
+        format,
+        lambda db, chunk: load_users(db, chunk, hash_passwords),
+        chunk_size,
+        progress_path,
+        on_reject,
+    )
+
+
+def import_issues(
+    db: Session,
+    path: str,
+    format: str,
+    chunk_size: int,
+    progress_path: str,
+    on_reject: Optional[Callable] = None,
+) -> dict:
+    owners = {}
+    return run_import(
+        db,
+        path,
+        format,
+        lambda db, chunk: load_issues(db, chunk, owners),
+        chunk_size,
+        progress_path,
+        on_reject,
+    )
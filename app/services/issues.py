@@ -1,17 +1,213 @@
-from typing import List
-from sqlalchemy.orm import Session
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import logging
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete, insert, literal_column, select, table, text, tuple_, update
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.sql import exists
-from app.models.Issuedb import Issue as IssueDb
+from app.models.Issuedb import ISSUES_TSVECTOR, Issue as IssueDb
 from app.models.Userdb import User as UserDb
-from app.schemas.issue import IssueType, GetIssuesResponse
+from app.schemas.issue import BulkIssue, BulkStatus, IssueType
+from app.services.cache import listing_cache
+from app.services.events import broadcaster, deleted_event, issue_event, reload_event
+from app.services.users import UserCard
 
+logger = logging.getLogger(__name__)
 
-def get_all_issues(db: Session) -> List[GetIssuesResponse]:
-    return db.query(IssueDb).all()
+# IN lists in bulk statements are split into chunks of this many IDs,
+# which keeps each statement under the database's limit on bound parameters
+BULK_CHUNK_SIZE = 500
 
 
-def get_issues_by_user(db: Session, id: str):
-    return db.query(IssueDb).filter(IssueDb.user_id == id).all()
+# A cursor is the (created_at, id) of the last issue on a page, encoded so it can go in a URL
+def encode_cursor(issue: IssueDb) -> str:
+    return urlsafe_b64encode(f"{issue.created_at.isoformat()}|{issue.id}".encode()).decode()
+
+
+# Raises ValueError if the cursor was not made by encode_cursor
+def decode_cursor(cursor: str):
+    created_at, id = urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return datetime.fromisoformat(created_at), id
+
+
+# Turns free text into a full-text search on the database in use. Only the words are kept, so
+# characters such as " or * typed into the search box cannot change the query, and each word is
+# matched as a prefix so "logi" finds "login".
+# SQLite reads the matching rowids from the issues_fts index, PostgreSQL uses the GIN index on
+# ISSUES_TSVECTOR, so either way a search reads only the issues that match
+def search_condition(search: str, dialect: str):
+    words = re.findall(r"\w+", search)
+    if not words:
+        return None
+    if dialect == "postgresql":
+        match = " & ".join(f"{word}:*" for word in words)
+        return text(f"{ISSUES_TSVECTOR} @@ to_tsquery('simple', :match)").bindparams(match=match)
+    match = " ".join(f'"{word}"*' for word in words)
+    matches = (
+        select(literal_column("rowid"))
+        .select_from(table("issues_fts"))
+        .where(text("issues_fts MATCH :match").bindparams(match=match))
+    )
+    return literal_column("issues.rowid").in_(matches)
+
+
+# Narrows a query on issues to the filters given, shared by the listings and the export
+def filter_issues(
+    query,
+    user_id: Optional[str] = None,
+    type: Optional[IssueType] = None,
+    is_resolved: Optional[bool] = None,
+    search: Optional[str] = None,
+    dialect: str = "sqlite",
+):
+    if user_id is not None:
+        query = query.where(IssueDb.user_id == user_id)
+    if type is not None:
+        query = query.where(IssueDb.type == type)
+    if is_resolved is not None:
+        query = query.where(IssueDb.is_resolved == is_resolved)
+    condition = search_condition(search, dialect) if search is not None else None
+    if condition is not None:
+        query = query.where(condition)
+    return query
+
+
+# Narrows a query on issues to one page, it is shared with the async services.
+# Pages are keyed on (created_at, id) rather than an offset, which together with the
+# ix_issues_*created_at_id indexes makes a deep page cost the same as the first one.
+# One extra row is fetched to find out whether there is a next page
+def page_query(query, limit: int, cursor: Optional[str], user_id: Optional[str], **filters):
+    query = filter_issues(
+        query.order_by(IssueDb.created_at, IssueDb.id).limit(limit + 1), user_id, **filters
+    )
+    if cursor is not None:
+        query = query.where(tuple_(IssueDb.created_at, IssueDb.id) > tuple_(*decode_cursor(cursor)))
+    return query
+
+
+def issues_page_query(
+    limit: int, cursor: Optional[str] = None, user_id: Optional[str] = None, **filters
+):
+    query = select(IssueDb).options(joinedload(IssueDb.user))
+    return page_query(query, limit, cursor, user_id, **filters)
+
+
+# The columns of an issue listing, in the order of GetIssuesResponse's fields with created_at last
+# for the cursor. The user's id is the issue's user_id so it is not selected again
+LISTING_COLUMNS = (
+    IssueDb.title,
+    IssueDb.type,
+    IssueDb.description,
+    IssueDb.id,
+    IssueDb.user_id,
+    IssueDb.is_resolved,
+    UserDb.email,
+    UserDb.isAdmin,
+    IssueDb.created_at,
+)
+
+
+# Plain rows of LISTING_COLUMNS, which skip the session's identity map. They are written straight
+# to JSON by encode_issue_page or turned into IssueCards for the pages
+def listing_query():
+    return select(*LISTING_COLUMNS).join(UserDb, UserDb.id == IssueDb.user_id)
+
+
+def issue_rows_page_query(
+    limit: int, cursor: Optional[str] = None, user_id: Optional[str] = None, **filters
+):
+    return page_query(listing_query(), limit, cursor, user_id, **filters)
+
+
+def to_page(issues: list, limit: int) -> dict:
+    if len(issues) > limit:
+        return {"items": issues[:limit], "next_cursor": encode_cursor(issues[limit - 1])}
+    return {"items": issues, "next_cursor": None}
+
+
+def get_issues_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **filters,
+) -> dict:
+    dialect = db.get_bind().dialect.name
+    issues = db.scalars(issues_page_query(limit, cursor, user_id, dialect=dialect, **filters)).all()
+    return to_page(issues, limit)
+
+
+def get_issue_rows_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **filters,
+) -> dict:
+    dialect = db.get_bind().dialect.name
+    rows = db.execute(issue_rows_page_query(limit, cursor, user_id, dialect=dialect, **filters))
+    return to_page(rows.all(), limit)
+
+
+# What an issue card on the issues and manage pages shows, with the same attribute names as an
+# Issue so the templates read either. created_at is kept for the page cursor
+@dataclass(slots=True)
+class IssueCard:
+    id: str
+    title: str
+    description: str
+    type: IssueType
+    user_id: str
+    is_resolved: bool
+    created_at: datetime
+    user: UserCard
+
+
+# Builds cards from rows of LISTING_COLUMNS. Issues by the same user share one UserCard
+def to_cards(rows) -> List[IssueCard]:
+    users = {}
+    cards = []
+    for title, type, description, id, user_id, is_resolved, email, is_admin, created_at in rows:
+        user = users.get(user_id)
+        if user is None:
+            user = users[user_id] = UserCard(user_id, email, is_admin)
+        cards.append(
+            IssueCard(id, title, description, type, user_id, is_resolved, created_at, user)
+        )
+    return cards
+
+
+# Listings select only the columns their cards show, joined to each issue's user in the same query
+def get_issues_by_user(db: Session, id: str) -> List[IssueCard]:
+    return to_cards(db.execute(listing_query().where(IssueDb.user_id == id)))
+
+
+def get_issue_cards_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None,
+    **filters,
+) -> dict:
+    dialect = db.get_bind().dialect.name
+    rows = db.execute(issue_rows_page_query(limit, cursor, user_id, dialect=dialect, **filters))
+    return to_page(to_cards(rows), limit)
+
+
+# Change events are only built when a stream is open to receive them, reading the issue's listing
+# row back is the one query they need. The write has committed by now, so a failure is only logged
+def publish_change(db: Session, op: str, id: str):
+    if not broadcaster.active:
+        return
+    try:
+        row = db.execute(listing_query().where(IssueDb.id == id)).first()
+        if row is not None:
+            broadcaster.publish([issue_event(op, row)])
+    except Exception:
+        logger.exception("publishing an issue change failed", extra={"issue_id": id})
 
 
 def create_issue(
@@ -22,6 +218,8 @@ def create_issue(
     )
     db.add(newIssue)
     db.commit()
+    listing_cache.invalidate()
+    publish_change(db, "created", newIssue.id)
     return newIssue.id
 
 
@@ -32,12 +230,17 @@ def get_Issue_by_id(db: Session, id: str):
 def update_issue(db: Session, id: str, toUpdate):
     db.query(IssueDb).filter(IssueDb.id == id).update(toUpdate)
     db.commit()
+    listing_cache.invalidate()
+    publish_change(db, "updated", id)
 
 
 def delete_issue(db: Session, id: str):
     toDelete = db.query(IssueDb).filter(IssueDb.id == id).first()
+    owner = toDelete.user_id
     db.delete(toDelete)
     db.commit()
+    listing_cache.invalidate()
+    broadcaster.publish([deleted_event(id, owner)])
 
 
 def check_if_issue_exists(db: Session, id: str):
@@ -52,3 +255,80 @@ def get_user_by_issue_id(db: Session, issueId: str):
 def resolve_issue(db: Session, id: str):
     db.query(IssueDb).filter(IssueDb.id == id).update({"is_resolved": True})
     db.commit()
+    listing_cache.invalidate()
+    publish_change(db, "resolved", id)
+
+
+def chunked(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+# The bulk functions below apply every change in one transaction, so a failure part way through
+# leaves nothing applied. Each returns one outcome per item in the order the items were given
+
+# Inserted with a single executemany. Each issue is a microsecond after the one before it,
+# so the batch is listed in the order it was sent rather than by its random ids
+def create_issues(db: Session, issues: List[BulkIssue], user_id: str) -> list:
+    now = datetime.now()
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "title": issue.title,
+            "description": issue.description,
+            "type": issue.type,
+            "user_id": user_id,
+            "is_resolved": False,
+            "created_at": now + timedelta(microseconds=position),
+        }
+        for position, issue in enumerate(issues)
+    ]
+    db.execute(insert(IssueDb), rows)
+    db.commit()
+    listing_cache.invalidate()
+    broadcaster.publish([reload_event(user_id)])
+    return [{"id": row["id"], "status": BulkStatus.CREATED} for row in rows]
+
+
+def resolve_issues(db: Session, ids: List[str]) -> list:
+    found = {}
+    for chunk in chunked(list(dict.fromkeys(ids))):
+        rows = db.execute(
+            select(IssueDb.id, IssueDb.is_resolved, IssueDb.user_id).where(IssueDb.id.in_(chunk))
+        )
+        found.update((id, (is_resolved, owner)) for id, is_resolved, owner in rows)
+        db.execute(
+            update(IssueDb)
+            .where(IssueDb.id.in_(chunk), IssueDb.is_resolved == False)
+            .values(is_resolved=True)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    listing_cache.invalidate()
+    owners = {owner for is_resolved, owner in found.values() if not is_resolved}
+    broadcaster.publish([reload_event(owner) for owner in owners])
+    outcomes = {
+        id: BulkStatus.ALREADY_RESOLVED if is_resolved else BulkStatus.RESOLVED
+        for id, (is_resolved, _) in found.items()
+    }
+    return [{"id": id, "status": outcomes.get(id, BulkStatus.NOT_FOUND)} for id in ids]
+
+
+def delete_issues(db: Session, ids: List[str]) -> list:
+    found = {}
+    for chunk in chunked(list(dict.fromkeys(ids))):
+        found.update(
+            db.execute(select(IssueDb.id, IssueDb.user_id).where(IssueDb.id.in_(chunk))).all()
+        )
+        db.execute(
+            delete(IssueDb)
+            .where(IssueDb.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    listing_cache.invalidate()
+    broadcaster.publish([reload_event(owner) for owner in set(found.values())])
+    return [
+        {"id": id, "status": BulkStatus.DELETED if id in found else BulkStatus.NOT_FOUND}
+        for id in ids
+    ]
@@ -0,0 +1,236 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional
+import time
+from sqlalchemy import Engine, event
+from app.services.cache import listing_cache, session_cache
+from app.services.events import broadcaster
+
+# Latency buckets in seconds, the same defaults Prometheus client libraries use
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+# The metric types below keep one value per combination of label values and render themselves in
+# the Prometheus text format. They are updated from the request threads and the event loop alike
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict = {}
+        self._lock = Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [
+                (self.name, format_labels(self.labels, labels), value)
+                for labels, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label values: a count per bucket (not cumulative), then the sum and count
+        self._values: dict = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            counts, total, count = self._values.get(labels) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            return self._values.get(labels, (None, 0.0, 0))[2]
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    samples.append(
+                        (
+                            f"{self.name}_bucket",
+                            format_labels(self.labels + ("le",), labels + (bound,)),
+                            cumulative,
+                        )
+                    )
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        format_labels(self.labels + ("le",), labels + ("+Inf",)),
+                        count,
+                    )
+                )
+                samples.append((f"{self.name}_sum", format_labels(self.labels, labels), total))
+                samples.append((f"{self.name}_count", format_labels(self.labels, labels), count))
+        return samples
+
+
+# Values read when /metrics is scraped rather than kept up to date, e.g. the cache statistics.
+# collect returns (label values, value) pairs
+class Collected:
+    def __init__(self, name: str, help: str, kind: str, labels: tuple, collect: Callable):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self) -> list:
+        return [
+            (self.name, format_labels(self.labels, labels), value)
+            for labels, value in self.collect()
+        ]
+
+
+registry: list = []
+
+
+def register(metric):
+    registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_DURATION = register(
+    Histogram(
+        "helpdesk_request_duration_seconds",
+        "Time taken to answer a request, to the first byte for event streams",
+        ("method", "route"),
+    )
+)
+REQUESTS = register(
+    Counter("helpdesk_requests_total", "Requests answered", ("method", "route", "status"))
+)
+IN_FLIGHT = register(Gauge("helpdesk_requests_in_flight", "Requests being answered"))
+REQUEST_QUERIES = register(
+    Histogram(
+        "helpdesk_request_db_queries",
+        "SQL statements run while answering a request",
+        ("method", "route"),
+        QUERY_BUCKETS,
+    )
+)
+REQUEST_DB_TIME = register(
+    Histogram(
+        "helpdesk_request_db_seconds",
+        "Time spent in SQL statements while answering a request",
+        ("method", "route"),
+    )
+)
+QUERIES = register(Counter("helpdesk_db_queries_total", "SQL statements run"))
+DB_TIME = register(Counter("helpdesk_db_seconds_total", "Time spent in SQL statements"))
+
+
+def cache_stats(field: str):
+    return lambda: [
+        (("session",), session_cache.stats()[field]),
+        (("listing",), listing_cache.stats()[field]),
+    ]
+
+
+for field, name, help, kind in [
+    ("hits", "helpdesk_cache_hits_total", "Cache lookups answered", "counter"),
+    ("misses", "helpdesk_cache_misses_total", "Cache lookups missed", "counter"),
+    ("size", "helpdesk_cache_entries", "Entries held in this process", "gauge"),
+]:
+    register(Collected(name, help, kind, ("cache",), cache_stats(field)))
+register(
+    Collected(
+        "helpdesk_event_streams",
+        "Open issue event streams",
+        "gauge",
+        (),
+        lambda: [((), broadcaster.subscribers)],
+    )
+)
+
+
+# What the statements run on behalf of one request cost. The metrics middleware sets one for each
+# request, the context is copied into the worker thread a sync route runs on, so the statements it
+# runs are counted against the request too
+@dataclass
+class QueryStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_stats", default=None)
+
+
+# A statement's start time is kept on its execution context
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    QUERIES.inc()
+    DB_TIME.inc(amount=elapsed)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+# Listens on the Engine class, so every engine is counted including the sync engine underneath
+# the async one. Called with METRICS_ENABLED only, otherwise statements run without the listeners
+def instrument_engines():
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
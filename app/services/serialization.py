@@ -0,0 +1,40 @@
+import json
+
+# orjson is optional, without it listings are encoded with the json module, which is slower
+# but writes the same bytes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+# A row of LISTING_COLUMNS as GetIssuesResponse writes it, with its fields in the same order
+def issue_record(row) -> dict:
+    title, type, description, id, user_id, is_resolved, email, is_admin, _ = row
+    return {
+        "title": title,
+        "type": type.value,
+        "description": description,
+        "id": id,
+        "user_id": user_id,
+        "is_resolved": is_resolved,
+        "user": {"email": email, "isAdmin": is_admin, "id": user_id},
+    }
+
+
+# Writes a page of rows from get_issue_rows_page as the JSON IssuePage and IssuesByUserPage
+# describe, the same bytes the response models give for the same issues. Rows are not validated
+# again on the way out, everything in them was validated when it was written
+def encode_issue_page(page: dict) -> bytes:
+    return dumps(
+        {
+            "items": [issue_record(row) for row in page["items"]],
+            "next_cursor": page["next_cursor"],
+        }
+    )
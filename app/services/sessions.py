@@ -1,17 +1,85 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import exists
+from app.config import config
 from app.models.Sessiondb import Session as SessionDb
+from app.models.Userdb import User as UserDb
+from app.schemas.session import Principal
+from app.services.cache import session_cache
+from app.services.users import get_user
 
 
 def create_session(db: Session, user_id: str):
     session = SessionDb(user_id=user_id)
     db.add(session)
     db.commit()
+    # Warms the cache so the first request made with the new session does not touch the database
+    user = get_user(db, user_id)
+    session_cache.set(
+        session.session_id,
+        Principal(
+            user_id=user.id,
+            email=user.email,
+            is_admin=user.isAdmin,
+            expiry=session.expire_time,
+        ),
+    )
     return session.session_id
 
 
+# A sliding session is renewed once less than half of its lifetime is left,
+# so an active user stays logged in without a write on every request
+def needs_renewal(principal: Principal) -> bool:
+    if not config.SESSION_SLIDING:
+        return False
+    remaining = principal.expiry - datetime.now()
+    return remaining < timedelta(minutes=config.SESSION_TTL_MINUTES) / 2
+
+
+def renewed_expiry() -> datetime:
+    return datetime.now() + timedelta(minutes=config.SESSION_TTL_MINUTES)
+
+
+def renew_session(db: Session, session_id: str, principal: Principal) -> Principal:
+    expiry = renewed_expiry()
+    db.query(SessionDb).filter(SessionDb.session_id == session_id).update(
+        {"expire_time": expiry}
+    )
+    db.commit()
+    principal = principal.model_copy(update={"expiry": expiry})
+    session_cache.set(session_id, principal)
+    return principal
+
+
+# Resolves a sessionID to the user behind it, the cache is checked first
+# and on a miss a single joined sessions+users query is used to fill it.
+# Expired sessions resolve to None whether or not the purge has deleted them yet.
+# renew=False only looks the session up, for checks that are not the user being active
+def get_principal(db: Session, session_id: str, renew: bool = True) -> Optional[Principal]:
+    if session_id is None:
+        return None
+    principal = session_cache.get(session_id)
+    if principal is None:
+        row = (
+            db.query(SessionDb.user_id, UserDb.email, UserDb.isAdmin, SessionDb.expire_time)
+            .join(UserDb, UserDb.id == SessionDb.user_id)
+            .filter(SessionDb.session_id == session_id, SessionDb.expire_time > datetime.now())
+            .first()
+        )
+        if row is None:
+            return None
+        principal = Principal(
+            user_id=row.user_id, email=row.email, is_admin=row.isAdmin, expiry=row.expire_time
+        )
+        session_cache.set(session_id, principal)
+    if renew and needs_renewal(principal):
+        principal = renew_session(db, session_id, principal)
+    return principal
+
+
 def get_user_by_session(db: Session, session_id: str) -> str:
-    session = db.query(SessionDb).filter(SessionDb.session_id == session_id).first()
+    session = get_principal(db, session_id)
     return session.user_id
 
 
@@ -19,7 +87,33 @@ def delete_session(db: Session, session_id: str):
     toDelete = db.query(SessionDb).filter(SessionDb.session_id == session_id).first()
     db.delete(toDelete)
     db.commit()
+    session_cache.invalidate(session_id)
 
 
 def check_if_session_exists(db: Session, id: str):
-    return db.query(exists().where(SessionDb.session_id == id)).scalar()
+    return get_principal(db, id) is not None
+
+
+# The expired sessions to delete in one batch
+def expired_sessions(batch_size: int):
+    return (
+        select(SessionDb.session_id)
+        .where(SessionDb.expire_time <= datetime.now())
+        .limit(batch_size)
+    )
+
+
+# Deletes expired sessions a batch at a time. Each batch is its own short transaction, so the
+# SQLite write lock is given up between batches and logins are not held up behind one long delete
+def purge_expired_sessions(db: Session, batch_size: int) -> int:
+    purged = 0
+    while True:
+        deleted = (
+            db.query(SessionDb)
+            .filter(SessionDb.session_id.in_(expired_sessions(batch_size)))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
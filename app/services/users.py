@@ -1,10 +1,15 @@
+from dataclasses import dataclass
+from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models.Userdb import User as UserDb
 from app.schemas.user import *
 from sqlalchemy.sql import exists
 import hashlib
 from email_validator import validate_email, EmailNotValidError
-from argon2 import PasswordHasher
+from app.services.cache import listing_cache, session_cache
+from app.services.events import broadcaster, reload_event
+from app.services.hashing import hashing_pool
 
 
 def create_user(db: Session, email: str, password: str, isAdmin: bool = False):
@@ -18,20 +23,37 @@ def delete_user(db: Session, id: str):
     toDelete = db.query(UserDb).filter(UserDb.id == id).first()
     db.delete(toDelete)
     db.commit()
+    listing_cache.invalidate()
+    session_cache.invalidate_user(id)
+    # Their issues went with them
+    broadcaster.publish([reload_event(id)])
 
 
 def update_user(db: Session, id: str, toUpdate):
     db.query(UserDb).filter(UserDb.id == id).update(toUpdate)
     db.commit()
+    listing_cache.invalidate()
 
 
-def get_users(db: Session):
-    return db.query(UserDb).all()
+# What the user directory and issue cards show of a user. Listings select these columns alone
+# rather than loading User objects, which would read every password hash along with them
+@dataclass(slots=True)
+class UserCard:
+    id: str
+    email: str
+    isAdmin: bool
+
+
+def get_users(db: Session) -> List[UserCard]:
+    rows = db.execute(select(UserDb.id, UserDb.email, UserDb.isAdmin))
+    return [UserCard(id, email, is_admin) for id, email, is_admin in rows]
 
 
 def promote_user(db: Session, id: str):
     db.query(UserDb).filter(UserDb.id == id).update({"isAdmin": True})
     db.commit()
+    listing_cache.invalidate()
+    session_cache.invalidate_user(id)
 
 
 def get_user(db: Session, id: str):
@@ -46,19 +68,12 @@ def check_if_User_exists_by_email(db: Session, email: str):
     return db.query(exists().where(UserDb.email == email)).scalar()
 
 
+# Verification happens in the hashing pool, HashingBusy is left to propagate so the caller gets a 503
 def check_password(db: Session, password: str, email: str):
-    try:
-        user = db.query(UserDb).filter(UserDb.email == email).first()
-        ph = PasswordHasher()
-        if  ph.verify(user.password,password):
-            print("True")
-            return True
-        else:
-            print("False")
-            return False
-    except:
+    user = db.query(UserDb.password).filter(UserDb.email == email).first()
+    if user is None:
         return False
-
+    return hashing_pool.verify(user.password, password)
 
 
 def get_id_by_email(db: Session, email: str):
@@ -0,0 +1,41 @@
+const navLinks = document.querySelector('.nav-links')
+const navItems = document.querySelectorAll('.nav-links ul li a')
+function onToggleMenu(e) {
+    e.name = e.name === 'menu' ? 'close' : 'menu'
+    navLinks.classList.toggle('top-[6%]')
+    navLinks.classList.toggle('bg-[#7079D9]')
+}
+
+// The logout form is only there while logged in
+document.getElementById("logoutForm")?.addEventListener('submit', (event) => {
+    event.preventDefault();
+    const formData = new FormData(event.target)
+    const logoutToast = document.getElementById("logoutToast")
+    const toastInstance = bootstrap.Toast.getOrCreateInstance(logoutToast)
+    fetch('/api/auth/logout', {
+        method: "POST"
+    })
+        .then(res => {
+            window.location.replace("/login");
+
+        })
+        .catch(err => {
+            console.log(err)
+        })
+})
+
+const logout = () => {
+    event.preventDefault();
+    const logoutToast = document.getElementById("logoutToast")
+    const toastInstance = bootstrap.Toast.getOrCreateInstance(logoutToast)
+    fetch('/api/auth/logout', {
+        method: "POST"
+    })
+        .then(res => {
+            window.location.replace("/register");
+
+        })
+        .catch(err => {
+            console.log(err)
+        })
+}
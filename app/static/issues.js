@@ -0,0 +1,469 @@
+const listUrl = page == "manage" ? `/api/issues/` : `/api/issues/${userId}`;
+
+// Issues and users are written by other users and are pushed into open pages as they are saved,
+// so every value they wrote is escaped before it is put into markup
+const escapeHtml = (value) => String(value).replace(/[&<>"']/g, (c) => ({
+  "&": "&amp;",
+  "<": "&lt;",
+  ">": "&gt;",
+  '"': "&quot;",
+  "'": "&#39;",
+})[c])
+
+const setNextCursor = (cursor) => {
+  nextCursor = cursor
+  document.getElementById("loadMore").classList.toggle("hidden", !cursor)
+}
+
+const getUsers = () => {
+  fetch(`/api/auth`, {
+    method: "GET",
+  })
+
+  .then(res => {
+    if (res.ok){
+      return res.json()
+      .then(data => {
+        
+        console.log(data)
+        refreshUsers(data)
+      })
+    }
+  }) .catch(err => {
+    console.log(err)
+  })
+
+}
+const refreshUsers = (users) => {
+  const container = document.getElementById('issueContainer');
+
+  container.innerHTML = '';
+
+
+  users.forEach(user => {
+
+    const element = 
+    `
+    <div class="mt-2">
+<div class="card">
+  <h5 class="card-header"> ${escapeHtml(user.email)}</h5>
+  <div class="card-body">
+    <h5 class="card-title">
+      ${user.isAdmin == true ? '<span class="badge text-bg-info">Admin</span>' : '<span class="badge text-bg-secondary ">User</span>' }
+      
+</h5>
+    
+  
+    ${isAdmin == true ? `<button  class="btn btn-danger"  name="${escapeHtml(user.id)}" onclick="deleteUser(name)">Delete</button>` : ''}
+    ${user.isAdmin == false && isAdmin == true ? `<button  class="btn btn-primary"  name="${escapeHtml(user.id)}" onclick="promote(name)">Promote to Admin</button>` : ''}
+    
+
+
+  </div>
+
+</div>
+</div>
+</div>
+`
+    container.innerHTML += element;
+  })
+
+}
+
+const getIssues =  () => {
+  fetch(`${listUrl}?${filterParams()}`, {
+    method: "GET",
+  })
+
+  .then(res => {
+    if (res.ok){
+      return res.json()
+      .then(data => {
+        
+        console.log(data)
+        refreshIssues(data.items)
+        setNextCursor(data.next_cursor)
+      })
+    }
+  }) .catch(err => {
+    console.log(err)
+  })
+}
+
+const getIssuesByUser =  () => {
+  
+  fetch(`${listUrl}?${filterParams()}`, {
+    method: "GET",
+  })
+
+  .then(res => {
+    if (res.ok){
+      return res.json()
+      .then(data => {
+        
+        console.log(data)
+        refreshIssues(data.items)
+        setNextCursor(data.next_cursor)
+      })
+    }
+  }) .catch(err => {
+    console.log(err)
+  })
+}
+
+const loadMore = () => {
+  const params = filterParams()
+  params.set("cursor", nextCursor)
+  fetch(`${listUrl}?${params}`, {
+    method: "GET",
+  })
+
+  .then(res => {
+    if (res.ok){
+      return res.json()
+      .then(data => {
+        appendIssues(data.items)
+        setNextCursor(data.next_cursor)
+      })
+    }
+  }) .catch(err => {
+    console.log(err)
+  })
+}
+
+const refreshIssues = (issues) => {
+  const container = document.getElementById('issueContainer');
+
+  container.innerHTML = '';
+  appendIssues(issues)
+}
+
+const appendIssues = (issues) => {
+  const container = document.getElementById('issueContainer');
+
+  issues.forEach(issue => {
+    container.innerHTML += renderIssue(issue);
+  })
+
+}
+
+const renderIssue = (issue) => {
+    switch (issue.type) {
+      case "Account and Access":
+        tag = "btn btn-warning"
+        break;
+      case "Service request":
+        tag = "btn btn-info"
+        break;
+      default:
+        tag = "btn btn-danger"
+        break;
+
+
+
+    }
+    const title = escapeHtml(issue.title)
+    const id = escapeHtml(issue.id)
+    const type = escapeHtml(issue.type.toLowerCase())
+    return       `
+    <div name="${title}" class="issue ${type.replace(' ', '-')} ${title} ${id} mt-2">
+    <div class="card">
+  <h5 class="card-header"> ${title}
+    ${issue.is_resolved == true ? '<span class="badge text-bg-success float-right">Resolved</span>' : "" }
+  </h5>
+  <div class="card-body">
+    <h5 class="card-title"><span class="badge ${tag}">${type}</span></h5>
+    <p class="card-text">${escapeHtml(issue.description)}</p>
+    <button  class="btn btn-primary" data-bs-toggle="modal" data-bs-target="#updateModal" name="${id}" onclick="onModalOpen(name)">Update</button>
+    ${page == "manage" && isAdmin == true && issue.is_resolved == false ?
+    `<button name="${id}" onclick="onResolve(name)" class="btn btn-success">Resolve</button>`
+    :
+    ''
+  }
+  ${page == "manage" && isAdmin == true ?
+    `<button name="${id}" onclick="onDelete(name)" class="btn btn-danger">Delete</button>`
+    :
+    ''
+  }
+    
+
+    <p class="float-right">Opened by: ${escapeHtml(issue.user.email)}</p>
+  </div>
+
+</div>
+</div>
+</div>
+`
+
+}
+
+// Changes made anywhere are pushed over /api/events/issues and applied to the list in place,
+// rather than the whole list being fetched again
+const removeIssue = (id) => {
+  const existing = document.getElementsByClassName(id)[0]
+  if (existing) existing.remove()
+}
+const matchesFilters = (issue) => {
+  const type = document.getElementById("typeFilter")
+  const status = document.getElementById("statusFilter")
+  return (!type || !type.value || issue.type == type.value)
+    && (!status || !status.value || String(issue.is_resolved) == status.value)
+}
+const upsertIssue = (issue) => {
+  const existing = document.getElementsByClassName(issue.id)[0]
+  if (!matchesFilters(issue)) {
+    removeIssue(issue.id)
+  } else if (existing) {
+    existing.outerHTML = renderIssue(issue)
+  } else if (!nextCursor) {
+    // Listings are oldest first, so a new issue is only shown once the last page is loaded
+    document.getElementById('issueContainer').insertAdjacentHTML('beforeend', renderIssue(issue))
+  }
+}
+const applyChanges = (changes) => {
+  // Admins are sent every change, "Your tickets" only shows their own
+  changes = changes.filter(change => page == "manage" || change.owner == userId)
+  const search = document.getElementById("searchFilter")
+  // Only the server knows whether an issue matches a search
+  if (changes.length && search && search.value.trim()) return applyFilters()
+  changes.forEach(change => {
+    switch (change.op) {
+      case "deleted":
+        removeIssue(change.id)
+        break;
+      case "reload":
+        applyFilters()
+        break;
+      default:
+        upsertIssue(change.issue)
+    }
+  })
+}
+const events = page == "issues" || page == "manage" ? new EventSource("/api/events/issues") : null
+if (events) {
+  events.addEventListener("issues", (event) => applyChanges(JSON.parse(event.data)))
+}
+// Once a change is made the stream delivers it, the list is only fetched again without one
+const refreshIfOffline = () => {
+  if (!events || events.readyState != EventSource.OPEN) applyFilters()
+}
+const deleteUser = (id) => {
+  const alert = document.getElementById("updateIssueAlert");
+  var toast = document.getElementById("tostResponse");
+  var toastTitle = document.getElementById("toastTitle");
+  var toastBody = document.getElementById("toastBody");
+  var newToast = new bootstrap.Toast(toast);
+  fetch(`/api/auth/${id}`, {
+    method: "DELETE"
+  })
+  .then(res => {
+    switch (res.status) {
+      case 200:
+        getUsers()
+        toastTitle.textContent = "Success"
+        toastBody.textContent = "Successfully deleted user 😊"
+        newToast.show()
+        break;
+      case 404:
+        alert.setAttribute("class", "alert alert-danger")
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User already deleted by another admin"
+        newToast.show()
+        break;
+      case 403:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User does not have necessary permission"
+        newToast.show()
+        break;
+
+    }
+  
+  }) .catch(err => {
+    console.log(err)
+  })
+}
+
+
+
+const promote = (id) => {
+  const alert = document.getElementById("updateIssueAlert");
+  var toast = document.getElementById("tostResponse");
+  var toastTitle = document.getElementById("toastTitle");
+  var toastBody = document.getElementById("toastBody");
+  var newToast = new bootstrap.Toast(toast);
+  fetch(`/api/auth/promote/${id}`, {
+    method: "PATCH"
+  })
+  .then(res => {
+    switch (res.status) {
+      case 200:
+        getUsers()
+        toastTitle.textContent = "Success"
+        toastBody.textContent = "Successfully promoted user 😊"
+        newToast.show()
+        break;
+      case 404:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User has been deleted by another admin"
+        newToast.show()
+        break;
+      case 403:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User does not have necessary permission 🚫"
+        newToast.show()
+        break;
+      case 400:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User is already an admin"
+        newToast.show()
+        break;
+    }
+  
+  }) .catch(err => {
+    console.log(err)
+  })
+}
+const onModalOpen = (id) => {
+  const updateForm = document.getElementById("updateForm")
+  updateForm.setAttribute("issue-id", `${id}`)
+}
+document.getElementById("updateForm").addEventListener('submit', (event) => {
+
+  
+  event.preventDefault();
+  const alert = document.getElementById("updateIssueAlert");
+  var toast = document.getElementById("tostResponse");
+  var toastTitle = document.getElementById("toastTitle");
+  var toastBody = document.getElementById("toastBody");
+  var newToast = new bootstrap.Toast(toast);
+  const updateForm = document.getElementById("updateForm");
+  const id = updateForm.getAttribute("issue-id");
+  const formData = new FormData(event.target);
+  console.log(formData)
+
+  fetch(`/api/issues/${id}`, {
+    method: "PATCH",
+    body: formData
+  })
+  .then(res => {
+    console.log(res)
+    switch (res.status) {
+      case 200:
+        refreshIfOffline()
+        toastTitle.textContent = "Success"
+        toastBody.textContent = "Successfully updated issue 😊"
+        newToast.show()
+        break;
+      case 404:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "Issue already deleted by another admin"
+        newToast.show()
+        break; 
+    }
+
+
+  }).catch(err => {
+    console.log(err)
+      
+  })
+})
+
+
+
+const onDelete = (id) => {
+  var toast = document.getElementById("tostResponse");
+  var toastTitle = document.getElementById("toastTitle");
+  var toastBody = document.getElementById("toastBody");
+  var newToast = new bootstrap.Toast(toast);
+  const alert = document.getElementById("updateIssueAlert");
+  fetch(`/api/issues/${id}`, {
+    method: "DELETE"
+  })
+  .then(res => {
+    switch (res.status) {
+      case 200:
+        refreshIfOffline()
+        toastTitle.textContent = "Success"
+        toastBody.textContent = "Successfully deleted issue 😊"
+        newToast.show()
+        
+        break;
+      case 404:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "Issue already deleted by another admin"
+        newToast.show()
+        break; 
+      case 403:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User does not have necessary permission"
+        newToast.show()
+        break; 
+
+    }
+
+
+  }).catch(err => {
+    console.log(err)
+      
+  })
+}
+
+const onResolve = (id) => {
+  var toast = document.getElementById("tostResponse");
+  var toastTitle = document.getElementById("toastTitle");
+  var toastBody = document.getElementById("toastBody");
+  var newToast = new bootstrap.Toast(toast);
+  const alert = document.getElementById("updateIssueAlert");
+  fetch(`/api/issues/resolve/${id}`, {
+    method: "PATCH"
+  })
+  .then(res => {
+    console.log(res)
+    switch (res.status) {
+      case 200:
+        refreshIfOffline()
+        toastTitle.textContent = "Success"
+        toastBody.textContent = "Successfully resolved issue 😊"
+        newToast.show()
+        break;
+      case 404:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "Issue already resolved by another admin"
+        newToast.show()
+        break; 
+      case 403:
+        toastTitle.textContent = "Error"
+        toastBody.textContent = "User does not have necessary permission"
+        newToast.show()
+        break; 
+
+    }
+
+
+  }).catch(err => {
+    console.log(err)
+      
+  })
+}
+
+
+// Filtering and search are done by the API, changing a filter reloads the listing from its first page
+const filterParams = () => {
+  const params = new URLSearchParams()
+  const type = document.getElementById("typeFilter")
+  const status = document.getElementById("statusFilter")
+  const search = document.getElementById("searchFilter")
+  if (type && type.value) params.set("type", type.value)
+  if (status && status.value) params.set("is_resolved", status.value)
+  if (search && search.value.trim()) params.set("q", search.value.trim())
+  return params
+}
+const applyFilters = () => {
+  page == "manage" ? getIssues() : getIssuesByUser()
+}
+const clearFilter = () => {
+  document.getElementById("typeFilter").value = ''
+  document.getElementById("statusFilter").value = ''
+  document.getElementById("searchFilter").value = ''
+  applyFilters()
+}
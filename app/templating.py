@@ -0,0 +1,173 @@
+import gzip
+import mimetypes
+import os
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Optional
+from fastapi import Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+from app.config import config
+from app.middleware.caching import etag_matches
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+
+
+# Content codings in the order they are preferred. brotli is optional, without it assets are
+# only precompressed with gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+# One file from app/static, read and compressed once rather than on every request
+@dataclass
+class Asset:
+    name: str
+    hashed_name: str
+    media_type: str
+    digest: str
+    mtime: float
+    # The file as it is under identity, plus each compressed form that came out smaller
+    content: dict
+
+
+def load_asset(path: str, name: str) -> Asset:
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = sha256(data).hexdigest()
+    stem, extension = os.path.splitext(name)
+    content = {"identity": data}
+    compressed = {"gzip": gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(data, quality=11)
+    for encoding, body in compressed.items():
+        if len(body) < len(data):
+            content[encoding] = body
+    return Asset(
+        name=name,
+        hashed_name=f"{stem}.{digest[:12]}{extension}",
+        media_type=mimetypes.guess_type(name)[0] or "application/octet-stream",
+        digest=digest,
+        mtime=os.path.getmtime(path),
+        content=content,
+    )
+
+
+# Picks the preferred coding the client accepts, identity when it accepts none of them
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+# Gives every file in app/static a name carrying a hash of its content, e.g. issues.js is served as
+# issues.3f9a1c2b7d04.js. A file that changes gets a new URL, so browsers can keep each version for
+# good without ever running stale code. Files are compressed as they are scanned, at startup
+class Assets:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files: dict = {}
+        self.hashed: dict = {}
+        self.scan()
+
+    def scan(self):
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            for file in names:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                asset = self.files.get(name)
+                # Unchanged files keep what was built for them last time
+                if asset is None or asset.mtime != os.path.getmtime(path):
+                    asset = load_asset(path, name)
+                files[name] = asset
+        self.files = files
+        self.hashed = {asset.hashed_name: asset for asset in files.values()}
+
+    def url(self, name: str) -> str:
+        # Edits only show up without a restart when templates are reloaded too
+        if config.TEMPLATE_AUTO_RELOAD:
+            self.scan()
+        return f"/static/{self.files[name].hashed_name}"
+
+    def lookup(self, path: str) -> Optional[Asset]:
+        return self.hashed.get(path) or self.files.get(path)
+
+
+# Serves the assets from memory in the best coding the client accepts. Hashed names get a long
+# lived, immutable Cache-Control. The plain names are still served but must be revalidated, as their
+# content changes between releases. ETags are strong, each coding of a file has its own
+class AssetFiles(StaticFiles):
+    def __init__(self, assets: Assets):
+        super().__init__(directory=assets.directory)
+        self.assets = assets
+
+    async def get_response(self, path: str, scope: Scope):
+        name = path.replace(os.sep, "/")
+        asset = self.assets.lookup(name)
+        # Anything not scanned at startup falls through to StaticFiles, which returns the 404s
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), asset.content)
+        tag = asset.digest[:32] if encoding == "identity" else f"{asset.digest[:32]}-{encoding}"
+        headers = {
+            "ETag": f'"{tag}"',
+            "Vary": "Accept-Encoding",
+            "Cache-Control": (
+                f"public, max-age={config.STATIC_MAX_AGE}, immutable"
+                if name == asset.hashed_name
+                else "no-cache"
+            ),
+        }
+        if etag_matches(request_headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(asset.content[encoding], media_type=asset.media_type, headers=headers)
+
+
+def create_environment() -> Environment:
+    # The default directory is created by Jinja itself
+    if config.TEMPLATE_CACHE_DIR is not None:
+        os.makedirs(config.TEMPLATE_CACHE_DIR, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        # Without auto reload a loaded template is never checked against its file again
+        auto_reload=config.TEMPLATE_AUTO_RELOAD,
+        bytecode_cache=FileSystemBytecodeCache(config.TEMPLATE_CACHE_DIR),
+    )
+
+
+# Loads every template so none is compiled while a request waits on it. Compiled templates are
+# written to the bytecode cache, so a worker started later loads them rather than compiling again
+def precompile_templates(env: Environment):
+    for name in env.list_templates():
+        env.get_template(name)
+
+
+assets = Assets(STATIC_DIR)
+templates = Jinja2Templates(env=create_environment())
+templates.env.globals["asset_url"] = assets.url
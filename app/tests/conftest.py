@@ -0,0 +1,121 @@
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+import pytest
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+from app.schemas.session import Principal
+from app.services.cache import listing_cache, session_cache
+
+# Set TEST_DATABASE_URL to run the tests against another database, e.g. a local PostgreSQL
+SQLALCHEMY_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite:///./test.db")
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# Test modules that call the app through a TestClient point get_db at the testing database with this
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Creates the tables for a test and drops them after it, along with anything cached from them
+@pytest.fixture()
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+    session_cache.clear()
+    listing_cache.invalidate()
+
+
+@pytest.fixture()
+def db(test_db):
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+
+
+def principal(user_id, minutes=30, is_admin=False):
+    return Principal(
+        user_id=user_id,
+        email="test2@test.com",
+        is_admin=is_admin,
+        expiry=datetime.now() + timedelta(minutes=minutes),
+    )
+
+
+# Statements longer than this are cut short in a budget failure, the start is enough to spot them
+LISTED_LENGTH = 300
+
+
+def describe(statements: list) -> str:
+    # Identical statements are listed once with how often they ran, which is how an N+1 shows up
+    lines = []
+    for statement, count in Counter(
+        re.sub(r"\s+", " ", statement).strip() for statement in statements
+    ).items():
+        if len(statement) > LISTED_LENGTH:
+            statement = statement[:LISTED_LENGTH] + "..."
+        lines.append(f"  {count}x {statement}")
+    return "\n".join(lines)
+
+
+# A statement as it ran, along with the parameters it ran with
+class Statement(str):
+    def __new__(cls, statement, parameters):
+        self = super().__new__(cls, statement)
+        self.parameters = parameters
+        return self
+
+
+# Every SQL statement run while a test uses the queries fixture, on any engine. Being a list, tests
+# can clear it and look through it, budget checks what a block such as one request runs, e.g.
+#
+#     with queries.budget(2, label="GET /api/issues"):
+#         client.get("/api/issues")
+#
+# fails with a listing of the statements if the block ran more than two of them or, given
+# max_seconds, took longer than that. The block's statements are yielded to look through
+class QueryLog(list):
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.append(Statement(statement, parameters))
+
+    @contextmanager
+    def budget(
+        self,
+        max_queries: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+        label: str = "block",
+    ):
+        __tracebackhide__ = True
+        ran = []
+        start = len(self)
+        started = time.perf_counter()
+        yield ran
+        elapsed = time.perf_counter() - started
+        ran.extend(self[start:])
+        problems = []
+        if max_queries is not None and len(ran) > max_queries:
+            problems.append(f"ran {len(ran)} statements, its budget is {max_queries}")
+        if max_seconds is not None and elapsed > max_seconds:
+            problems.append(f"took {elapsed:.3f}s, its budget is {max_seconds}s")
+        if problems:
+            pytest.fail(f"{label} {' and '.join(problems)}:\n{describe(ran)}")
+
+
+@pytest.fixture()
+def queries():
+    log = QueryLog()
+    event.listen(Engine, "before_cursor_execute", log.record)
+    yield log
+    event.remove(Engine, "before_cursor_execute", log.record)
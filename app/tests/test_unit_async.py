@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app import database
+from app.database import async_url, get_async_db, get_db
+from app.models.Sessiondb import Session as SessionDb
+from app.routers.asyncIssues import router as async_issues_router
+from app.schemas.issue import IssueType
+from app.services.aio import issues, sessions, users
+from app.services.cache import session_cache
+from app.services.users import UserCard
+from app.tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal, engine
+
+
+# The same testing database as the sync tests, through aiosqlite or asyncpg
+ASYNC_SQLALCHEMY_DATABASE_URL = async_url(SQLALCHEMY_DATABASE_URL)
+
+# Connections are not pooled as asyncio.run and the TestClient each use their own event loop
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+# Only the async listing routes are mounted, as they are in main.py when ASYNC_DATABASE is set
+async_app = FastAPI()
+async_app.include_router(async_issues_router, prefix="/api/issues")
+async_app.dependency_overrides[get_async_db] = override_get_async_db
+
+client = TestClient(async_app)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def create_user_with_session(email: str, isAdmin: bool = False):
+    async with TestingAsyncSessionLocal() as db:
+        await users.create_user(db, email, "hash", isAdmin)
+        user_id = await users.get_id_by_email(db, email)
+        return user_id, await sessions.create_session(db, user_id)
+
+
+async def add_issue(user_id: str, title: str):
+    async with TestingAsyncSessionLocal() as db:
+        return await issues.create_issue(
+            db, title, "really good test issue", IssueType.BUG, user_id
+        )
+
+
+# Pointed at the testing database, so the test leaves database.db alone
+def test_get_db_releases_connection(monkeypatch):
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    before = engine.pool.checkedout()
+    generator = get_db()
+    db = next(generator)
+    db.execute(text("SELECT 1"))
+    assert engine.pool.checkedout() == before + 1
+    generator.close()
+    assert engine.pool.checkedout() == before
+
+
+def test_async_issue_lifecycle(test_db):
+    user_id, _ = run(create_user_with_session("test2@test.com"))
+    issue_id = run(add_issue(user_id, "test issue"))
+
+    async def lifecycle():
+        async with TestingAsyncSessionLocal() as db:
+            assert await issues.check_if_issue_exists(db, issue_id)
+            assert await issues.get_user_by_issue_id(db, issue_id) == user_id
+            await issues.update_issue(db, issue_id, {"title": "updated title"})
+            await issues.resolve_issue(db, issue_id)
+            issue = await issues.get_Issue_by_id(db, issue_id)
+            await db.refresh(issue)
+            assert issue.title == "updated title"
+            assert issue.is_resolved
+            await issues.delete_issue(db, issue_id)
+            assert not await issues.check_if_issue_exists(db, issue_id)
+
+    run(lifecycle())
+
+
+def test_async_session_lookup(test_db):
+    user_id, session_id = run(create_user_with_session("test2@test.com"))
+    session_cache.clear()
+
+    async def lookup():
+        async with TestingAsyncSessionLocal() as db:
+            assert await sessions.get_user_by_session(db, session_id) == user_id
+            await sessions.delete_session(db, session_id)
+            assert not await sessions.check_if_session_exists(db, session_id)
+
+    run(lookup())
+
+
+# The user directory loads the columns its cards show, password hashes are never read
+def test_async_get_users_selects_card_columns(test_db, queries):
+    user_id, _ = run(create_user_with_session("test2@test.com", isAdmin=True))
+
+    async def directory():
+        async with TestingAsyncSessionLocal() as db:
+            return await users.get_users(db)
+
+    queries.clear()
+    assert run(directory()) == [UserCard(user_id, "test2@test.com", True)]
+    assert "password" not in queries[-1]
+
+
+def test_async_expired_session_is_rejected(test_db):
+    _, session_id = run(create_user_with_session("admintest@test.com", True))
+
+    async def expire():
+        async with TestingAsyncSessionLocal() as db:
+            await db.execute(
+                update(SessionDb)
+                .where(SessionDb.session_id == session_id)
+                .values(expire_time=datetime.now())
+            )
+            await db.commit()
+
+    run(expire())
+    session_cache.clear()
+    response = client.get("/api/issues/", cookies={"sessionID": session_id})
+    assert response.status_code == 403
+
+
+def test_async_get_all_issues_as_admin(test_db):
+    user_id, session_id = run(create_user_with_session("admintest@test.com", True))
+    first = run(add_issue(user_id, "test issue"))
+    second = run(add_issue(user_id, "test2 issue"))
+
+    response = client.get("/api/issues/", cookies={"sessionID": session_id})
+    assert response.status_code == 200
+    assert [issue["id"] for issue in response.json()["items"]] == [first, second]
+    assert response.json()["items"][0]["user"]["email"] == "admintest@test.com"
+
+    first_page = client.get(
+        "/api/issues/", params={"limit": 1}, cookies={"sessionID": session_id}
+    ).json()
+    assert [issue["id"] for issue in first_page["items"]] == [first]
+    second_page = client.get(
+        "/api/issues/",
+        params={"limit": 1, "cursor": first_page["next_cursor"]},
+        cookies={"sessionID": session_id},
+    ).json()
+    assert [issue["id"] for issue in second_page["items"]] == [second]
+
+
+def test_async_get_all_issues_as_user(test_db):
+    _, session_id = run(create_user_with_session("test2@test.com"))
+    response = client.get("/api/issues/", cookies={"sessionID": session_id})
+    assert response.status_code == 403
+
+
+def test_async_get_user_issues_as_wrong_user(test_db):
+    owner_id, _ = run(create_user_with_session("test2@test.com"))
+    run(add_issue(owner_id, "test issue"))
+    _, session_id = run(create_user_with_session("test15@test.com"))
+
+    response = client.get(f"/api/issues/{owner_id}", cookies={"sessionID": session_id})
+    assert response.status_code == 403
+
+
+def test_async_get_user_issues(test_db):
+    user_id, session_id = run(create_user_with_session("test2@test.com"))
+    issue_id = run(add_issue(user_id, "test issue"))
+
+    response = client.get(f"/api/issues/{user_id}", cookies={"sessionID": session_id})
+    assert response.status_code == 200
+    assert response.json()["items"][0]["id"] == issue_id
@@ -0,0 +1,38 @@
+import time
+import pytest
+from sqlalchemy import create_engine, text
+
+engine = create_engine("sqlite://")
+
+
+def run_selects(count):
+    with engine.connect() as connection:
+        for n in range(count):
+            connection.execute(text(f"select {n % 2}"))
+
+
+def test_budget_yields_the_statements_of_its_block(queries):
+    run_selects(1)
+    with queries.budget(3) as ran:
+        run_selects(3)
+    assert ran == ["select 0", "select 1", "select 0"]
+    assert len(queries) == 4
+
+
+def test_budget_failure_lists_the_statements(queries):
+    with pytest.raises(pytest.fail.Exception) as failed:
+        with queries.budget(2, label="GET /selects"):
+            run_selects(3)
+    # Repeated statements are counted rather than listed again
+    assert str(failed.value) == (
+        "GET /selects ran 3 statements, its budget is 2:\n  2x select 0\n  1x select 1"
+    )
+
+
+def test_budget_failure_on_latency(queries):
+    with pytest.raises(pytest.fail.Exception) as failed:
+        with queries.budget(max_seconds=0.01, label="slow block"):
+            run_selects(1)
+            time.sleep(0.05)
+    assert str(failed.value).startswith("slow block took ")
+    assert "its budget is 0.01s:\n  1x select 0" in str(failed.value)
@@ -0,0 +1,161 @@
+import time
+import pytest
+from app.config import config
+from app.services.cache import (
+    CacheBackend,
+    ListingCache,
+    MemoryBackend,
+    RedisBackend,
+    SessionCache,
+    create_backend,
+)
+from app.tests.conftest import principal
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+# Each backend stands in for one worker, the workers of one test share a fake Redis server
+@pytest.fixture()
+def workers():
+    server = fakeredis.FakeServer()
+    started = []
+
+    def worker(max_size=100, prefix="helpdesk:"):
+        backend = RedisBackend(
+            fakeredis.FakeRedis(server=server), max_size, near_ttl=60, prefix=prefix
+        )
+        backend.start()
+        started.append(backend)
+        return backend
+
+    yield worker
+    for backend in started:
+        backend.close()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, workers):
+    return MemoryBackend(100) if request.param == "memory" else workers()
+
+
+# Invalidations reach other workers asynchronously, so assertions about them wait for delivery
+def eventually(check, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_backends_implement_every_operation():
+    class Partial(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_backend_values(backend):
+    backend.set("a", b"1", 60)
+    assert backend.get("a") == b"1"
+    backend.delete("a")
+    assert backend.get("a") is None
+    backend.set("b", b"2", -1)
+    assert backend.get("b") is None
+
+
+def test_backend_counters(backend):
+    assert backend.counter("c") == 0
+    assert backend.incr("c") == 1
+    assert backend.counter("c") == 1
+    assert backend.setdefault("d", b"first") == b"first"
+    assert backend.setdefault("d", b"second") == b"first"
+
+
+def test_counters_with_a_ttl_expire(workers):
+    backend = MemoryBackend(100)
+    backend.incr("pinned")
+    backend.incr("c", 0.01)
+    time.sleep(0.02)
+    assert backend.counter("c") == 0
+    # The next increment sweeps out the expired counter
+    backend.incr("d", 60)
+    assert set(backend._pinned) == {"pinned", "d"}
+
+    redis_backend = workers()
+    redis_backend.incr("c", 60)
+    assert 0 < redis_backend.client.ttl("helpdesk:c") <= 60
+    redis_backend.incr("pinned")
+    assert redis_backend.client.ttl("helpdesk:pinned") == -1
+
+
+def test_session_cache_generations_expire_after_its_ttl():
+    cache = SessionCache(100, 60)
+    cache.set("a", principal("1"))
+    cache.invalidate_user("1")
+    assert cache.get("a") is None
+    _, expires_at = cache.backend._pinned["user:1"]
+    assert expires_at <= time.monotonic() + 60
+
+
+def test_workers_share_values(workers):
+    first, second = workers(), workers()
+    first.set("a", b"1", 60)
+    assert second.get("a") == b"1"
+    assert second.incr("c") == 1
+    assert first.counter("c") == 1
+
+
+def test_clearing_one_cache_keeps_the_others(workers, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_BACKEND", "redis")
+    assert create_backend(100, "helpdesk:session:").prefix == "helpdesk:session:"
+
+    sessions = SessionCache(100, 60, workers(prefix="helpdesk:session:"))
+    listings = ListingCache(100, backend=workers(prefix="helpdesk:listing:"))
+    sessions.set("a", principal("1"))
+    listings.invalidate()
+    version = listings.version
+    listings.set(("issues",), version, b"listing")
+
+    sessions.clear()
+    assert sessions.get("a") is None
+    assert listings.version == version
+    assert listings.get(("issues",), version) == b"listing"
+
+
+def test_writes_drop_other_workers_near_copies(workers):
+    first, second = workers(), workers()
+    first.set("a", b"1", 60)
+    # The second worker now holds a near copy and reads it without going to Redis
+    assert second.get("a") == b"1"
+    first.set("a", b"2", 60)
+    eventually(lambda: second.get("a") == b"2")
+    first.delete("a")
+    eventually(lambda: second.get("a") is None)
+
+
+def test_session_cache_is_shared_between_workers(workers):
+    first = SessionCache(100, 60, workers())
+    second = SessionCache(100, 60, workers())
+    first.set("a", principal("1"))
+    first.set("b", principal("2"))
+    assert second.get("a").user_id == "1"
+
+    # Promoting user 1 on one worker logs their sessions out of every worker's cache
+    first.invalidate_user("1")
+    eventually(lambda: second.get("a") is None)
+    assert second.get("b") is not None
+
+
+def test_listing_cache_is_shared_between_workers(workers):
+    first = ListingCache(100, backend=workers())
+    second = ListingCache(100, backend=workers())
+    version = first.version
+    assert second.version == version
+    first.set(("issues",), version, b"listing")
+    assert second.get(("issues",), version) == b"listing"
+
+    # A write on one worker changes the version, and so every ETag, on all of them
+    second.invalidate()
+    eventually(lambda: first.version != version)
+    assert first.get(("issues",), first.version) is None
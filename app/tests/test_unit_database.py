@@ -0,0 +1,45 @@
+import asyncio
+from sqlalchemy import text
+from app.config import config
+from app.database import create_async_db_engine, create_db_engine
+
+
+def pragmas(connection):
+    return {
+        name: connection.execute(text(f"PRAGMA {name}")).scalar()
+        for name in ["journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size"]
+    }
+
+
+# synchronous is reported as a number, 1 is NORMAL
+EXPECTED = {
+    "journal_mode": "wal",
+    "synchronous": 1,
+    "busy_timeout": config.SQLITE_BUSY_TIMEOUT,
+    "mmap_size": config.SQLITE_MMAP_SIZE,
+    "cache_size": config.SQLITE_CACHE_SIZE,
+}
+
+
+def test_engine_applies_pragmas(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    with engine.connect() as connection:
+        assert pragmas(connection) == EXPECTED
+    assert engine.pool.size() == config.DB_POOL_SIZE
+    engine.dispose()
+
+
+def test_async_engine_applies_pragmas(tmp_path):
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'pragmas.db'}")
+
+    async def read_pragmas():
+        async with engine.connect() as connection:
+            return await connection.run_sync(pragmas)
+
+    async def check():
+        try:
+            assert await read_pragmas() == EXPECTED
+        finally:
+            await engine.dispose()
+
+    asyncio.run(check())
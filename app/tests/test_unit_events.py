@@ -0,0 +1,220 @@
+import json
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import config
+from app.routers import events as events_router
+from app.routers.events import event_stream, resolve_session
+from app.schemas.issue import IssueType
+from app.services.cache import session_cache
+from app.services import events as events_service
+from app.services.events import Broadcaster, broadcaster, reload_event
+from app.services.issues import create_issue, delete_issue, resolve_issue
+from app.services.sessions import create_session, delete_session
+from app.services.users import create_user, get_id_by_email
+from app.tests.conftest import TestingSessionLocal, principal
+
+
+client = TestClient(app)
+
+
+def change(owner, id="1"):
+    return {"op": "deleted", "owner": owner, "id": id}
+
+
+def received(subscription):
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(json.loads(subscription.queue.get_nowait()))
+    return messages
+
+
+def test_events_require_login():
+    response = client.get("/api/events/issues")
+    assert response.status_code == 401
+
+
+def test_changes_are_scoped_to_owner():
+    async def check():
+        events = Broadcaster()
+        admin = events.subscribe(principal("admin", is_admin=True))
+        first = events.subscribe(principal("1"))
+        second = events.subscribe(principal("2"))
+        other = events.subscribe(principal("3"))
+
+        events.publish([change("1", "a"), change("2", "b"), change("1", "c")])
+        assert received(admin) == [[change("1", "a"), change("2", "b"), change("1", "c")]]
+        assert received(first) == [[change("1", "a"), change("1", "c")]]
+        assert received(second) == [[change("2", "b")]]
+        assert received(other) == []
+
+        for subscription in (admin, first, second, other):
+            events.unsubscribe(subscription)
+        assert not events.active
+
+    asyncio.run(check())
+
+
+def test_slow_client_is_sent_reload(monkeypatch):
+    monkeypatch.setattr(config, "EVENT_QUEUE_SIZE", 2)
+
+    async def check():
+        events = Broadcaster()
+        subscription = events.subscribe(principal("1"))
+        for id in "abc":
+            events.publish([change("1", id)])
+        # The backlog is dropped for one reload rather than growing without bound
+        assert received(subscription) == [[reload_event("1")]]
+
+    asyncio.run(check())
+
+
+# The sync services publish from the threads requests run on
+def test_publish_from_worker_thread():
+    async def check():
+        events = Broadcaster()
+        subscription = events.subscribe(principal("1"))
+        await asyncio.to_thread(events.publish, [change("1")])
+        message = await asyncio.wait_for(subscription.queue.get(), 1)
+        assert json.loads(message) == [change("1")]
+
+    asyncio.run(check())
+
+
+def test_service_changes_reach_stream(db):
+    create_user(db, "owner@test.com", "hash")
+    owner_id = get_id_by_email(db, "owner@test.com")
+
+    async def check():
+        owner = principal(owner_id)
+
+        async def resolve():
+            return owner
+
+        stream = event_stream(broadcaster.subscribe(owner), owner.expiry, resolve)
+        assert await anext(stream) == "retry: 5000\n\n"
+
+        id = create_issue(db, "printer jam", "paper stuck", IssueType.BUG, owner_id)
+        resolve_issue(db, id)
+        delete_issue(db, id)
+
+        changes = []
+        for _ in range(3):
+            event, data = (await anext(stream)).strip().split("\n")
+            assert event == "event: issues"
+            changes += json.loads(data.removeprefix("data: "))
+        assert [c["op"] for c in changes] == ["created", "resolved", "deleted"]
+        assert changes[0]["issue"]["title"] == "printer jam"
+        assert changes[0]["issue"]["user"]["email"] == "owner@test.com"
+        assert changes[1]["issue"]["is_resolved"] is True
+        assert changes[2] == {"op": "deleted", "owner": owner_id, "id": id}
+
+        # Closing the stream drops the subscription
+        await stream.aclose()
+        assert not broadcaster.active
+
+    asyncio.run(check())
+
+
+# Registration only checks an email with email_validator, which accepts addresses the response
+# schema's pattern does not, events for their issues must still be sent
+def test_events_for_emails_the_schema_rejects(db):
+    create_user(db, "John.Smith@mail.co.uk", "hash")
+    owner_id = get_id_by_email(db, "John.Smith@mail.co.uk")
+
+    async def check():
+        admin = broadcaster.subscribe(principal("admin", is_admin=True))
+        try:
+            id = create_issue(db, "printer jam", "paper stuck", IssueType.BUG, owner_id)
+            resolve_issue(db, id)
+            changes = [change for message in received(admin) for change in message]
+        finally:
+            broadcaster.unsubscribe(admin)
+        assert [c["op"] for c in changes] == ["created", "resolved"]
+        assert changes[0]["issue"]["user"]["email"] == "John.Smith@mail.co.uk"
+
+    asyncio.run(check())
+
+
+# The write has committed before its change is published, a change that cannot be sent is logged
+def test_failed_publish_does_not_fail_write(db, monkeypatch):
+    create_user(db, "owner@test.com", "hash")
+    owner_id = get_id_by_email(db, "owner@test.com")
+
+    def broken(message):
+        raise ConnectionError("relay down")
+
+    failures = []
+    monkeypatch.setattr(broadcaster, "_dispatch", broken)
+    monkeypatch.setattr(
+        events_service.logger, "exception", lambda message, **_: failures.append(message)
+    )
+
+    async def check():
+        admin = broadcaster.subscribe(principal("admin", is_admin=True))
+        try:
+            id = create_issue(db, "printer jam", "paper stuck", IssueType.BUG, owner_id)
+            resolve_issue(db, id)
+            delete_issue(db, id)
+        finally:
+            broadcaster.unsubscribe(admin)
+
+    asyncio.run(check())
+    assert failures == ["publishing issue changes failed"] * 3
+
+
+def test_stream_ends_when_session_expires(monkeypatch):
+    monkeypatch.setattr(config, "EVENT_KEEPALIVE", 60)
+
+    async def check():
+        expired = principal("admin", is_admin=True).model_copy(
+            update={"expiry": datetime.now() + timedelta(milliseconds=50)}
+        )
+
+        async def resolve():
+            # The cache drops a session once it has expired
+            return expired if expired.expiry > datetime.now() else None
+
+        stream = event_stream(broadcaster.subscribe(expired), expired.expiry, resolve)
+        assert await anext(stream) == "retry: 5000\n\n"
+        # Ends at the expiry rather than waiting out the keepalive
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(anext(stream), 1)
+        assert not broadcaster.active
+
+    asyncio.run(check())
+
+
+def test_stream_ends_when_session_is_revoked(monkeypatch):
+    monkeypatch.setattr(config, "EVENT_KEEPALIVE", 0.01)
+    admin = principal("admin", is_admin=True)
+    signed_in = [admin, admin, None]
+
+    async def check():
+        async def resolve():
+            return signed_in.pop(0)
+
+        stream = event_stream(broadcaster.subscribe(admin), admin.expiry, resolve)
+        assert await anext(stream) == "retry: 5000\n\n"
+        assert await anext(stream) == ": keepalive\n\n"
+        assert await anext(stream) == ": keepalive\n\n"
+        with pytest.raises(StopAsyncIteration):
+            await anext(stream)
+        assert not broadcaster.active
+
+    asyncio.run(check())
+
+
+def test_resolve_session_does_not_renew(db, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_SLIDING", True)
+    monkeypatch.setattr(events_router, "SessionLocal", TestingSessionLocal)
+    create_user(db, "owner@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "owner@test.com"))
+    expiry = datetime.now() + timedelta(minutes=1)
+    session_cache.set(session_id, principal("owner").model_copy(update={"expiry": expiry}))
+    assert resolve_session(session_id).expiry == expiry
+
+    delete_session(db, session_id)
+    assert resolve_session(session_id) is None
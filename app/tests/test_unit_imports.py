@@ -0,0 +1,145 @@
+import os
+import json
+import pytest
+from app.models.Issuedb import Issue as IssueDb
+from app.models.Userdb import User as UserDb
+from app.schemas.issue import IssueType
+from app.services.cache import listing_cache
+from app.services.hashing import _hash, _verify
+from app.services.imports import detect_format, import_issues, import_users, save_progress
+from app.services.users import create_user
+
+
+def hash_serially(passwords):
+    return [_hash(password) for password in passwords]
+
+
+def write_ndjson(path, rows):
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n")
+    return str(path)
+
+
+def issue_row(number, email="test2@test.com", **fields):
+    return {
+        "title": f"imported issue {number}",
+        "description": "really good test issue",
+        "type": IssueType.BUG.value,
+        "email": email,
+        **fields,
+    }
+
+
+def test_detect_format():
+    assert detect_format("users.CSV") == "csv"
+    assert detect_format("issues.jsonl") == "ndjson"
+    with pytest.raises(ValueError):
+        detect_format("issues.xlsx")
+
+
+def test_import_users_from_csv(db, tmp_path):
+    existing_hash = _hash("already hashed")
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "email,password,isAdmin\n"
+        "test2@test.com,2£23AacD,\n"
+        "not an email,2£23AacD,false\n"
+        f'admintest@test.com,"{existing_hash}",true\n'
+        "test2@test.com,another password,\n"
+    )
+    rejected = []
+
+    report = import_users(
+        db, str(path), "csv", 10, f"{path}.progress", hash_serially,
+        lambda number, reason: rejected.append(number),
+    )
+    # The second row for test2@test.com is left alone and reported as skipped
+    assert report == {"imported": 2, "rejected": 1, "skipped": 1}
+    assert rejected == [3]
+    users = {user.email: user for user in db.query(UserDb).all()}
+    assert _verify(users["test2@test.com"].password, "2£23AacD")
+    assert not users["test2@test.com"].isAdmin
+    assert users["admintest@test.com"].password == existing_hash
+    assert users["admintest@test.com"].isAdmin
+
+
+def test_import_issues_from_ndjson(db, tmp_path, queries):
+    create_user(db, "test2@test.com", "hash")
+    path = tmp_path / "issues.ndjson"
+    rows = [issue_row(n) for n in range(5)]
+    rows[1] = issue_row(1, email="missing@test.com")
+    rows[2] = issue_row(2, type="Not a type")
+    rows[3] = issue_row(3, is_resolved=True, created_at="2024-01-01T09:00:00")
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n{not json\n")
+    rejected = []
+    version = listing_cache.version
+    queries.clear()
+
+    report = import_issues(
+        db, str(path), "ndjson", 2, f"{path}.progress",
+        lambda number, reason: rejected.append((number, reason)),
+    )
+    assert report == {"imported": 3, "rejected": 3, "skipped": 0}
+    assert [number for number, _ in rejected] == [2, 3, 6]
+    assert "missing@test.com" in rejected[0][1]
+    # One insert per chunk of two rows however many of them are valid
+    assert len([s for s in queries if s.startswith("INSERT")]) == 3
+    # Polling admins see the imported issues rather than a 304 for the listing from before
+    assert listing_cache.version != version
+    resolved = db.query(IssueDb).filter(IssueDb.is_resolved).one()
+    assert resolved.title == "imported issue 3"
+    assert resolved.created_at.year == 2024
+    assert not os.path.exists(f"{path}.progress")
+
+
+def test_import_resumes_from_saved_progress(db, tmp_path):
+    create_user(db, "test2@test.com", "hash")
+    path = write_ndjson(tmp_path / "issues.ndjson", [issue_row(n) for n in range(5)])
+    save_progress(f"{path}.progress", 3)
+
+    report = import_issues(db, path, "ndjson", 2, f"{path}.progress")
+    assert report == {"imported": 2, "rejected": 0, "skipped": 3}
+    assert sorted(title for title, in db.query(IssueDb.title).all()) == [
+        "imported issue 3",
+        "imported issue 4",
+    ]
+
+
+def test_import_run_twice_does_not_duplicate(db, tmp_path):
+    create_user(db, "test2@test.com", "hash")
+    path = write_ndjson(tmp_path / "issues.ndjson", [issue_row(n) for n in range(5)])
+    users = write_ndjson(
+        tmp_path / "users.ndjson", [{"email": "test15@test.com", "password": "2£23AacD"}]
+    )
+
+    assert import_issues(db, path, "ndjson", 2, f"{path}.progress")["imported"] == 5
+    import_users(db, users, "ndjson", 2, f"{users}.progress", hash_serially)
+    # Run again every row is already in, and is reported as skipped rather than imported
+    assert import_issues(db, path, "ndjson", 2, f"{path}.progress") == {
+        "imported": 0,
+        "rejected": 0,
+        "skipped": 5,
+    }
+    assert import_users(db, users, "ndjson", 2, f"{users}.progress", hash_serially) == {
+        "imported": 0,
+        "rejected": 0,
+        "skipped": 1,
+    }
+    assert db.query(IssueDb).count() == 5
+    assert db.query(UserDb).count() == 2
+
+
+def test_import_issue_ids_follow_the_rows(db, tmp_path):
+    create_user(db, "test2@test.com", "hash")
+    rows = [issue_row(n) for n in range(3)]
+    path = write_ndjson(tmp_path / "issues.ndjson", rows)
+    import_issues(db, path, "ndjson", 2, f"{path}.progress")
+
+    # The same rows from a renamed file are already in
+    renamed = write_ndjson(tmp_path / "renamed.ndjson", rows)
+    assert import_issues(db, renamed, "ndjson", 2, f"{renamed}.progress")["imported"] == 0
+    assert db.query(IssueDb).count() == 3
+
+    # A different file is imported in full, although its rows are on the same lines
+    other = write_ndjson(tmp_path / "other.ndjson", [issue_row(n + 3) for n in range(3)])
+    import_issues(db, other, "ndjson", 2, f"{other}.progress")
+    assert db.query(IssueDb).count() == 6
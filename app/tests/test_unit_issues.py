@@ -1,33 +1,23 @@
+import csv
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import Base, get_db
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from app.database import get_db
+from app.config import config
+from app.services.cache import ListingCache, listing_cache, session_cache
+from app.services import cache as cache_module, serialization
+from app.services.export import stream_issues
+from app.schemas.issue import ExportFormat
+from app.services.issues import (
+    create_issue,
+    delete_issue,
+    get_issue_cards_page,
+    get_issues_by_user,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-
-@pytest.fixture()
-def test_db():
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+from app.services.users import create_user, get_id_by_email
+from app.schemas.issue import IssueType
+from app.tests.conftest import TestingSessionLocal, override_get_db
 
 
 @pytest.fixture()
@@ -107,7 +97,7 @@ def test_XSS_attack_on_issue_title(test_db, login_user):
     response_data = response.json()
 
     # ensures the title is a string, so scripts cant be run
-    assert isinstance(response_data[0]["title"],str)
+    assert isinstance(response_data["items"][0]["title"],str)
 
 
 def test_create_issue_bad_type(test_db, login_user):
@@ -189,7 +179,7 @@ def test_get_user_issues(test_db, login_user):
     response = client.get(f"/api/issues/{user_id}")
     assert response.status_code == 200
     response_data = response.json()
-    assert response_data[0]["id"] == issue_id
+    assert response_data["items"][0]["id"] == issue_id
 
 
 def test_get_user_issues_as_wrong_user(test_db):
@@ -523,6 +513,462 @@ def test_get_all_issues_as_admin(test_db, login_admin):
 
     get_issues = client.get("/api/issues")
     assert get_issues.status_code == 200
-    issues = get_issues.json()
+    issues = get_issues.json()["items"]
     assert issues[0]["id"] == created_issue_1.json()
     assert issues[1]["id"] == created_issue_2.json()
+
+
+def test_get_all_issues_resolves_session_once(test_db, login_admin, queries):
+    created_issue = client.post(
+        "/api/issues",
+        data={
+            "title": "test issue",
+            "type": "Bug",
+            "description": "really good test issue",
+        },
+    )
+    assert created_issue.status_code == 200
+    session_cache.clear()
+
+    # One joined lookup for the session and role, and one for the issues with their users
+    with queries.budget(2, label="GET /api/issues") as ran:
+        get_issues = client.get("/api/issues")
+    assert get_issues.status_code == 200
+    assert len([s for s in ran if "FROM sessions" in s]) == 1
+
+    # Once the session and the listing are cached nothing goes to the database
+    with queries.budget(0, label="GET /api/issues, cached"):
+        get_issues = client.get("/api/issues")
+    assert get_issues.status_code == 200
+
+
+def test_get_user_issues_resolves_session_once(test_db, login_user, queries):
+    created_issue = client.post(
+        "/api/issues",
+        data={
+            "title": "test issue",
+            "type": "Bug",
+            "description": "really good test issue",
+        },
+    )
+    assert created_issue.status_code == 200
+    get_id = client.post("/api/auth/getid", data={"email": "test2@test.com"})
+    user_id = get_id.content.decode().replace('"', "")
+    session_cache.clear()
+
+    with queries.budget(2, label="GET /api/issues/{user_id}") as ran:
+        response = client.get(f"/api/issues/{user_id}")
+    assert response.status_code == 200
+    assert len([s for s in ran if "FROM sessions" in s]) == 1
+
+
+def test_get_all_issues_query_count_is_constant(test_db, login_admin, queries):
+    # Every issue gets its own owner, so a lazily loaded issue.user would cost a query each
+    def create_issues(start, count):
+        db = TestingSessionLocal()
+        for i in range(start, start + count):
+            create_user(db, f"owner{i}@test.com", "hash")
+            create_issue(
+                db,
+                f"test issue {i}",
+                "really good test issue",
+                IssueType.BUG,
+                get_id_by_email(db, f"owner{i}@test.com"),
+            )
+        db.close()
+
+    # The session is warm from logging in, the listing is one joined query for one issue as for many
+    for start, count, listed in [(0, 1, 1), (1, 10, 11)]:
+        create_issues(start, count)
+        with queries.budget(1, label=f"GET /api/issues listing {listed}"):
+            response = client.get("/api/issues")
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == listed
+
+
+# Clients must not be able to tell the FAST_JSON_LISTINGS rows from the response models
+def test_fast_listings_match_response_models(test_db, login_admin, monkeypatch):
+    created = client.post(
+        "/api/issues",
+        data={"title": 'Ünïcode "quoted" \\ </script>', "type": "Bug", "description": "ü\n\t"},
+    )
+    assert created.status_code == 200
+    ids = bulk_create(3)
+    client.patch(f"/api/issues/resolve/{ids[1]}")
+    get_id = client.post("/api/auth/getid", data={"email": "admintest@test.com"})
+    user_id = get_id.content.decode().replace('"', "")
+
+    def listings():
+        listing_cache.invalidate()
+        first = client.get("/api/issues/", params={"limit": 2})
+        second = client.get(
+            "/api/issues/", params={"limit": 2, "cursor": first.json()["next_cursor"]}
+        )
+        by_user = client.get(f"/api/issues/{user_id}", params={"is_resolved": False})
+        return [response.content for response in (first, second, by_user)]
+
+    monkeypatch.setattr(config, "FAST_JSON_LISTINGS", True)
+    fast = listings()
+    monkeypatch.setattr(config, "FAST_JSON_LISTINGS", False)
+    assert listings() == fast
+    # Without orjson the json module writes the same bytes
+    monkeypatch.setattr(config, "FAST_JSON_LISTINGS", True)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert listings() == fast
+    assert json.loads(fast[0])["items"][0]["title"] == 'Ünïcode "quoted" \\ </script>'
+    assert len(json.loads(fast[2])["items"]) == 3
+
+
+def test_listings_document_their_page_models():
+    paths = app.openapi()["paths"]
+    for path, model in [
+        ("/api/issues/", "IssuePage"),
+        ("/api/issues/{user_id}", "IssuesByUserPage"),
+    ]:
+        response = paths[path]["get"]["responses"]["200"]
+        schema = response["content"]["application/json"]["schema"]
+        assert schema == {"$ref": f"#/components/schemas/{model}"}
+
+
+def test_get_all_issues_pages(test_db, login_admin):
+    created = []
+    for i in range(5):
+        response = client.post(
+            "/api/issues",
+            data={
+                "title": f"test issue {i}",
+                "type": "Bug",
+                "description": "really good test issue",
+            },
+        )
+        assert response.status_code == 200
+        created.append(response.json())
+
+    first_page = client.get("/api/issues/", params={"limit": 2}).json()
+    assert [issue["id"] for issue in first_page["items"]] == created[:2]
+    second_page = client.get(
+        "/api/issues/", params={"limit": 2, "cursor": first_page["next_cursor"]}
+    ).json()
+    assert [issue["id"] for issue in second_page["items"]] == created[2:4]
+    last_page = client.get(
+        "/api/issues/", params={"limit": 2, "cursor": second_page["next_cursor"]}
+    ).json()
+    assert [issue["id"] for issue in last_page["items"]] == created[4:]
+    assert last_page["next_cursor"] is None
+
+
+def test_get_user_issues_pages(test_db, login_user):
+    for i in range(3):
+        client.post(
+            "/api/issues",
+            data={
+                "title": f"test issue {i}",
+                "type": "Bug",
+                "description": "really good test issue",
+            },
+        )
+    get_id = client.post("/api/auth/getid", data={"email": "test2@test.com"})
+    user_id = get_id.content.decode().replace('"', "")
+
+    first_page = client.get(f"/api/issues/{user_id}", params={"limit": 2}).json()
+    assert len(first_page["items"]) == 2
+    last_page = client.get(
+        f"/api/issues/{user_id}",
+        params={"limit": 2, "cursor": first_page["next_cursor"]},
+    ).json()
+    assert len(last_page["items"]) == 1
+    assert last_page["next_cursor"] is None
+
+
+def test_get_all_issues_limit_capped(test_db, login_admin):
+    response = client.get("/api/issues/", params={"limit": 100000})
+    assert response.status_code == 422
+
+
+def test_get_all_issues_bad_cursor(test_db, login_admin):
+    response = client.get("/api/issues/", params={"cursor": "not a cursor"})
+    assert response.status_code == 400
+
+
+def test_get_all_issues_filters(test_db, login_admin):
+    db = TestingSessionLocal()
+    create_user(db, "owner@test.com", "hash")
+    owner_id = get_id_by_email(db, "owner@test.com")
+    bug = create_issue(db, "printer jam", "paper stuck", IssueType.BUG, owner_id)
+    request = create_issue(
+        db, "new laptop", "for the new starter", IssueType.SERVICE_REQUEST, owner_id
+    )
+    db.close()
+    admin_issue = client.post(
+        "/api/issues",
+        data={"title": "admin issue", "type": "Bug", "description": "really good test issue"},
+    ).json()
+    assert client.patch(f"/api/issues/resolve/{bug}").status_code == 200
+
+    def listed(**params):
+        response = client.get("/api/issues/", params=params)
+        assert response.status_code == 200
+        return [issue["id"] for issue in response.json()["items"]]
+
+    assert listed(type="Bug") == [bug, admin_issue]
+    assert listed(is_resolved=False) == [request, admin_issue]
+    assert listed(owner=owner_id) == [bug, request]
+    assert listed(owner=owner_id, type="Service request") == [request]
+    assert client.get("/api/issues/", params={"type": "wrong_type"}).status_code == 422
+
+
+def test_get_all_issues_not_modified(test_db, login_admin, queries):
+    ids = bulk_create(2)
+    first = client.get("/api/issues/")
+    etag = first.headers["ETag"]
+
+    # An unchanged poll is answered from the ETag alone
+    with queries.budget(0, label="GET /api/issues/ with If-None-Match"):
+        unchanged = client.get("/api/issues/", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    # Other filters are cached separately
+    filtered = client.get("/api/issues/", params={"is_resolved": True})
+    assert filtered.headers["ETag"] != etag
+    assert filtered.json()["items"] == []
+
+    # Any write to issues makes every cached listing stale
+    client.patch(f"/api/issues/resolve/{ids[0]}")
+    changed = client.get("/api/issues/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["items"][0]["is_resolved"]
+    assert len(client.get("/api/issues/", params={"is_resolved": True}).json()["items"]) == 1
+
+
+def test_manage_page_not_modified(test_db, login_admin):
+    first = client.get("/manage")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    # The page is gzipped, so its ETag is weak, and it still matches on the next poll
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert etag.startswith("W/")
+    assert client.get("/manage", headers={"If-None-Match": etag}).status_code == 304
+
+    bulk_create(1)
+    changed = client.get("/manage", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert "bulk issue 0" in changed.text
+
+
+def test_pages_render_issue_cards(test_db, login_admin, queries):
+    ids = bulk_create(2)
+    client.patch(f"/api/issues/resolve/{ids[1]}")
+    # One query for the page of cards, the session is warm from logging in
+    with queries.budget(1, label="GET /manage") as ran:
+        manage = client.get("/manage")
+    assert manage.status_code == 200
+    assert "bulk issue 1" in manage.text
+    assert "admintest@test.com" in manage.text
+    assert not any("password" in statement for statement in ran)
+    issues = client.get("/issues")
+    assert "bulk issue 0" in issues.text
+
+
+def test_issue_cards_share_their_users(test_db):
+    db = TestingSessionLocal()
+    create_user(db, "test2@test.com", "hash")
+    user_id = get_id_by_email(db, "test2@test.com")
+    for title in ("first", "second"):
+        create_issue(db, title, "really good test issue", IssueType.BUG, user_id)
+    page = get_issue_cards_page(db, 1)
+    cards = get_issues_by_user(db, user_id)
+    db.close()
+
+    assert [card.title for card in page["items"]] == ["first"]
+    assert page["next_cursor"] is not None
+    assert sorted(card.title for card in cards) == ["first", "second"]
+    assert cards[0].user is cards[1].user
+    assert cards[0].user.email == "test2@test.com"
+    assert not hasattr(cards[0], "__dict__")
+
+
+# A write made around the services cannot bump the version, so an ETag stops matching after ttl
+def test_listing_etag_expires_after_ttl(monkeypatch):
+    cache = ListingCache(max_size=2, ttl=600)
+    version = cache.version
+    monkeypatch.setattr(cache_module.time, "time", lambda: 1200.0)
+    etag = cache.etag(("issues",), version)
+    monkeypatch.setattr(cache_module.time, "time", lambda: 1799.0)
+    assert cache.etag(("issues",), version) == etag
+    monkeypatch.setattr(cache_module.time, "time", lambda: 1800.0)
+    assert cache.etag(("issues",), version) != etag
+
+
+def test_listing_cache_drops_stale_renders():
+    cache = ListingCache(max_size=2)
+    version = cache.version
+    # A write lands while the listing is being rendered from the old data
+    cache.invalidate()
+    cache.set(("issues",), version, b"stale")
+    assert cache.get(("issues",), cache.version) is None
+    cache.set(("issues",), cache.version, b"fresh")
+    assert cache.get(("issues",), cache.version) == b"fresh"
+
+
+def test_search_issues(test_db, login_user):
+    created = {}
+    for title, description in [
+        ("login page broken", "the login button does nothing"),
+        ("printer jam", "paper stuck in tray two"),
+        ("vpn drops", "disconnects after logging in"),
+    ]:
+        response = client.post(
+            "/api/issues", data={"title": title, "type": "Bug", "description": description}
+        )
+        created[title] = response.json()
+    get_id = client.post("/api/auth/getid", data={"email": "test2@test.com"})
+    user_id = get_id.content.decode().replace('"', "")
+
+    def search(q):
+        response = client.get(f"/api/issues/{user_id}", params={"q": q})
+        assert response.status_code == 200
+        return [issue["id"] for issue in response.json()["items"]]
+
+    assert search("printer") == [created["printer jam"]]
+    # Descriptions are searched too and words match as prefixes
+    assert search("tray") == [created["printer jam"]]
+    assert search("log") == [created["login page broken"], created["vpn drops"]]
+    assert search("login button") == [created["login page broken"]]
+    # Search syntax typed by the user is treated as plain words
+    assert search('"printer* (') == [created["printer jam"]]
+    assert search("keyboard") == []
+
+    # The search index follows updates and deletes
+    client.patch(f"/api/issues/{created['printer jam']}", data={"title": "scanner jam"})
+    assert search("printer") == []
+    assert search("scanner") == [created["printer jam"]]
+    db = TestingSessionLocal()
+    delete_issue(db, created["printer jam"])
+    db.close()
+    assert search("scanner") == []
+
+
+def bulk_payload(count):
+    return {
+        "issues": [
+            {"title": f"bulk issue {i}", "type": "Bug", "description": "imported issue"}
+            for i in range(count)
+        ]
+    }
+
+
+def bulk_create(count):
+    response = client.post("/api/issues/bulk", json=bulk_payload(count))
+    assert response.status_code == 200
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_bulk_create_issues(test_db, login_user):
+    response = client.post("/api/issues/bulk", json=bulk_payload(3))
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created"] * 3
+
+    get_id = client.post("/api/auth/getid", data={"email": "test2@test.com"})
+    user_id = get_id.content.decode().replace('"', "")
+    listed = client.get(f"/api/issues/{user_id}").json()["items"]
+    # Issues are owned by the caller and listed in the order they were sent
+    assert [issue["id"] for issue in listed] == [result["id"] for result in results]
+    assert [issue["title"] for issue in listed] == [f"bulk issue {i}" for i in range(3)]
+
+
+def test_bulk_create_issues_validates_every_item(test_db, login_user):
+    payload = bulk_payload(2)
+    payload["issues"][1]["type"] = "wrong_type"
+    assert client.post("/api/issues/bulk", json=payload).status_code == 422
+    assert client.post("/api/issues/bulk", json={"issues": []}).status_code == 422
+
+    get_id = client.post("/api/auth/getid", data={"email": "test2@test.com"})
+    user_id = get_id.content.decode().replace('"', "")
+    assert client.get(f"/api/issues/{user_id}").json()["items"] == []
+
+
+def test_bulk_create_issues_signed_out(test_db):
+    assert client.post("/api/issues/bulk", json=bulk_payload(1)).status_code == 401
+
+
+def test_bulk_resolve_and_delete_as_admin(test_db, login_admin):
+    ids = bulk_create(3)
+    client.patch(f"/api/issues/resolve/{ids[0]}")
+
+    response = client.patch("/api/issues/bulk/resolve", json={"ids": ids + ["missing"]})
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "already_resolved",
+        "resolved",
+        "resolved",
+        "not_found",
+    ]
+    listed = client.get("/api/issues/", params={"is_resolved": True}).json()["items"]
+    assert len(listed) == 3
+
+    response = client.post("/api/issues/bulk/delete", json={"ids": [ids[0], "missing", ids[1]]})
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"id": ids[0], "status": "deleted"},
+        {"id": "missing", "status": "not_found"},
+        {"id": ids[1], "status": "deleted"},
+    ]
+    assert [issue["id"] for issue in client.get("/api/issues/").json()["items"]] == [ids[2]]
+
+
+def test_bulk_resolve_and_delete_as_user(test_db, login_user):
+    ids = bulk_create(1)
+    assert client.patch("/api/issues/bulk/resolve", json={"ids": ids}).status_code == 403
+    assert client.post("/api/issues/bulk/delete", json={"ids": ids}).status_code == 403
+
+
+def test_bulk_query_count_is_constant(test_db, login_admin, queries):
+    # One select of the issues that exist and one statement changing them, however many there are
+    for count in (1, 20):
+        ids = bulk_create(count)
+        with queries.budget(2, label=f"PATCH /api/issues/bulk/resolve of {count}"):
+            resolved = client.patch("/api/issues/bulk/resolve", json={"ids": ids})
+        assert resolved.status_code == 200
+        with queries.budget(2, label=f"POST /api/issues/bulk/delete of {count}"):
+            deleted = client.post("/api/issues/bulk/delete", json={"ids": ids})
+        assert deleted.status_code == 200
+
+
+def test_export_issues_ndjson(test_db, login_admin):
+    ids = bulk_create(3)
+    client.patch(f"/api/issues/resolve/{ids[1]}")
+
+    response = client.get("/api/export/issues")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["id"] for record in records] == ids
+    assert records[0]["email"] == "admintest@test.com"
+    assert records[0]["type"] == "Bug"
+
+    response = client.get("/api/export/issues", params={"is_resolved": True})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [ids[1]]
+
+
+def test_export_issues_csv(test_db, login_admin):
+    ids = bulk_create(2)
+    response = client.get("/api/export/issues", params={"format": "csv", "q": "bulk"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(response.text.splitlines()))
+    assert [row["id"] for row in rows] == ids
+    assert rows[0]["title"] == "bulk issue 0"
+
+
+def test_export_issues_as_user(test_db, login_user):
+    bulk_create(1)
+    assert client.get("/api/export/issues").status_code == 403
+
+
+def test_export_issues_streams_in_chunks(test_db, login_admin, monkeypatch):
+    monkeypatch.setattr(config, "EXPORT_CHUNK_SIZE", 2)
+    bulk_create(5)
+    db = TestingSessionLocal()
+    chunks = list(stream_issues(db, ExportFormat.NDJSON))
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
@@ -0,0 +1,137 @@
+import json
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.main import app
+from app.config import config
+from app.logs import JsonFormatter, configure_logging
+from app.middleware.metrics import MetricsMiddleware
+from app.routers.metrics import router as metrics_router
+from app.services.metrics import IN_FLIGHT, Histogram, instrument_engines, render
+
+client = TestClient(app)
+
+engine = create_engine("sqlite://")
+
+# A bare app with the metrics set up as METRICS_ENABLED sets them up, so no other request adds to
+# what the tests count
+instrument_engines()
+measured = FastAPI()
+measured.add_middleware(MetricsMiddleware)
+measured.include_router(metrics_router)
+
+
+# Sync routes run on a worker thread, their statements must still be counted against the request
+@measured.get("/queries/{count}")
+def run_queries(count: int):
+    with engine.connect() as connection:
+        for _ in range(count):
+            connection.execute(text("select 1"))
+
+
+@measured.get("/fails")
+def fails():
+    raise ValueError("broken")
+
+
+# Reports the requests in flight once its response has started
+@measured.get("/stream")
+async def stream():
+    async def body():
+        yield f"data: {IN_FLIGHT.value():g}\n\n"
+
+    return StreamingResponse(body(), media_type="text/event-stream")
+
+
+measured_client = TestClient(measured, raise_server_exceptions=False)
+
+
+def sample(metrics: str, series: str) -> float:
+    for line in metrics.splitlines():
+        name, _, value = line.rpartition(" ")
+        if name == series:
+            return float(value)
+    return 0.0
+
+
+def test_metrics_endpoint():
+    series = 'helpdesk_requests_total{method="GET",route="/queries/{count}",status="200"}'
+    before = sample(render(), series)
+    measured_client.get("/queries/0")
+    response = measured_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert sample(response.text, series) == before + 1
+    assert "# TYPE helpdesk_request_duration_seconds histogram" in response.text
+    assert 'helpdesk_cache_hits_total{cache="session"}' in response.text
+    assert "helpdesk_event_streams 0" in response.text
+
+
+@pytest.mark.skipif(config.METRICS_ENABLED, reason="METRICS_ENABLED is set")
+def test_metrics_are_off_by_default():
+    assert client.get("/metrics").status_code == 404
+
+
+def test_queries_counted_per_request():
+    labels = '{method="GET",route="/queries/{count}"}'
+    queries = sample(render(), f"helpdesk_request_db_queries_sum{labels}")
+    requests = sample(render(), f"helpdesk_request_db_queries_count{labels}")
+    measured_client.get("/queries/3")
+    measured_client.get("/queries/2")
+
+    metrics = render()
+    # Labelled by route, not by the path each request asked for
+    assert sample(metrics, f"helpdesk_request_db_queries_count{labels}") == requests + 2
+    assert sample(metrics, f"helpdesk_request_db_queries_sum{labels}") == queries + 5
+    assert sample(metrics, f"helpdesk_request_db_seconds_sum{labels}") > 0
+    assert sample(metrics, "helpdesk_requests_in_flight") == 0
+
+
+def test_event_streams_are_not_in_flight():
+    before = IN_FLIGHT.value()
+    assert measured_client.get("/stream").text == f"data: {before:g}\n\n"
+    assert IN_FLIGHT.value() == before
+
+
+def test_failed_requests_counted():
+    name = 'helpdesk_requests_total{method="GET",route="/fails",status="500"}'
+    before = sample(render(), name)
+    assert measured_client.get("/fails").status_code == 500
+    assert sample(render(), name) == before + 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency", "help", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "/")
+    lines = [f"{name}{labels} {value}" for name, labels, value in histogram.samples()]
+    assert lines == [
+        'latency_bucket{route="/",le="0.1"} 1',
+        'latency_bucket{route="/",le="1.0"} 3',
+        'latency_bucket{route="/",le="+Inf"} 4',
+        'latency_sum{route="/"} 6.05',
+        'latency_count{route="/"} 4',
+    ]
+
+
+def test_logs_are_json_with_extra_fields():
+    record = logging.makeLogRecord(
+        {"name": "app.test", "levelname": "INFO", "msg": "updating %s", "args": ("issue",)}
+    )
+    record.issue_id = "1"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "updating issue"
+    assert entry["level"] == "INFO"
+    assert entry["issue_id"] == "1"
+
+
+def test_logging_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(config, "LOG_LEVEL", "OFF")
+    configure_logging()
+    assert not logging.getLogger("app.routers.issues").isEnabledFor(logging.CRITICAL)
+    monkeypatch.setattr(config, "LOG_LEVEL", "INFO")
+    configure_logging()
+    assert logging.getLogger("app.routers.issues").isEnabledFor(logging.INFO)
@@ -0,0 +1,119 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    select,
+)
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+from app.migrations import OBSOLETE_INDEXES, run_migrations
+from app.models.Issuedb import Issue as IssueDb
+from app.schemas.issue import IssueType
+from app.services.issues import get_issue_cards_page
+
+# The tables as the first version of the app created them: no created_at, no search index and an
+# index on every column the first queries filtered on
+old_schema = MetaData()
+Table(
+    "users",
+    old_schema,
+    Column("id", String, primary_key=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("password", String, nullable=False),
+    Column("isAdmin", Boolean, nullable=False),
+)
+old_issues = Table(
+    "issues",
+    old_schema,
+    Column("id", String, primary_key=True),
+    Column("title", String, index=True, nullable=False),
+    Column("description", String, index=True, nullable=False),
+    Column("type", Enum(IssueType), index=True, nullable=False),
+    Column("user_id", String, ForeignKey("users.id"), nullable=False),
+    Column("is_resolved", Boolean, nullable=False),
+)
+Table(
+    "sessions",
+    old_schema,
+    Column("user_id", String, nullable=False),
+    Column("session_id", String, unique=True, index=True, primary_key=True),
+    Column("expire_time", DateTime, nullable=False),
+)
+
+
+def old_database(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    old_schema.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(
+            old_schema.tables["users"].insert(),
+            {"id": "1", "email": "test2@test.com", "password": "hash", "isAdmin": False},
+        )
+        connection.execute(
+            old_issues.insert(),
+            [
+                {
+                    "id": id,
+                    "title": title,
+                    "description": "really good test issue",
+                    "type": IssueType.BUG,
+                    "user_id": "1",
+                    "is_resolved": False,
+                }
+                # Inserted out of ID order, listings must keep the order they were inserted in
+                for id, title in [("c", "printer jam"), ("a", "lost password"), ("b", "no wifi")]
+            ],
+        )
+    return engine
+
+
+# What app.main does on start up
+def migrate(engine):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+def test_migrations_bring_an_old_database_up_to_date(tmp_path):
+    engine = old_database(tmp_path)
+    migrate(engine)
+
+    inspector = inspect(engine)
+    assert "created_at" in [column["name"] for column in inspector.get_columns("issues")]
+    assert "issues_fts" in inspector.get_table_names()
+    indexes = {
+        index["name"] for table in ("issues", "sessions") for index in inspector.get_indexes(table)
+    }
+    assert indexes.isdisjoint(OBSOLETE_INDEXES)
+    assert {index.name for index in IssueDb.__table__.indexes} <= indexes
+
+    db = sessionmaker(bind=engine)()
+    try:
+        page = get_issue_cards_page(db, 10)
+        assert [card.id for card in page["items"]] == ["c", "a", "b"]
+        # The search index is filled from the issues already there, and kept up by the triggers
+        searched = get_issue_cards_page(db, 10, search="printer")
+        assert [card.id for card in searched["items"]] == ["c"]
+        db.execute(IssueDb.__table__.update().where(IssueDb.id == "a").values(title="printer fire"))
+        db.commit()
+        searched = get_issue_cards_page(db, 10, search="printer")
+        assert [card.id for card in searched["items"]] == ["c", "a"]
+    finally:
+        db.close()
+    engine.dispose()
+
+
+def test_migrations_can_run_on_every_start_up(tmp_path):
+    engine = old_database(tmp_path)
+    migrate(engine)
+    with engine.connect() as connection:
+        created = connection.execute(select(IssueDb.id, IssueDb.created_at)).all()
+    migrate(engine)
+    with engine.connect() as connection:
+        assert connection.execute(select(IssueDb.id, IssueDb.created_at)).all() == created
+    engine.dispose()
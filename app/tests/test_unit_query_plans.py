@@ -0,0 +1,143 @@
+import pytest
+from app.schemas.issue import IssueType
+from app.services.cache import session_cache
+from app.services.issues import (
+    check_if_issue_exists,
+    create_issue,
+    get_Issue_by_id,
+    get_issue_cards_page,
+    get_issue_rows_page,
+    get_issues_by_user,
+    get_issues_page,
+    get_user_by_issue_id,
+)
+from app.services.sessions import create_session, expired_sessions, get_principal
+from app.services.users import (
+    check_if_User_exists_by_email,
+    create_user,
+    get_id_by_email,
+    get_users,
+)
+from app.tests.conftest import engine
+
+
+# The plans checked here are SQLite's
+pytestmark = pytest.mark.skipif(
+    engine.dialect.name != "sqlite", reason="EXPLAIN QUERY PLAN is SQLite only"
+)
+
+
+# The SELECTs among the statements the queries fixture recorded, each keeps its parameters
+def selects(statements):
+    return [
+        statement
+        for statement in statements
+        if statement.lstrip().upper().startswith("SELECT")
+    ]
+
+
+def query_plan(statement, parameters):
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in rows]
+
+
+# A plain "SCAN <table>" reads every row, scans of an index or of the issues_fts index are fine
+def full_scans(plan):
+    return [
+        step
+        for step in plan
+        if step.startswith("SCAN ")
+        and "USING" not in step
+        and "VIRTUAL TABLE" not in step
+        and step != "SCAN CONSTANT ROW"
+    ]
+
+
+def seed(db):
+    create_user(db, "test2@test.com", "hash")
+    user_id = get_id_by_email(db, "test2@test.com")
+    session_id = create_session(db, user_id)
+    issues = [
+        create_issue(db, f"test issue {i}", "really good test issue", IssueType.BUG, user_id)
+        for i in range(3)
+    ]
+    session_cache.clear()
+    return user_id, session_id, issues
+
+
+# The three ways a page of issues is loaded: ORM objects when FAST_JSON_LISTINGS is off, plain rows
+# for the JSON listings and cards for the issues and manage pages. Each must use the same plan
+LISTINGS = pytest.mark.parametrize(
+    "listing", [get_issues_page, get_issue_rows_page, get_issue_cards_page]
+)
+
+
+@LISTINGS
+def test_hot_queries_use_indexes(db, queries, listing):
+    user_id, session_id, issues = seed(db)
+    queries.clear()
+
+    get_principal(db, session_id)
+    check_if_User_exists_by_email(db, "test2@test.com")
+    get_id_by_email(db, "test2@test.com")
+    get_Issue_by_id(db, issues[0])
+    check_if_issue_exists(db, issues[0])
+    get_user_by_issue_id(db, issues[0])
+    get_issues_by_user(db, user_id)
+    first_page = listing(db, 1)
+    listing(db, 1, first_page["next_cursor"])
+    listing(db, 1, None, user_id)
+    listing(db, 1, first_page["next_cursor"], user_id)
+    listing(db, 1, None, None, type=IssueType.BUG, is_resolved=False)
+    listing(db, 1, None, None, is_resolved=False)
+    listing(db, 1, None, None, type=IssueType.BUG)
+    listing(db, 1, None, None, search="test")
+
+    assert len(selects(queries)) == 15
+    for statement in selects(queries):
+        assert full_scans(query_plan(statement, statement.parameters)) == [], statement
+
+
+@LISTINGS
+def test_listings_seek_on_their_index(db, queries, listing):
+    user_id, _, _ = seed(db)
+    first_page = listing(db, 1)
+    queries.clear()
+
+    listing(db, 1, first_page["next_cursor"])
+    listing(db, 1, None, user_id)
+    listing(db, 1, None, None, type=IssueType.BUG, is_resolved=False)
+    listing(db, 1, None, None, is_resolved=False)
+    listing(db, 1, None, None, type=IssueType.BUG)
+
+    expected = [
+        "SEARCH issues USING INDEX ix_issues_created_at_id",
+        "SEARCH issues USING INDEX ix_issues_user_id_created_at_id",
+        "SEARCH issues USING INDEX ix_issues_is_resolved_type_created_at_id",
+        "SEARCH issues USING INDEX ix_issues_is_resolved_created_at_id",
+        "SEARCH issues USING INDEX ix_issues_type_created_at_id",
+    ]
+    for statement, index in zip(selects(queries), expected, strict=True):
+        plan = query_plan(statement, statement.parameters)
+        assert any(step.startswith(index) for step in plan), plan
+        # Without a sort step a page costs the same however many issues match
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+# The user directory lists every user, so reading the whole table is the plan, but not sorting it
+def test_user_directory_is_read_without_sorting(db, queries):
+    seed(db)
+    queries.clear()
+    get_users(db)
+    [statement] = selects(queries)
+    plan = query_plan(statement, statement.parameters)
+    assert full_scans(plan) == ["SCAN users"], plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_session_purge_seeks_on_expiry(db):
+    compiled = expired_sessions(500).compile(engine)
+    parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+    plan = query_plan(str(compiled), parameters)
+    assert any(step.startswith("SEARCH sessions USING") for step in plan), plan
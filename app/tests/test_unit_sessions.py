@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from app.config import config
+from app.models.Sessiondb import Session as SessionDb
+from app.services.cache import SessionCache, session_cache
+from app.services.sessions import (
+    create_session,
+    delete_session,
+    get_principal,
+    get_user_by_session,
+    check_if_session_exists,
+    purge_expired_sessions,
+)
+from app.services.users import create_user, get_id_by_email, promote_user
+from app.middleware.sessionMangement import role_check
+from app.tests.conftest import principal
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SessionCache(max_size=2, ttl=60)
+    cache.set("a", principal("1"))
+    cache.set("b", principal("2"))
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    cache.set("c", principal("3"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_cache_drops_entries_past_ttl():
+    cache = SessionCache(max_size=10, ttl=-1)
+    cache.set("a", principal("1"))
+    assert cache.get("a") is None
+
+
+def test_cache_drops_expired_sessions():
+    cache = SessionCache(max_size=10, ttl=60)
+    cache.set("a", principal("1", -1))
+    assert cache.get("a") is None
+
+
+def test_cache_invalidate_user():
+    cache = SessionCache(max_size=10, ttl=60)
+    cache.set("a", principal("1"))
+    cache.set("b", principal("1"))
+    cache.set("c", principal("2"))
+    cache.invalidate_user("1")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_cache_stats():
+    cache = SessionCache(max_size=10, ttl=60)
+    cache.set("a", principal("1"))
+    cache.get("a")
+    cache.get("missing")
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "max_size": 10}
+
+
+def test_warm_session_resolves_without_queries(db, queries):
+    create_user(db, "test2@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "test2@test.com"))
+
+    with queries.budget(0, label="a warm session"):
+        assert check_if_session_exists(db, session_id)
+        assert get_user_by_session(db, session_id) is not None
+        assert role_check(False, session_id, db)
+
+
+def test_cold_session_fills_cache(db, queries):
+    create_user(db, "test2@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "test2@test.com"))
+    session_cache.clear()
+    queries.clear()
+
+    get_user_by_session(db, session_id)
+    get_user_by_session(db, session_id)
+    assert len(queries) == 1
+    assert session_cache.stats()["hits"] == 1
+
+
+def test_delete_session_invalidates_cache(db):
+    create_user(db, "test2@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "test2@test.com"))
+    delete_session(db, session_id)
+    assert not check_if_session_exists(db, session_id)
+
+
+def test_promote_user_invalidates_cache(db):
+    create_user(db, "test2@test.com", "hash")
+    user_id = get_id_by_email(db, "test2@test.com")
+    session_id = create_session(db, user_id)
+    assert not role_check(True, session_id, db)
+    promote_user(db, user_id)
+    assert role_check(True, session_id, db)
+
+
+def set_expiry(db, session_id, minutes):
+    db.query(SessionDb).filter(SessionDb.session_id == session_id).update(
+        {"expire_time": datetime.now() + timedelta(minutes=minutes)}
+    )
+    db.commit()
+    session_cache.clear()
+
+
+def test_expired_session_is_rejected(db):
+    create_user(db, "test2@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "test2@test.com"))
+    set_expiry(db, session_id, -1)
+    assert not check_if_session_exists(db, session_id)
+
+
+def test_sliding_session_is_renewed(db, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_SLIDING", True)
+    create_user(db, "test2@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "test2@test.com"))
+    set_expiry(db, session_id, 5)
+
+    renewed = get_principal(db, session_id).expiry
+    assert renewed > datetime.now() + timedelta(minutes=config.SESSION_TTL_MINUTES - 1)
+    session_cache.clear()
+    assert get_principal(db, session_id).expiry == renewed
+
+
+def test_session_is_not_renewed_unless_sliding(db, monkeypatch, queries):
+    monkeypatch.setattr(config, "SESSION_SLIDING", False)
+    create_user(db, "test2@test.com", "hash")
+    session_id = create_session(db, get_id_by_email(db, "test2@test.com"))
+    set_expiry(db, session_id, 5)
+    queries.clear()
+
+    assert get_principal(db, session_id).expiry < datetime.now() + timedelta(minutes=5)
+    assert not any(s.startswith("UPDATE") for s in queries)
+
+
+def test_purge_expired_sessions_in_batches(db, queries):
+    create_user(db, "test2@test.com", "hash")
+    user_id = get_id_by_email(db, "test2@test.com")
+    session_ids = [create_session(db, user_id) for _ in range(5)]
+    for session_id in session_ids[:4]:
+        set_expiry(db, session_id, -1)
+    queries.clear()
+
+    assert purge_expired_sessions(db, batch_size=3) == 4
+    assert len([s for s in queries if s.startswith("DELETE")]) == 2
+    assert db.query(SessionDb.session_id).all() == [(session_ids[4],)]
+    assert purge_expired_sessions(db, batch_size=3) == 0
@@ -0,0 +1,133 @@
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+from jinja2 import Environment
+from app.main import app
+from app.config import config
+from app.middleware.compression import DynamicGZipMiddleware
+from app.templating import (
+    ENCODINGS,
+    STATIC_DIR,
+    assets,
+    brotli,
+    create_environment,
+    negotiate_encoding,
+    precompile_templates,
+    templates,
+)
+
+
+client = TestClient(app)
+
+
+def test_pages_link_hashed_assets():
+    request = Request({"type": "http", "headers": []})
+    page = templates.TemplateResponse(request, "index.html").body.decode()
+    url = assets.url("base.js")
+    assert url != "/static/base.js"
+    assert f'src="{url}"' in page
+
+
+def test_hashed_assets_are_cached_for_good():
+    response = client.get(assets.url("issues.js"))
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == f"public, max-age={config.STATIC_MAX_AGE}, immutable"
+    with open(os.path.join(STATIC_DIR, "issues.js"), "rb") as f:
+        assert response.content == f.read()
+
+
+def test_plain_asset_names_are_revalidated():
+    response = client.get("/static/issues.js")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+# A page cached from before a release may ask for a version of a file that no longer exists
+def test_stale_asset_hash_not_found():
+    assert client.get("/static/issues.000000000000.js").status_code == 404
+
+
+def test_precompiled_templates_are_loaded_from_bytecode(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TEMPLATE_CACHE_DIR", str(tmp_path / "bytecode"))
+    precompile_templates(create_environment())
+    cached = os.listdir(tmp_path / "bytecode")
+    assert len(cached) > 0
+
+    # A new worker loads every template from the cache without compiling one
+    env = create_environment()
+    compiled = []
+    compile = Environment.compile
+
+    def recording_compile(self, source, *args, **kwargs):
+        compiled.append(source)
+        return compile(self, source, *args, **kwargs)
+
+    monkeypatch.setattr(Environment, "compile", recording_compile)
+    precompile_templates(env)
+    assert compiled == []
+    assert env.get_template("issues.html") is env.get_template("issues.html")
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_assets_are_served_precompressed(encoding):
+    url = assets.url("issues.js")
+    response = client.get(url, headers={"Accept-Encoding": encoding})
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) < len(response.content)
+
+    # Each coding has its own strong ETag, and a match is answered without the body
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.content == response.content
+    assert not response.headers["ETag"].startswith("W/")
+    assert response.headers["ETag"] != plain.headers["ETag"]
+    cached = client.get(
+        url, headers={"Accept-Encoding": encoding, "If-None-Match": response.headers["ETag"]}
+    )
+    assert cached.status_code == 304
+    assert cached.headers["Cache-Control"] == response.headers["Cache-Control"]
+
+
+def test_negotiate_encoding():
+    available = {"identity": b"", "gzip": b"", "br": b""}
+    assert negotiate_encoding("gzip, deflate", available) == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity", available) == "identity"
+    assert negotiate_encoding("*", {"identity": b"", "gzip": b""}) == "gzip"
+    assert negotiate_encoding("", available) == "identity"
+    if brotli is not None:
+        assert negotiate_encoding("gzip, deflate, br", available) == "br"
+    # A file that compression did not shrink is only kept as it is
+    assert negotiate_encoding("gzip", {"identity": b""}) == "identity"
+
+
+def test_dynamic_responses_are_gzipped():
+    async def events():
+        yield "data: one\n\n"
+        yield "data: two\n\n"
+
+    compressed = FastAPI()
+    compressed.add_middleware(DynamicGZipMiddleware, minimum_size=100)
+    compressed.get("/large")(lambda: ["issue"] * 100)
+    compressed.get("/small")(lambda: ["issue"])
+    compressed.get("/tagged/{size}")(
+        lambda size: Response("issue" * int(size), headers={"ETag": '"listing"'})
+    )
+    compressed.get("/events")(
+        lambda: StreamingResponse(events(), media_type="text/event-stream")
+    )
+    test_client = TestClient(compressed)
+
+    assert test_client.get("/large").headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in test_client.get("/small").headers
+    # The gzipped body is not the bytes the ETag was worked out for, so the ETag is made weak
+    assert test_client.get("/tagged/100").headers["ETag"] == 'W/"listing"'
+    assert test_client.get("/tagged/1").headers["ETag"] == '"listing"'
+    identity = test_client.get("/tagged/100", headers={"Accept-Encoding": "identity"})
+    assert identity.headers["ETag"] == '"listing"'
+    # Events are sent as they happen, gzip would hold them back
+    response = test_client.get("/events")
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "data: one\n\ndata: two\n\n"
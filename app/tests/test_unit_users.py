@@ -1,34 +1,11 @@
+import os
+import signal
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import Base, get_db
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-
-# Creating testing database
-@pytest.fixture()
-def test_db():
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
+from app.database import get_db
+from app.services.hashing import HashingBusy, HashingPool, hashing_pool
+from app.tests.conftest import override_get_db
 
 
 @pytest.fixture()
@@ -136,6 +113,21 @@ def test_get_users(test_db, login_user):
     assert response.status_code == 200
 
 
+# The directory and the users API select the columns they show, never the password hashes
+def test_user_listings_do_not_load_passwords(test_db, login_user, queries):
+    with queries.budget(1, label="GET /directory") as ran:
+        directory = client.get("/directory")
+    assert directory.status_code == 200
+    assert "test2@test.com" in directory.text
+    assert not any("password" in statement for statement in ran)
+
+    with queries.budget(1, label="GET /api/auth") as ran:
+        users = client.get("/api/auth")
+    assert [set(user) for user in users.json()] == [{"email", "isAdmin", "id"}]
+    assert users.json()[0]["email"] == "test2@test.com"
+    assert not any("password" in statement for statement in ran)
+
+
 def test_delete_user_as_admin(test_db, login_admin):
 
     user = client.post(
@@ -242,3 +234,71 @@ def test_login_user_with_no_data(test_db):
     )
     response = client.post("/api/auth/login", data={"email": "", "password": ""})
     assert response.status_code == 422
+
+
+def test_hashing_pool_round_trip():
+    pool = HashingPool(workers=1, queue_limit=0)
+    try:
+        hashed_password = pool.hash("2£23AacD")
+        assert pool.verify(hashed_password, "2£23AacD")
+        assert not pool.verify(hashed_password, "password")
+        assert not pool.verify("not a hash", "2£23AacD")
+    finally:
+        pool.shutdown()
+
+
+def test_hashing_pool_rejects_when_saturated():
+    pool = HashingPool(workers=1, queue_limit=0)
+    pool._slots.acquire()
+    try:
+        with pytest.raises(HashingBusy):
+            pool.hash("2£23AacD")
+    finally:
+        pool._slots.release()
+        pool.shutdown()
+
+
+def test_hashing_pool_replaces_a_dead_worker():
+    pool = HashingPool(workers=1, queue_limit=0)
+    try:
+        hashed_password = pool.hash("2£23AacD")
+        broken = pool._pool
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        assert pool.verify(hashed_password, "2£23AacD")
+        assert pool._pool is not broken
+    finally:
+        pool.shutdown()
+
+
+def test_hashing_pool_gives_up_after_one_retry():
+    pool = HashingPool(workers=1, queue_limit=0)
+    try:
+        # Kills whichever worker runs it, so the retry breaks as well
+        with pytest.raises(HashingBusy):
+            pool._run(os._exit, 1)
+        assert pool._slots.acquire(blocking=False)
+        pool._slots.release()
+        assert pool.verify(pool.hash("2£23AacD"), "2£23AacD")
+    finally:
+        pool.shutdown()
+
+
+def test_login_when_hashing_saturated(test_db):
+    client.post(
+        "/api/auth/register", data={"email": "test2@test.com", "password": "2£23AacD"}
+    )
+    # Takes every slot so the next login cannot be queued
+    held = 0
+    while hashing_pool._slots.acquire(blocking=False):
+        held += 1
+    try:
+        response = client.post(
+            "/api/auth/login", data={"email": "test2@test.com", "password": "2£23AacD"}
+        )
+    finally:
+        for _ in range(held):
+            hashing_pool._slots.release()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
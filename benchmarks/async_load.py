@@ -0,0 +1,69 @@
+# Load test of the issue listing routes on the sync and the async database layers.
+# Each mode runs in its own process because ASYNC_DATABASE is read when the app is imported.
+# The listing cache is off unless --listing-cache is given, so every request reaches the database.
+# Usage: python -m benchmarks.async_load --requests 2000 --concurrency 32
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+
+async def worker(client: httpx.AsyncClient, path: str, requests: int, latencies: list):
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+
+async def run(args):
+    from app.main import app
+    from benchmarks.common import ADMIN, Timer, disable_listing_cache, seed, summarise, use_database
+
+    SessionLocal = use_database(args.database)
+    if not args.listing_cache:
+        disable_listing_cache()
+    seed(SessionLocal, users=10, issues=args.issues)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post("/api/auth/login", data=ADMIN)
+            latencies = []
+            per_worker = args.requests // args.concurrency
+            with Timer() as timer:
+                await asyncio.gather(
+                    *(
+                        worker(client, "/api/issues/", per_worker, latencies)
+                        for _ in range(args.concurrency)
+                    )
+                )
+            summarise(f"{args.mode} GET /api/issues/ x{args.concurrency}", latencies, timer.elapsed)
+
+
+def main(args):
+    if args.mode != "both":
+        os.environ["ASYNC_DATABASE"] = str(args.mode == "async").lower()
+        asyncio.run(run(args))
+        return
+    for mode in ("sync", "async"):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.async_load", "--mode", mode]
+            + [f"--{name}={getattr(args, name)}" for name in ("requests", "concurrency", "issues", "database")]
+            + (["--listing-cache"] if args.listing_cache else []),
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--issues", type=int, default=50)
+    parser.add_argument("--database", default="./bench.db")
+    parser.add_argument("--listing-cache", action="store_true")
+    main(parser.parse_args())
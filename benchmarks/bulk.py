@@ -0,0 +1,75 @@
+# Compares creating, resolving and deleting issues one request at a time with the bulk routes.
+# Usage: python -m benchmarks.bulk --operations 10000
+import argparse
+import asyncio
+import httpx
+from app.main import app
+from benchmarks.common import ADMIN, Timer, use_database
+
+
+def report(name: str, operations: int, elapsed: float):
+    print(f"{name:<40} {operations:>7} ops  {operations / elapsed:>9.1f} ops/s  {elapsed:>8.2f}s")
+
+
+async def per_item(client: httpx.AsyncClient, operations: int):
+    ids = []
+    with Timer() as timer:
+        for i in range(operations):
+            response = await client.post(
+                "/api/issues/",
+                data={"title": f"bench issue {i}", "type": "Bug", "description": "per item"},
+            )
+            ids.append(response.json())
+    report("per item create", operations, timer.elapsed)
+
+    with Timer() as timer:
+        for id in ids:
+            response = await client.patch(f"/api/issues/resolve/{id}")
+            assert response.status_code == 200, response.text
+    report("per item resolve", operations, timer.elapsed)
+
+    with Timer() as timer:
+        for id in ids:
+            response = await client.delete(f"/api/issues/{id}")
+            assert response.status_code == 200, response.text
+    report("per item delete", operations, timer.elapsed)
+
+
+async def bulk(client: httpx.AsyncClient, operations: int):
+    issues = [
+        {"title": f"bench issue {i}", "type": "Bug", "description": "bulk"}
+        for i in range(operations)
+    ]
+    with Timer() as timer:
+        response = await client.post("/api/issues/bulk", json={"issues": issues})
+        assert response.status_code == 200, response.text
+    report("bulk create", operations, timer.elapsed)
+    ids = [result["id"] for result in response.json()["results"]]
+
+    with Timer() as timer:
+        response = await client.patch("/api/issues/bulk/resolve", json={"ids": ids})
+        assert response.status_code == 200, response.text
+    report("bulk resolve", operations, timer.elapsed)
+
+    with Timer() as timer:
+        response = await client.post("/api/issues/bulk/delete", json={"ids": ids})
+        assert response.status_code == 200, response.text
+    report("bulk delete", operations, timer.elapsed)
+
+
+async def main(args):
+    use_database(args.database)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as admin:
+            await admin.post("/api/auth/login", data=ADMIN)
+            await per_item(admin, args.operations)
+            await bulk(admin, args.operations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=10000)
+    parser.add_argument("--database", default="./bench.db")
+    asyncio.run(main(parser.parse_args()))
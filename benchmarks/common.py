@@ -0,0 +1,140 @@
+import time
+from contextlib import asynccontextmanager
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.config import config
+from app.main import app
+from app.database import Base, create_async_db_engine, create_db_engine, get_async_db, get_db
+from app.models.Issuedb import Issue as IssueDb
+from app.models.Sessiondb import Session as SessionDb
+from app.models.Userdb import User as UserDb
+from app.schemas.issue import IssueType
+from app.services.cache import listing_cache
+from app.services.hashing import password_hasher
+
+ADMIN = {"email": "admintest@test.com", "password": "test1A$c34"}
+USER_PASSWORD = "2£23AacD"
+
+
+# Points the app at a database file, the same way the unit tests override get_db. The file is
+# emptied first unless fresh is False, which leaves a database a running server may be using alone
+def use_database(path: str, fresh: bool = True):
+    engine = create_db_engine(f"sqlite:///{path}")
+    # The app's own database is left alone when a benchmark runs its lifespan
+    config.MIGRATE_ON_STARTUP = False
+    if fresh:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    # The app's lifespan only disposes its own async engine, aiosqlite's connection threads would
+    # otherwise keep the benchmark from exiting
+    lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan_context(app):
+        async with lifespan(app) as state:
+            yield state
+        await async_engine.dispose()
+
+    app.router.lifespan_context = lifespan_context
+    return SessionLocal
+
+
+# Benchmarks that poll one listing over and over would otherwise be answered from the listing
+# cache after the first request and measure a dictionary lookup, not the database layer
+def disable_listing_cache():
+    listing_cache.get = lambda key, version: None
+    listing_cache.set = lambda key, version, body: None
+
+
+# Seeds users that all share one password hash, so seeding does not pay argon2 per user
+def seed(SessionLocal, users: int, issues: int):
+    hashed_password = password_hasher.hash(USER_PASSWORD)
+    db = SessionLocal()
+    try:
+        accounts = [
+            UserDb(email=f"bench{i}@test.com", password=hashed_password)
+            for i in range(users)
+        ]
+        db.add_all(accounts)
+        db.flush()
+        types = list(IssueType)
+        db.add_all(
+            IssueDb(
+                title=f"bench issue {i}",
+                description=f"benchmark issue number {i}",
+                type=types[i % len(types)],
+                user_id=accounts[i % len(accounts)].id,
+            )
+            for i in range(issues)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# Creates sessions for the seeded users in turn, so many users can make requests without each
+# logging in first. Returns (session ID, user ID) pairs
+def seed_sessions(SessionLocal, sessions: int) -> list:
+    db = SessionLocal()
+    try:
+        users = db.scalars(
+            select(UserDb.id).where(UserDb.isAdmin.is_(False)).order_by(UserDb.email)
+        ).all()
+        rows = [SessionDb(user_id=users[i % len(users)]) for i in range(sessions)]
+        db.add_all(rows)
+        db.commit()
+        return [(row.session_id, row.user_id) for row in rows]
+    finally:
+        db.close()
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# Latencies are in seconds, the summary reports them in milliseconds
+def summarise(name: str, latencies: list, elapsed: float) -> dict:
+    summary = {
+        "name": name,
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+    print(
+        f"{name:<40} {summary['requests']:>7} req  {summary['throughput']:>9.1f} req/s  "
+        f"p50 {summary['p50_ms']:>8.2f}ms  p95 {summary['p95_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms"
+    )
+    return summary
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,79 @@
+# Measures /api/issues/ latency on its own and while logins run in parallel.
+# The listing cache is off unless --listing-cache is given, so every poll reaches the database.
+# Usage: python -m benchmarks.concurrency --requests 500 --logins 8
+import argparse
+import asyncio
+import time
+import httpx
+from app.main import app
+from benchmarks.common import (
+    ADMIN,
+    USER_PASSWORD,
+    Timer,
+    disable_listing_cache,
+    seed,
+    summarise,
+    use_database,
+)
+
+
+async def poll_issues(client: httpx.AsyncClient, requests: int) -> list:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get("/api/issues/")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+async def login_loop(transport, user: int, stop: asyncio.Event, latencies: list):
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/auth/login",
+                data={"email": f"bench{user}@test.com", "password": USER_PASSWORD},
+            )
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+
+async def main(args):
+    SessionLocal = use_database(args.database)
+    if not args.listing_cache:
+        disable_listing_cache()
+    seed(SessionLocal, users=max(args.logins, 1), issues=args.issues)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as admin:
+            await admin.post("/api/auth/login", data=ADMIN)
+
+            with Timer() as timer:
+                latencies = await poll_issues(admin, args.requests)
+            summarise("GET /api/issues/ (idle)", latencies, timer.elapsed)
+
+            stop = asyncio.Event()
+            login_latencies = []
+            logins = [
+                asyncio.create_task(login_loop(transport, user, stop, login_latencies))
+                for user in range(args.logins)
+            ]
+            with Timer() as timer:
+                latencies = await poll_issues(admin, args.requests)
+            stop.set()
+            await asyncio.gather(*logins)
+            summarise(f"GET /api/issues/ ({args.logins} parallel logins)", latencies, timer.elapsed)
+            if login_latencies:
+                summarise("POST /api/auth/login", login_latencies, timer.elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--issues", type=int, default=100)
+    parser.add_argument("--database", default="./bench.db")
+    parser.add_argument("--listing-cache", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,46 @@
+# Measures password verifications per second (the cost of a login) against the hashing worker count.
+# Usage: python -m benchmarks.hashing --logins 64 --workers 0 1 2 4
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import time
+from app.services.hashing import HashingBusy, HashingPool, password_hasher
+from benchmarks.common import USER_PASSWORD, Timer, summarise
+
+
+def timed_verify(pool: HashingPool, hashed_password: str):
+    start = time.perf_counter()
+    try:
+        assert pool.verify(hashed_password, USER_PASSWORD)
+    except HashingBusy:
+        return None
+    return time.perf_counter() - start
+
+
+def main(args):
+    hashed_password = password_hasher.hash(USER_PASSWORD)
+    for workers in args.workers:
+        pool = HashingPool(workers, queue_limit=args.logins)
+        # Warms the worker processes so start up is not counted
+        for _ in range(max(workers, 1)):
+            pool.verify(hashed_password, USER_PASSWORD)
+        # The request threadpool is emulated by a thread per concurrent login
+        with ThreadPoolExecutor(max_workers=args.threads) as threads, Timer() as timer:
+            results = list(
+                threads.map(lambda _: timed_verify(pool, hashed_password), range(args.logins))
+            )
+        pool.shutdown()
+        latencies = [result for result in results if result is not None]
+        summarise(f"{workers} hashing workers", latencies, timer.elapsed)
+        if len(latencies) != len(results):
+            print(f"  {len(results) - len(latencies)} logins rejected with 503")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[0, 1, 2, os.cpu_count() or 4]
+    )
+    main(parser.parse_args())
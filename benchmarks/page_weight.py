@@ -0,0 +1,57 @@
+# Measures the bytes sent for a view of the admin page, its HTML and the static files it links,
+# with and without compression, and again for a repeat view by a browser holding them in its cache.
+# Usage: python -m benchmarks.page_weight --issues 50
+import argparse
+import asyncio
+import re
+import httpx
+from app.main import app
+from benchmarks.common import ADMIN, seed, use_database
+
+
+# Returns the bytes received for the page and each asset as (url, status, bytes) rows
+async def view(client: httpx.AsyncClient, encoding: str, cached: dict) -> list:
+    rows = []
+    headers = {"Accept-Encoding": encoding}
+    page = await client.get("/manage", headers={**headers, **cached.get("/manage", {})})
+    rows.append(("/manage", page.status_code, page.num_bytes_downloaded))
+    if page.status_code == 200:
+        cached["/manage"] = {"If-None-Match": page.headers["ETag"]}
+        cached["assets"] = re.findall(r'src="(/static/[^"]+)"', page.text)
+    for url in cached["assets"]:
+        # Hashed assets are immutable, a browser that has them does not ask again
+        if url in cached:
+            continue
+        response = await client.get(url, headers=headers)
+        cached[url] = True
+        rows.append((url, response.status_code, response.num_bytes_downloaded))
+    return rows
+
+
+def report(name: str, rows: list):
+    total = sum(size for _, _, size in rows)
+    print(f"{name:<40} {len(rows):>3} requests  {total:>9} bytes")
+    for url, status, size in rows:
+        print(f"    {url:<36} {status:>3}  {size:>9} bytes")
+
+
+async def main(args):
+    SessionLocal = use_database(args.database)
+    seed(SessionLocal, users=10, issues=args.issues)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as admin:
+            await admin.post("/api/auth/login", data=ADMIN)
+            report("uncompressed", await view(admin, "identity", {}))
+            report("gzip", await view(admin, "gzip", {}))
+            cached = {}
+            report("brotli and gzip", await view(admin, "gzip, deflate, br", cached))
+            report("brotli and gzip, repeat view", await view(admin, "gzip, deflate, br", cached))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--issues", type=int, default=50)
+    parser.add_argument("--database", default="./bench.db")
+    asyncio.run(main(parser.parse_args()))
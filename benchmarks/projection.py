@@ -0,0 +1,72 @@
+# Compares loading a large page for /manage and the user directory as ORM entities with selecting
+# only the columns their cards show: the time taken and the peak memory allocated while loading.
+# Usage: python -m benchmarks.projection --users 10000 --issues 10000
+import argparse
+import tracemalloc
+from sqlalchemy import select
+from app.models.Userdb import User as UserDb
+from app.services.issues import get_issue_cards_page, issues_page_query
+from app.services.users import get_users
+from benchmarks.common import Timer, seed, use_database
+
+
+def issue_entities(db, rows: int):
+    return db.scalars(issues_page_query(rows)).all()
+
+
+def issue_cards(db, rows: int):
+    return get_issue_cards_page(db, rows)["items"]
+
+
+def user_entities(db, rows: int):
+    return db.scalars(select(UserDb)).all()
+
+
+def user_cards(db, rows: int):
+    return get_users(db)
+
+
+# Each run uses a new session, so entities are hydrated every time rather than found in the
+# identity map. The result is kept until the peak is read, as a page is while it renders
+def measure(SessionLocal, load, rows: int, repeat: int):
+    best, peak = None, 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            tracemalloc.start()
+            with Timer() as timer:
+                loaded = load(db, rows)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            del loaded
+        finally:
+            db.close()
+        best = timer.elapsed if best is None else min(best, timer.elapsed)
+    return best, peak
+
+
+def main(args):
+    SessionLocal = use_database(args.database)
+    seed(SessionLocal, args.users, args.issues)
+
+    print(f"best time of {args.repeat}, time is measured with tracemalloc running")
+    for name, load, rows in [
+        ("issue entities", issue_entities, args.issues),
+        ("issue cards", issue_cards, args.issues),
+        ("user entities", user_entities, args.users),
+        ("user cards", user_cards, args.users),
+    ]:
+        elapsed, peak = measure(SessionLocal, load, rows, args.repeat)
+        print(
+            f"{name:<20} {rows:>7} rows  {elapsed * 1000:>9.1f}ms  "
+            f"{peak / 1024 / 1024:>8.1f} MiB peak"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--issues", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database", default="./bench.db")
+    main(parser.parse_args())
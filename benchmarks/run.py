@@ -0,0 +1,394 @@
+# Load tests the API with a set of scenarios and writes the throughput and p50/p95/p99 latency of
+# every endpoint they call to a JSON results file. With --baseline the results are compared against
+# an earlier results file, and the exit status is 1 when any endpoint got slower by more than
+# --tolerance. The database is seeded with --users users, --issues issues and --sessions sessions
+# first, and the scenarios pick users and issues with a fixed random seed, so runs are repeatable.
+#
+# Runs in-process by default. To load a real server, seed the benchmark database with --seed-only,
+# start the server on it, then pass its URL as --target. The database is never reseeded with
+# --target, as the server has it open, the run uses the sessions and issues already in it:
+#   python -m benchmarks.run --seed-only
+#   DATABASE_URL=sqlite:///./bench.db uvicorn app.main:app --workers 4
+#   python -m benchmarks.run --target http://127.0.0.1:8000
+#
+# Usage: python -m benchmarks.run --output results.json
+#        python -m benchmarks.run --baseline results.json --tolerance 0.25
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Optional
+import httpx
+from sqlalchemy import select
+from app.main import app
+from app.models.Issuedb import Issue as IssueDb
+from app.models.Sessiondb import Session as SessionDb
+from app.models.Userdb import User as UserDb
+from benchmarks.common import ADMIN, USER_PASSWORD, seed, seed_sessions, summarise, use_database
+
+
+# Keeps the latencies of every request made in one scenario, by endpoint. Endpoints are named by
+# their route, e.g. GET /api/issues/{user_id}, so each ID does not become an endpoint of its own
+class Recorder:
+    def __init__(self):
+        self.latencies: dict = defaultdict(list)
+        self.errors: dict = defaultdict(int)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        path: str,
+        endpoint: str,
+        expected: tuple = (200,),
+        **kwargs,
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code not in expected:
+            self.errors[endpoint] += 1
+        return response
+
+
+# Everything a scenario needs: how to reach the app, who it can act as and what it can act on
+class Context:
+    def __init__(self, args, sessions: list, issues: dict, admin_session: str):
+        self.args = args
+        self.sessions = sessions
+        # Issue IDs by the ID of the user who owns them
+        self.issues = issues
+        self.admin_session = admin_session
+        self.random = random.Random(args.seed)
+        self.transport = None if args.target else httpx.ASGITransport(app=app)
+
+    # Each simulated client gets its own connection and, if given, session cookie
+    def client(self, session_id: Optional[str] = None) -> httpx.AsyncClient:
+        headers = {"Cookie": f"sessionID={session_id}"} if session_id else {}
+        if self.transport is not None:
+            return httpx.AsyncClient(
+                transport=self.transport, base_url="http://bench", headers=headers
+            )
+        return httpx.AsyncClient(base_url=self.args.target, headers=headers, timeout=60)
+
+
+# Runs operation until it has been called requests times in total, from concurrency clients at once.
+# Returns the seconds taken
+async def drive(concurrency: int, requests: int, operation: Callable) -> float:
+    calls = itertools.count()
+
+    async def worker(n: int):
+        while next(calls) < requests:
+            await operation(n)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return time.perf_counter() - start
+
+
+# Many users logging in at once, each login hashes a password
+async def login_storm(context: Context, recorder: Recorder) -> float:
+    args = context.args
+    clients = [context.client() for _ in range(args.concurrency)]
+    users = itertools.cycle(range(args.users))
+
+    async def operation(n: int):
+        await recorder.request(
+            clients[n],
+            "POST",
+            "/api/auth/login",
+            "POST /api/auth/login",
+            data={"email": f"bench{next(users)}@test.com", "password": USER_PASSWORD},
+        )
+
+    try:
+        return await drive(args.concurrency, args.logins, operation)
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+# Admins with the manage page open, each revalidating the page and its listing with the ETag they
+# were last sent, as a browser does
+async def manage_polling(context: Context, recorder: Recorder) -> float:
+    args = context.args
+    clients = [context.client(context.admin_session) for _ in range(args.concurrency)]
+    etags = [{} for _ in range(args.concurrency)]
+
+    async def operation(n: int):
+        for path, endpoint in (("/manage", "GET /manage"), ("/api/issues/", "GET /api/issues/")):
+            headers = {"If-None-Match": etags[n][path]} if path in etags[n] else {}
+            response = await recorder.request(
+                clients[n], "GET", path, endpoint, (200, 304), headers=headers
+            )
+            if "ETag" in response.headers:
+                etags[n][path] = response.headers["ETag"]
+
+    try:
+        return await drive(args.concurrency, args.requests // 2, operation)
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+async def create_issue(context: Context, recorder: Recorder, client: httpx.AsyncClient, n: int):
+    await recorder.request(
+        client,
+        "POST",
+        "/api/issues/",
+        "POST /api/issues/",
+        data={"title": f"burst issue {n}", "type": "Bug", "description": "benchmark issue"},
+    )
+
+
+# Users raising issues all at once
+async def issue_burst(context: Context, recorder: Recorder) -> float:
+    args = context.args
+    clients = [
+        context.client(context.sessions[n % len(context.sessions)][0])
+        for n in range(args.concurrency)
+    ]
+    operation = lambda n: create_issue(context, recorder, clients[n], n)
+    try:
+        return await drive(args.concurrency, args.requests, operation)
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+# Users reading and changing their own issues while an admin reviews them. Half of the requests
+# list a user's own issues, a fifth are admin listings and the rest are writes
+async def mixed(context: Context, recorder: Recorder) -> float:
+    args = context.args
+    sessions = [context.sessions[n % len(context.sessions)] for n in range(args.concurrency)]
+    clients = [context.client(session_id) for session_id, _ in sessions]
+    admin = context.client(context.admin_session)
+    choose = context.random
+
+    async def operation(n: int):
+        client, user_id = clients[n], sessions[n][1]
+        owned = context.issues.get(user_id) or [None]
+        roll = choose.random()
+        if roll < 0.5:
+            await recorder.request(
+                client, "GET", f"/api/issues/{user_id}", "GET /api/issues/{user_id}"
+            )
+        elif roll < 0.7:
+            await recorder.request(admin, "GET", "/api/issues/", "GET /api/issues/")
+        elif roll < 0.85:
+            await create_issue(context, recorder, client, n)
+        elif roll < 0.95 and owned[0] is not None:
+            await recorder.request(
+                client,
+                "PATCH",
+                f"/api/issues/{choose.choice(owned)}",
+                "PATCH /api/issues/{id}",
+                data={"description": f"updated by the benchmark {roll}"},
+            )
+        elif owned[0] is not None:
+            await recorder.request(
+                admin,
+                "PATCH",
+                f"/api/issues/resolve/{choose.choice(owned)}",
+                "PATCH /api/issues/resolve/{id}",
+            )
+
+    try:
+        return await drive(args.concurrency, args.requests, operation)
+    finally:
+        for client in clients + [admin]:
+            await client.aclose()
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "manage_polling": manage_polling,
+    "issue_burst": issue_burst,
+    "mixed": mixed,
+}
+
+
+def change(before: float, now: float) -> float:
+    return now / before - 1 if before else 0.0
+
+
+# Flags every endpoint whose p95 latency rose, or whose throughput fell, by more than tolerance,
+# or that failed more requests than before. Endpoints missing from either run are skipped
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    columns = f"{'before':>8} {'now':>8} {'change':>6}"
+    print(f"\n{'':<56} {'p95 ms':^24} {'throughput req/s':^24}")
+    print(f"{'endpoint':<56} {columns} {columns}")
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for endpoint, now in current["endpoints"].items():
+            before = previous.get(endpoint)
+            if before is None:
+                continue
+            name = f"{scenario} {endpoint}"
+            p95 = change(before["p95_ms"], now["p95_ms"])
+            throughput = change(before["throughput"], now["throughput"])
+            print(
+                f"{name:<56} {before['p95_ms']:>8.2f} {now['p95_ms']:>8.2f} {p95:>+6.0%}"
+                f" {before['throughput']:>8.1f} {now['throughput']:>8.1f} {throughput:>+6.0%}"
+            )
+            if p95 > tolerance:
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {now['p95_ms']:.2f}ms")
+            if throughput < -tolerance:
+                regressions.append(
+                    f"{name}: {before['throughput']:.1f} -> {now['throughput']:.1f} req/s"
+                )
+            if now["errors"] > before["errors"]:
+                regressions.append(f"{name}: {now['errors']} failed, {before['errors']} before")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_database(args):
+    SessionLocal = use_database(args.database)
+    seed(SessionLocal, users=args.users, issues=args.issues)
+    return SessionLocal, seed_sessions(SessionLocal, args.sessions)
+
+
+# The unexpired sessions of users seeded by --seed-only, for a run against a server
+def existing_sessions(SessionLocal, limit: int) -> list:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(SessionDb.session_id, SessionDb.user_id)
+            .join(UserDb, UserDb.id == SessionDb.user_id)
+            .where(UserDb.isAdmin.is_(False), SessionDb.expire_time > datetime.now())
+            .order_by(SessionDb.session_id)
+            .limit(limit)
+        ).all()
+    finally:
+        db.close()
+
+
+def prepare(args) -> tuple:
+    if args.target:
+        SessionLocal = use_database(args.database, fresh=False)
+        sessions = existing_sessions(SessionLocal, args.sessions)
+        if len(sessions) < args.sessions:
+            sys.exit(
+                f"{args.database} has {len(sessions)} unexpired sessions, {args.sessions} are "
+                "needed. Stop the server and seed it with --seed-only first"
+            )
+    else:
+        SessionLocal, sessions = seed_database(args)
+    db = SessionLocal()
+    try:
+        issues = defaultdict(list)
+        for id, user_id in db.execute(select(IssueDb.id, IssueDb.user_id)):
+            issues[user_id].append(id)
+    finally:
+        db.close()
+    return sessions, issues
+
+
+async def run(args) -> dict:
+    sessions, issues = prepare(args)
+    results = {
+        "meta": {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "target": args.target or "in-process",
+            **{
+                name: getattr(args, name)
+                for name in (
+                    "users", "issues", "sessions", "requests", "logins", "concurrency", "seed"
+                )
+            },
+        },
+        "scenarios": {},
+    }
+    # The admin logs in for real, its account is created by its first login
+    login_client = Context(args, sessions, issues, "").client()
+    response = await login_client.post("/api/auth/login", data=ADMIN)
+    await login_client.aclose()
+    assert response.status_code == 200, response.text
+    context = Context(args, sessions, issues, response.cookies["sessionID"])
+
+    for name in args.scenarios:
+        recorder = Recorder()
+        elapsed = await SCENARIOS[name](context, recorder)
+        endpoints = {}
+        for endpoint, latencies in sorted(recorder.latencies.items()):
+            summary = summarise(f"{name} {endpoint}", latencies, elapsed)
+            summary["errors"] = recorder.errors[endpoint]
+            del summary["name"]
+            endpoints[endpoint] = summary
+        results["scenarios"][name] = {"elapsed": elapsed, "endpoints": endpoints}
+    return results
+
+
+async def main(args) -> int:
+    if args.seed_only:
+        seed_database(args)
+        print(f"seeded {args.database}")
+        return 0
+    if args.target:
+        results = await run(args)
+    else:
+        async with app.router.lifespan_context(app):
+            results = await run(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Results are only comparable when the runs were seeded and loaded the same way
+        differences = [
+            f"{name} {baseline['meta'].get(name)} -> {value}"
+            for name, value in results["meta"].items()
+            if name not in ("time", "commit", "python") and baseline["meta"].get(name) != value
+        ]
+        if differences:
+            print(f"\nwarning, the baseline was run with other settings: {', '.join(differences)}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nno regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--issues", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000, help="requests made by each scenario")
+    parser.add_argument("--logins", type=int, default=64, help="logins made by the login storm")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--target", help="URL of a running server, by default runs in-process")
+    parser.add_argument("--database", default="./bench.db")
+    parser.add_argument(
+        "--seed-only", action="store_true", help="seed the database for a --target run and exit"
+    )
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,61 @@
+# Compares the two ways an issue listing is turned into JSON on one large page: loading Issue objects
+# and validating them through IssuePage, and selecting plain columns encoded by encode_issue_page.
+# Usage: python -m benchmarks.serialization --rows 10000 --repeat 5
+import argparse
+from app.schemas.issue import IssuePage
+from app.services.issues import get_issue_rows_page, get_issues_page
+from app.services.serialization import encode_issue_page, orjson
+from benchmarks.common import Timer, seed, use_database
+
+
+def models(db, rows: int) -> bytes:
+    page = get_issues_page(db, rows)
+    return IssuePage.model_validate(page, from_attributes=True).model_dump_json().encode()
+
+
+def columns(db, rows: int) -> bytes:
+    return encode_issue_page(get_issue_rows_page(db, rows))
+
+
+# Each run uses a new session, so the models path hydrates its objects every time rather than
+# finding them in the identity map
+def measure(SessionLocal, render, rows: int, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            with Timer() as timer:
+                render(db, rows)
+        finally:
+            db.close()
+        best = timer.elapsed if best is None else min(best, timer.elapsed)
+    return best
+
+
+def main(args):
+    SessionLocal = use_database(args.database)
+    seed(SessionLocal, args.users, args.rows)
+    db = SessionLocal()
+    try:
+        assert models(db, args.rows) == columns(db, args.rows)
+    finally:
+        db.close()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json'}, best of {args.repeat}")
+    baseline = None
+    for name, render in [("response models", models), ("columns", columns)]:
+        elapsed = measure(SessionLocal, render, args.rows, args.repeat)
+        baseline = baseline or elapsed
+        print(
+            f"{name:<20} {args.rows:>7} rows  {elapsed * 1000:>9.1f}ms  "
+            f"{args.rows / elapsed:>10.0f} rows/s  {baseline / elapsed:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", default="./bench.db")
+    main(parser.parse_args())
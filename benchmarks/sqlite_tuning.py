@@ -0,0 +1,83 @@
+# Measures mixed read/write throughput on a plain SQLite engine and on create_db_engine
+# (WAL, busy_timeout, synchronous=NORMAL, mmap and cache size, pool sized to the threadpool).
+# Usage: python -m benchmarks.sqlite_tuning --threads 16 --operations 200 --writes 0.2
+import argparse
+import os
+import random
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+from app.models.Userdb import User as UserDb
+from app.schemas.issue import IssueType
+from app.services.issues import create_issue, get_issues_page
+from benchmarks.common import Timer, seed, summarise
+
+
+def default_engine(url: str):
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def prepare(path: str, engine_factory, issues: int):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    engine = engine_factory(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(SessionLocal, users=10, issues=issues)
+    return engine, SessionLocal
+
+
+# Each thread stands in for a threadpool worker serving a mix of listings and new issues
+def worker(SessionLocal, user_id, args, number, latencies, errors):
+    rng = random.Random(number)
+    for _ in range(args.operations):
+        db = SessionLocal()
+        start = time.perf_counter()
+        try:
+            if rng.random() < args.writes:
+                create_issue(db, "bench write", "written by the benchmark", IssueType.BUG, user_id)
+            else:
+                get_issues_page(db, 50)
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            errors.append(number)
+        finally:
+            db.close()
+
+
+def run(name: str, engine_factory, args):
+    engine, SessionLocal = prepare(args.database, engine_factory, args.issues)
+    db = SessionLocal()
+    user_id = db.query(UserDb.id).first().id
+    db.close()
+
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=worker, args=(SessionLocal, user_id, args, number, latencies, errors))
+        for number in range(args.threads)
+    ]
+    with Timer() as timer:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    summarise(name, latencies, timer.elapsed)
+    print(f"{'':<40} {len(errors):>7} operations failed with database is locked")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--writes", type=float, default=0.2, help="share of operations that write")
+    parser.add_argument("--issues", type=int, default=1000)
+    parser.add_argument("--database", default="./bench.db")
+    args = parser.parse_args()
+
+    run("default engine", default_engine, args)
+    run("create_db_engine", create_db_engine, args)